@@ -1,5 +1,7 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from passlib.exc import UnknownHashError
@@ -7,7 +9,7 @@ from app.config import settings
 
 # Password hashing with error handling for bcrypt compatibility
 try:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
     # Test the context to ensure it works
     pwd_context.hash("test")
     BCRYPT_AVAILABLE = True
@@ -31,6 +33,37 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         # Any other error, assume invalid
         return False
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password and return (valid, new_hash). new_hash is set when the
+    password is valid but its hash uses another cost or scheme than
+    pwd_context hashes with now (or is a plain text fallback), so the caller
+    can store it.
+    """
+    try:
+        if hashed_password.startswith("PLAIN:"):
+            if plain_password != hashed_password[6:]:
+                return False, None
+            new_hash = get_password_hash(plain_password)
+            return True, None if new_hash.startswith("PLAIN:") else new_hash
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+    except Exception:
+        # Unknown hash formats and any other error count as invalid
+        return False, None
+
+# bcrypt keeps a CPU busy for a few hundred milliseconds per password; the
+# async variant runs it on these threads so the event loop keeps serving
+# other requests, and at most PASSWORD_HASH_WORKERS passwords are checked at
+# once while further logins wait their turn
+_password_executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.PASSWORD_HASH_WORKERS), thread_name_prefix="password-hash"
+)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """verify_and_update_password() on the password hashing threads"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, verify_and_update_password, plain_password, hashed_password)
+
 def get_password_hash(password: str) -> str:
     """Hash a password"""
     try:
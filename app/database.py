@@ -1,6 +1,10 @@
+from typing import Union
+
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from starlette.concurrency import run_in_threadpool
+from fastapi import Depends
 from .config import settings
 
 # Create engine
@@ -22,3 +26,55 @@ def get_db() -> Session:
         yield db
     finally:
         db.close()
+
+
+# Async engine for the read paths (DATABASE_ASYNC). The sync engine above
+# stays in use for writes, scripts, the importer and create_all.
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL with its driver swapped for the asyncio one"""
+    scheme, separator, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{separator}{rest}"
+
+async_engine = None
+AsyncSessionLocal = None
+if settings.DATABASE_ASYNC:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(
+        settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL),
+        echo=settings.DEBUG,
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Either an AsyncSession (DATABASE_ASYNC) or the request's sync Session
+ReadSession = Union[Session, "AsyncSession"]
+
+async def get_read_db(db: Session = Depends(get_db)):
+    """
+    Session for the hot read paths: an AsyncSession on the async engine when
+    DATABASE_ASYNC is set, otherwise the request's sync session. Either way
+    it is used through run_db(), so the route code is the same in both modes.
+    """
+    if AsyncSessionLocal is None:
+        yield db
+        return
+    async with AsyncSessionLocal() as read_db:
+        yield read_db
+
+async def run_db(db: ReadSession, fn, *args, **kwargs):
+    """
+    Call fn(session, *args, **kwargs) without blocking the event loop. fn is
+    ordinary sync ORM code: on an AsyncSession it runs through run_sync() on
+    the asyncio driver, on a sync Session it runs on the threadpool. Anything
+    that loads lazily must be touched inside fn.
+    """
+    if isinstance(db, Session):
+        return await run_in_threadpool(fn, db, *args, **kwargs)
+    return await db.run_sync(fn, *args, **kwargs)
@@ -1,22 +1,26 @@
 from fastapi import Depends, HTTPException, status, Cookie
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session
 from typing import Optional
-from datetime import datetime
-from app.database import get_db
+from app.database import ReadSession, get_db, get_read_db, run_db
 from app.models.user import User
-from app.models.api_key import ApiKey
 from app.core.security import verify_token
-import hashlib
+from app.utils.api_key_cache import api_key_user_id
+from app.utils.user_cache import load_user_async
 
 security = HTTPBearer(auto_error=False)
 
-def get_current_user_optional(
+async def get_current_user_optional(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     session_token: Optional[str] = Cookie(None),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    read_db: ReadSession = Depends(get_read_db)
 ) -> Optional[User]:
-    """Get current user if authenticated (optional)"""
+    """
+    Get current user if authenticated (optional). Lookups go through read_db
+    (the async engine with DATABASE_ASYNC), but the user is always attached
+    to the request's sync session so routes can change and commit it.
+    """
     token = None
 
     # Try to get token from Authorization header first
@@ -25,7 +29,11 @@ def get_current_user_optional(
 
         # Check if it's an API key (starts with 'sk_')
         if token.startswith('sk_'):
-            return _authenticate_api_key(token, db)
+            user_id = await run_db(read_db, api_key_user_id, token)
+            if user_id is None:
+                return None
+            user = await load_user_async(db, read_db, user_id)
+            return user if user is not None and user.is_active else None
 
     # Fall back to session cookie
     elif session_token:
@@ -42,60 +50,7 @@ def get_current_user_optional(
     if user_id is None:
         return None
 
-    user = db.query(User).filter(User.id == user_id).first()
-    return user
-
-def _authenticate_api_key(api_key: str, db: Session) -> Optional[User]:
-    """Authenticate using API key"""
-    try:
-        print(f"DEBUG: Authenticating API key: {api_key[:10]}...")
-        
-        # Hash the provided key
-        key_hash = hashlib.sha256(api_key.encode()).hexdigest()
-        print(f"DEBUG: Generated hash: {key_hash}")
-
-        # Find the API key in database with user relationship loaded
-        api_key_record = db.query(ApiKey).options(
-            joinedload(ApiKey.user)
-        ).filter(
-            ApiKey.key_hash == key_hash,
-            ApiKey.is_active == True
-        ).first()
-
-        if not api_key_record:
-            print(f"DEBUG: No API key record found for hash")
-            return None
-
-        print(f"DEBUG: Found API key record: ID={api_key_record.id}, UserID={api_key_record.user_id}")
-
-        # Check if key has expired
-        if api_key_record.expires_at and datetime.utcnow() > api_key_record.expires_at:
-            print(f"DEBUG: API key has expired")
-            return None
-
-        # Update last used timestamp
-        api_key_record.last_used_at = datetime.utcnow()
-        db.commit()
-        print(f"DEBUG: Updated last_used_at timestamp")
-
-        # Return the associated user (should be loaded due to joinedload)
-        user = api_key_record.user
-        if not user:
-            print(f"DEBUG: No user associated with API key")
-            return None
-            
-        if not user.is_active:
-            print(f"DEBUG: User is not active")
-            return None
-            
-        print(f"DEBUG: Authentication successful for user: {user.username}")
-        return user
-
-    except Exception as e:
-        print(f"DEBUG: API key authentication error: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
+    return await load_user_async(db, read_db, user_id)
 
 def get_current_user(current_user: Optional[User] = Depends(get_current_user_optional)) -> User:
     """Get current authenticated user (required)"""
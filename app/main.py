@@ -3,14 +3,19 @@ from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from sqlalchemy.orm import Session
+import asyncio
 import os
 from pathlib import Path
 
-from app.database import get_db, engine, Base
+from app.database import get_db, engine, async_engine, Base
 from app.routers import auth, dashboard, clients, invoices, quotes, payments, products, tasks, reports, settings, help, notifications, profile, tax_rates
 from app.dependencies import get_current_user_optional
 from app.models.user import User
 from app.routers import product_modal
+from app.config import settings as app_settings
+from app.utils.overdue import run_overdue_sweeper
+from app.utils.rate_limit import RateLimitMiddleware
+from app.utils.api_key_cache import flush_once as flush_api_key_last_used, run_last_used_flusher
 
 # Import all models to ensure they're registered with Base
 from app.models import user, client, invoice, product, payment, api_key
@@ -20,6 +25,10 @@ Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="InvoicePlane Python", version="1.0.0")
 
+# Token bucket and in-flight limits per API key or signed-in user
+if app_settings.RATE_LIMIT_RATE > 0 or app_settings.RATE_LIMIT_CONCURRENCY > 0:
+    app.add_middleware(RateLimitMiddleware)
+
 # Mount static files only if directory exists.
 static_dir = Path("static")
 if static_dir.exists():
@@ -82,6 +91,26 @@ async def startup_event():
     # Check if login routes are properly configured
     check_login_routes()
 
+    # Keep Invoice.status current for invoices that pass their due date
+    if app_settings.OVERDUE_SWEEP_INTERVAL > 0:
+        app.state.overdue_sweeper = asyncio.create_task(run_overdue_sweeper())
+
+    # Write API key last_used_at timestamps in batches instead of per request
+    if app_settings.API_KEY_LAST_USED_INTERVAL > 0:
+        app.state.api_key_flusher = asyncio.create_task(run_last_used_flusher())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    sweeper = getattr(app.state, "overdue_sweeper", None)
+    if sweeper is not None:
+        sweeper.cancel()
+    flusher = getattr(app.state, "api_key_flusher", None)
+    if flusher is not None:
+        flusher.cancel()
+        await asyncio.to_thread(flush_api_key_last_used)
+    if async_engine is not None:
+        await async_engine.dispose()
+
 def check_login_routes():
     """Check if login routes are properly configured"""
     auth_login_get = False
@@ -9,6 +9,8 @@ from .api_key import ApiKey
 from .quotes import Quote, QuoteStatus, QuoteItem
 from .tax_rate import TaxRate
 from .invoicesettings import InvoiceSettings
+from .invoice_group import InvoiceGroup
+from .revenue_daily import RevenueDaily
 
 __all__ = [
     "BaseModel",
@@ -21,5 +23,11 @@ __all__ = [
     "ProductFamily",
     "ProductUnit",
     "Payment",
-    "ApiKey"
-]
\ No newline at end of file
+    "ApiKey",
+    "InvoiceGroup",
+    "RevenueDaily"
+]
+
+# Registers the session events that keep the revenue_daily rollup current,
+# so every writer that uses the models (routers, scripts, the importer) does
+from app.utils import revenue_rollup  # noqa: E402,F401
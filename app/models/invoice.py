@@ -1,5 +1,8 @@
-from sqlalchemy import Column, String, Text, Date, ForeignKey, Boolean, Integer, Numeric
+from sqlalchemy import Column, String, Text, Date, ForeignKey, Boolean, Integer, Numeric, and_, case, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql.expression import FunctionElement
 from enum import IntEnum  # Changed from PyEnum to IntEnum
 from app.models.base import BaseModel
 
@@ -11,6 +14,27 @@ class InvoiceStatus(IntEnum):
     OVERDUE = 5
     CANCELLED = 6
 
+# Statuses an unpaid invoice past its due date can be in
+OVERDUE_STATUSES = (InvoiceStatus.SENT.value, InvoiceStatus.VIEWED.value, InvoiceStatus.OVERDUE.value)
+
+
+class days_since(FunctionElement):
+    """Whole days from a date column to today, computed by the database"""
+    type = Integer()
+    inherit_cache = True
+
+
+@compiles(days_since)
+def _days_since_default(element, compiler, **kw):
+    # Subtracting dates gives an integer number of days (PostgreSQL)
+    return "(CURRENT_DATE - %s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(days_since, "sqlite")
+def _days_since_sqlite(element, compiler, **kw):
+    return "CAST(julianday(date('now')) - julianday(%s) AS INTEGER)" % compiler.process(element.clauses, **kw)
+
+
 class Invoice(BaseModel):
     __tablename__ = "invoices"  # Fixed: was **tablename**
 
@@ -77,14 +101,17 @@ class Invoice(BaseModel):
         """Get status name as string"""
         return self.status_enum.name
 
-    @property
+    @hybrid_property
     def is_overdue(self) -> bool:
         """Check if invoice is overdue"""
         from datetime import date
-        return (self.status not in [InvoiceStatus.DRAFT.value, InvoiceStatus.PAID.value]  # Use .value
-                and self.due_date < date.today())
+        return self.status in OVERDUE_STATUSES and self.due_date < date.today()
 
-    @property
+    @is_overdue.expression
+    def is_overdue(cls):
+        return and_(cls.status.in_(OVERDUE_STATUSES), cls.due_date < func.current_date())
+
+    @hybrid_property
     def days_overdue(self) -> int:
         """Calculate days overdue"""
         if not self.is_overdue:
@@ -92,6 +119,10 @@ class Invoice(BaseModel):
         from datetime import date
         return (date.today() - self.due_date).days
 
+    @days_overdue.expression
+    def days_overdue(cls):
+        return case((cls.is_overdue, days_since(cls.due_date)), else_=0)
+
 class InvoiceItem(BaseModel):
     __tablename__ = "invoice_items"  # Fixed: was **tablename**
 
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, Integer, BigInteger
+from app.models.base import BaseModel
+
+
+class InvoiceGroup(BaseModel):
+    """
+    Numbering sequence for invoices.
+    next_id is the number the next invoice in the group receives; it is only
+    ever advanced with a single UPDATE ... RETURNING so concurrent creates
+    cannot hand out the same number.
+    """
+    __tablename__ = "invoice_groups"
+
+    # Key referenced by InvoiceSettings.default_invoice_group
+    slug = Column(String(50), unique=True, nullable=False)
+    name = Column(String(100), nullable=False)
+    # Template with {{{id}}}, {{{year}}}, {{{yy}}}, {{{month}}}, {{{day}}} and {{{quarter}}} tags
+    identifier_format = Column(String(255), nullable=False, default="INV-{{{id}}}")
+    next_id = Column(BigInteger, nullable=False, default=1)
+    left_pad = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Date, ForeignKey, Integer, Numeric, UniqueConstraint
+from app.models.base import BaseModel
+
+
+class RevenueDaily(BaseModel):
+    """
+    Daily rollup of invoicing and payments per (day, user, client).
+    Invoices count on their issue date once issued (not draft or cancelled),
+    payments on their payment date. Rows are derived data: every invoice or
+    payment write adds its difference to the affected rows (see
+    app/utils/revenue_rollup.py) and they can be rebuilt from scratch at any time.
+    """
+    __tablename__ = "revenue_daily"
+    __table_args__ = (UniqueConstraint("day", "user_id", "client_id", name="uq_revenue_daily_day_user_client"),)
+
+    day = Column(Date, nullable=False, index=True)
+    user_id = Column(ForeignKey("users.id"), nullable=False)
+    client_id = Column(ForeignKey("clients.id"), nullable=False)
+
+    # Invoice totals excluding tax, invoice totals, and their tax
+    revenue = Column(Numeric(14, 2), nullable=False, default=0)
+    invoiced = Column(Numeric(14, 2), nullable=False, default=0)
+    tax = Column(Numeric(14, 2), nullable=False, default=0)
+    invoice_count = Column(Integer, nullable=False, default=0)
+
+    payments = Column(Numeric(14, 2), nullable=False, default=0)
+    payment_count = Column(Integer, nullable=False, default=0)
@@ -6,7 +6,7 @@ from datetime import timedelta
 
 from app.database import get_db
 from app.models.user import User
-from app.core.security import verify_password, create_access_token
+from app.core.security import verify_and_update_password_async, create_access_token
 from app.dependencies import get_current_user_optional
 
 router = APIRouter()
@@ -30,7 +30,10 @@ async def login(
         (User.username == username) | (User.email == username)
     ).first()
     
-    if not user or not verify_password(password, user.hashed_password):
+    valid, new_hash = False, None
+    if user:
+        valid, new_hash = await verify_and_update_password_async(password, user.hashed_password)
+    if not valid:
         return templates.TemplateResponse(
             "auth/login.html", 
             {"request": request, "error": "Invalid username or password"}
@@ -48,6 +51,10 @@ async def login(
         data={"sub": str(user.id)}, expires_delta=access_token_expires
     )
     
+    # Store the password under the current hashing cost when that changed
+    if new_hash:
+        user.hashed_password = new_hash
+
     # Update last login
     user.update_last_login()
     db.commit()
@@ -1,16 +1,21 @@
 from fastapi import APIRouter, Depends, Request, Form, HTTPException, Query
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, asc, desc
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import asc, desc
 from datetime import datetime
 from typing import Optional
 import logging
 
-from app.database import get_db
+from app.database import get_db, get_read_db, run_db, ReadSession
 from app.models.user import User
 from app.models.client import Client
 from app.dependencies import get_current_user
+from app.utils.pagination import COUNT_PATTERN, fetch_page, total_pages, items_per_page, pager
+from app.utils.search import CLIENT_SEARCH_COLUMNS, CLIENT_SUGGEST_COLUMNS, prefix_filter, search_filter, search_rank
+from app.utils.responses import ORJSONResponse
+from app.utils.http_cache import make_etag, cache_headers, is_not_modified, not_modified_response
+from app.schemas.client import CLIENT_LIST_ADAPTER, CLIENT_SUGGEST_ADAPTER, ClientOut
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -19,16 +24,32 @@ templates = Jinja2Templates(directory="app/templates")
 async def clients_list(
     request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    page: int = Query(1, ge=1),
+    search: str = Query(None)
 ):
-    clients = db.query(Client).filter(Client.is_active == True).all()
+    # One page of active clients, loading only the columns the table shows
+    per_page = items_per_page(db)
+    query = db.query(Client).options(
+        load_only(
+            Client.id, Client.name, Client.surname, Client.company, Client.email,
+            Client.phone, Client.mobile, Client.city, Client.is_active
+        )
+    ).filter(Client.is_active == True)
+    if search:
+        query = query.filter(search_filter(db, CLIENT_SEARCH_COLUMNS, search))
+
+    query = query.order_by(asc(Client.name), asc(Client.id))
+    clients, total = fetch_page(query, (page - 1) * per_page, per_page)
     
     return templates.TemplateResponse(
         "clients/list.html", 
         {
             "request": request, 
             "user": current_user,
-            "clients": clients
+            "clients": clients,
+            "search": search,
+            "pager": pager(page, per_page, total, search=search)
         }
     )
 
@@ -131,137 +152,119 @@ async def client_create_post(
         # For now, we'll just redirect back to the form
         return RedirectResponse(url="/clients/create", status_code=302)
 
-@router.get("/api")
+@router.get("/api", response_class=ORJSONResponse)
 async def get_clients_api(
-    db: Session = Depends(get_db),
+    db: ReadSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(100, ge=1, le=1000, description="Items per page"),
     search: str = Query(None, description="Search clients by name, email, company, or phone"),
     is_active: bool = Query(True, description="Filter by active status"),
-    sort_by: str = Query("name", description="Sort by: name, email, company, created_at"),
-    sort_order: str = Query("asc", description="Sort order: asc or desc")
+    sort_by: str = Query("name", description="Sort by: name, email, company, created_at, relevance"),
+    sort_order: str = Query("asc", description="Sort order: asc or desc"),
+    count: str = Query("exact", pattern=COUNT_PATTERN, description="Total row count: exact, estimated, or none")
 ):
     """
     Get paginated list of clients with full contact information.
     Returns JSON data for API integration.
     """
-    try:
-        offset = (page - 1) * limit
-
-        # Base query
-        clients_query = db.query(Client)
-
-        # Apply active filter (default to active clients only)
-        clients_query = clients_query.filter(Client.is_active == is_active)
-
-        # Apply user filter (non-admin users only see their own clients if applicable)
-        # Note: Clients don't have a direct user relationship in this schema,
-        # but we can add this later if needed for multi-tenant scenarios
-
-        # Apply search filter if provided
-        if search:
-            search_term = f"%{search}%"
-            clients_query = clients_query.filter(
-                or_(
-                    Client.name.ilike(search_term),
-                    Client.surname.ilike(search_term),
-                    Client.email.ilike(search_term),
-                    Client.company.ilike(search_term),
-                    Client.phone.ilike(search_term),
-                    Client.mobile.ilike(search_term)
-                )
+    def load(db: Session):
+        try:
+            offset = (page - 1) * limit
+
+            # Base query
+            clients_query = db.query(Client)
+
+            # Apply active filter (default to active clients only)
+            clients_query = clients_query.filter(Client.is_active == is_active)
+
+            # Apply user filter (non-admin users only see their own clients if applicable)
+            # Note: Clients don't have a direct user relationship in this schema,
+            # but we can add this later if needed for multi-tenant scenarios
+
+            # Apply search filter if provided
+            if search:
+                clients_query = clients_query.filter(search_filter(db, CLIENT_SEARCH_COLUMNS, search))
+
+            # Apply sorting
+            sort_column = None
+            if sort_by == "name":
+                sort_column = Client.name
+            elif sort_by == "email":
+                sort_column = Client.email
+            elif sort_by == "company":
+                sort_column = Client.company
+            elif sort_by == "created_at":
+                sort_column = Client.created_at
+            else:
+                sort_column = Client.name  # Default fallback
+
+            if sort_by == "relevance" and search:
+                clients_query = clients_query.order_by(desc(search_rank(db, CLIENT_SEARCH_COLUMNS, search)), asc(Client.name))
+            elif sort_order.lower() == "desc":
+                clients_query = clients_query.order_by(desc(sort_column))
+            else:
+                clients_query = clients_query.order_by(asc(sort_column))
+
+            # Get paginated results and total count in one statement
+            clients, total_clients = fetch_page(clients_query, offset, limit, count)
+
+            clients_data = CLIENT_LIST_ADAPTER.dump_python(
+                CLIENT_LIST_ADAPTER.validate_python(clients, from_attributes=True)
             )
 
-        # Apply sorting
-        sort_column = None
-        if sort_by == "name":
-            sort_column = Client.name
-        elif sort_by == "email":
-            sort_column = Client.email
-        elif sort_by == "company":
-            sort_column = Client.company
-        elif sort_by == "created_at":
-            sort_column = Client.created_at
-        else:
-            sort_column = Client.name  # Default fallback
-
-        if sort_order.lower() == "desc":
-            clients_query = clients_query.order_by(desc(sort_column))
-        else:
-            clients_query = clients_query.order_by(asc(sort_column))
-
-        # Get paginated results
-        clients = clients_query.offset(offset).limit(limit).all()
-
-        # Get total count for pagination
-        total_query = db.query(Client).filter(Client.is_active == is_active)
-        if search:
-            search_term = f"%{search}%"
-            total_query = total_query.filter(
-                or_(
-                    Client.name.ilike(search_term),
-                    Client.surname.ilike(search_term),
-                    Client.email.ilike(search_term),
-                    Client.company.ilike(search_term),
-                    Client.phone.ilike(search_term),
-                    Client.mobile.ilike(search_term)
-                )
+            return ORJSONResponse({
+                "clients": clients_data,
+                "pagination": {
+                    "page": page,
+                    "limit": limit,
+                    "total": total_clients,
+                    "total_pages": total_pages(total_clients, limit)
+                },
+                "filters": {
+                    "search": search,
+                    "is_active": is_active,
+                    "sort_by": sort_by,
+                    "sort_order": sort_order,
+                    "count": count
+                }
+            })
+
+        except Exception as e:
+            logging.error(f"Unexpected error in get_clients_api: {str(e)}")
+            raise HTTPException(status_code=500, detail="An unexpected error occurred")
+
+    return await run_db(db, load)
+
+
+@router.get("/api/suggest", response_class=ORJSONResponse)
+async def suggest_clients(
+    db: ReadSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+    q: str = Query("", max_length=100, description="Words the client's name, surname, company or email start with"),
+    limit: int = Query(20, ge=1, le=50, description="Maximum number of suggestions")
+):
+    """
+    Active clients for the client pickers in the invoice and quote forms,
+    matched by prefix and ordered by name. An empty q returns the first
+    clients alphabetically.
+    """
+    def load(db: Session):
+        clients_query = db.query(Client).options(
+            load_only(Client.id, Client.name, Client.surname, Client.company, Client.email,
+                      Client.address_1, Client.city)
+        ).filter(Client.is_active == True)
+        if q.strip():
+            clients_query = clients_query.filter(prefix_filter(CLIENT_SUGGEST_COLUMNS, q))
+        clients = clients_query.order_by(Client.name, Client.id).limit(limit).all()
+
+        return ORJSONResponse({
+            "clients": CLIENT_SUGGEST_ADAPTER.dump_python(
+                CLIENT_SUGGEST_ADAPTER.validate_python(clients, from_attributes=True)
             )
-        total_clients = total_query.count()
-
-        # Format clients data
-        clients_data = []
-        for client in clients:
-            client_data = {
-                "id": client.id,
-                "is_active": client.is_active,
-                "name": client.name,
-                "surname": client.surname,
-                "company": client.company,
-                "email": client.email,
-                "phone": client.phone,
-                "fax": client.fax,
-                "mobile": client.mobile,
-                "website": client.website,
-                "address_1": client.address_1,
-                "address_2": client.address_2,
-                "city": client.city,
-                "state": client.state,
-                "zip_code": client.zip_code,
-                "country": client.country,
-                "language": client.language,
-                "gender": client.gender,
-                "birthdate": str(client.birthdate) if client.birthdate else None,
-                "vat_id": client.vat_id,
-                "tax_code": client.tax_code,
-                "abn": client.abn,
-                "title": client.title,
-                "notes": client.notes,
-                "created_at": client.created_at.isoformat() if hasattr(client, 'created_at') and client.created_at else None,
-                "updated_at": client.updated_at.isoformat() if hasattr(client, 'updated_at') and client.updated_at else None
-            }
-            clients_data.append(client_data)
-
-        return {
-            "clients": clients_data,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total_clients,
-                "total_pages": (total_clients + limit - 1) // limit
-            },
-            "filters": {
-                "search": search,
-                "is_active": is_active,
-                "sort_by": sort_by,
-                "sort_order": sort_order
-            }
-        }
+        })
 
-    except Exception as e:
-        logging.error(f"Unexpected error in get_clients_api: {str(e)}")
-        raise HTTPException(status_code=500, detail="An unexpected error occurred")
+    return await run_db(db, load)
 
 
 @router.get("/{client_id}", response_class=HTMLResponse)
@@ -307,60 +310,46 @@ async def client_edit(
     )
 
 
-@router.get("/{client_id}/api", response_class=JSONResponse)
+@router.get("/{client_id}/api", response_class=ORJSONResponse)
 async def get_client_api(
     client_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: ReadSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Get a specific client with full contact information.
     Returns JSON data for API integration.
+    Supports conditional GET via ETag/If-None-Match and Last-Modified.
     """
-    try:
-        client = db.query(Client).filter(Client.id == client_id).first()
-
-        if not client:
-            raise HTTPException(status_code=404, detail="Client not found")
-
-        # Check if client is active (unless admin)
-        if not client.is_active and not current_user.is_admin:
-            raise HTTPException(status_code=404, detail="Client not found")
-
-        # Format client data
-        client_data = {
-            "id": client.id,
-            "is_active": client.is_active,
-            "name": client.name,
-            "surname": client.surname,
-            "company": client.company,
-            "email": client.email,
-            "phone": client.phone,
-            "fax": client.fax,
-            "mobile": client.mobile,
-            "website": client.website,
-            "address_1": client.address_1,
-            "address_2": client.address_2,
-            "city": client.city,
-            "state": client.state,
-            "zip_code": client.zip_code,
-            "country": client.country,
-            "language": client.language,
-            "gender": client.gender,
-            "birthdate": str(client.birthdate) if client.birthdate else None,
-            "vat_id": client.vat_id,
-            "tax_code": client.tax_code,
-            "abn": client.abn,
-            "title": client.title,
-            "notes": client.notes,
-            "created_at": client.created_at.isoformat() if hasattr(client, 'created_at') and client.created_at else None,
-            "updated_at": client.updated_at.isoformat() if hasattr(client, 'updated_at') and client.updated_at else None
-        }
+    def load(db: Session):
+        try:
+            version = db.query(Client.is_active, Client.updated_at).filter(Client.id == client_id).first()
 
-        return client_data
+            if not version:
+                raise HTTPException(status_code=404, detail="Client not found")
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        logging.error(f"Unexpected error in get_client_api: {str(e)}")
-        raise HTTPException(status_code=500, detail="An unexpected error occurred")
+            # Check if client is active (unless admin)
+            if not version.is_active and not current_user.is_admin:
+                raise HTTPException(status_code=404, detail="Client not found")
+
+            etag = make_etag(client_id, version.updated_at)
+            if is_not_modified(request, etag, version.updated_at):
+                return not_modified_response(etag, version.updated_at)
+
+            client = db.query(Client).filter(Client.id == client_id).first()
+            if not client:
+                raise HTTPException(status_code=404, detail="Client not found")
+
+            return ORJSONResponse(
+                ClientOut.model_validate(client).model_dump(),
+                headers=cache_headers(etag, version.updated_at)
+            )
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logging.error(f"Unexpected error in get_client_api: {str(e)}")
+            raise HTTPException(status_code=500, detail="An unexpected error occurred")
+
+    return await run_db(db, load)
@@ -1,14 +1,15 @@
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, load_only
 from sqlalchemy import func
 
-from app.database import get_db
+from app.database import get_read_db, run_db, ReadSession
 from app.models.user import User
 from app.models.client import Client
 from app.models.invoice import Invoice, InvoiceStatus
 from app.dependencies import get_current_user
+from app.utils.dashboard_cache import get_cached_stats
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -22,7 +23,7 @@ async def keepalive():
 @router.get("/dashboard", response_class=HTMLResponse)
 async def dashboard(
     request: Request, 
-    db: Session = Depends(get_db),
+    db: ReadSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     # Get dashboard statistics
@@ -37,40 +38,62 @@ async def dashboard(
         }
     )
 
-async def get_dashboard_stats(db: Session, user: User) -> dict:
-    """Get dashboard statistics"""
-    
+async def get_dashboard_stats(db: ReadSession, user: User) -> dict:
+    """Get dashboard statistics, cached per user until their invoices change"""
+    return await run_db(db, lambda session: get_cached_stats(user, lambda: _compute_dashboard_stats(session, user)))
+
+
+def _compute_dashboard_stats(db: Session, user: User) -> dict:
+    """
+    Dashboard statistics in three queries: one aggregate over invoices using
+    FILTER clauses for the per-status counts and sums, one over clients, and
+    the recent invoices list. Only plain values are returned so the result
+    can outlive the session in the cache.
+    """
+    open_statuses = [InvoiceStatus.SENT, InvoiceStatus.VIEWED, InvoiceStatus.OVERDUE]
+    invoice_stats = db.query(
+        func.count(Invoice.id),
+        func.count(Invoice.id).filter(Invoice.status == InvoiceStatus.DRAFT),
+        func.count(Invoice.id).filter(Invoice.status == InvoiceStatus.SENT),
+        func.count(Invoice.id).filter(Invoice.status == InvoiceStatus.PAID),
+        func.count(Invoice.id).filter(Invoice.status == InvoiceStatus.OVERDUE),
+        func.coalesce(func.sum(Invoice.total).filter(Invoice.status == InvoiceStatus.PAID), 0),
+        func.coalesce(func.sum(Invoice.balance).filter(Invoice.status.in_(open_statuses)), 0),
+    )
+    recent_query = db.query(Invoice).options(
+        load_only(Invoice.id, Invoice.invoice_number, Invoice.client_id, Invoice.issue_date,
+                  Invoice.total, Invoice.status, Invoice.created_at),
+        joinedload(Invoice.client).load_only(Client.id, Client.name, Client.surname, Client.company)
+    )
+
     # Base query filters based on user role
-    invoice_query = db.query(Invoice)
-    client_query = db.query(Client)
-    
     if not user.is_admin:
-        invoice_query = invoice_query.filter(Invoice.user_id == user.id)
+        invoice_stats = invoice_stats.filter(Invoice.user_id == user.id)
+        recent_query = recent_query.filter(Invoice.user_id == user.id)
         # For now, all users can see all clients (adjust as needed)
-    
-    # Invoice statistics
-    total_invoices = invoice_query.count()
-    draft_invoices = invoice_query.filter(Invoice.status == InvoiceStatus.DRAFT).count()
-    sent_invoices = invoice_query.filter(Invoice.status == InvoiceStatus.SENT).count()
-    paid_invoices = invoice_query.filter(Invoice.status == InvoiceStatus.PAID).count()
-    overdue_invoices = invoice_query.filter(Invoice.status == InvoiceStatus.OVERDUE).count()
-    
-    # Financial statistics
-    total_revenue = invoice_query.filter(Invoice.status == InvoiceStatus.PAID).with_entities(
-        func.sum(Invoice.total)
-    ).scalar() or 0
-    
-    outstanding_amount = invoice_query.filter(
-        Invoice.status.in_([InvoiceStatus.SENT, InvoiceStatus.VIEWED, InvoiceStatus.OVERDUE])
-    ).with_entities(func.sum(Invoice.balance)).scalar() or 0
-    
+
+    total_invoices, draft_invoices, sent_invoices, paid_invoices, overdue_invoices, \
+        total_revenue, outstanding_amount = invoice_stats.one()
+
     # Client statistics
-    total_clients = client_query.count()
-    active_clients = client_query.filter(Client.is_active == True).count()
-    
+    total_clients, active_clients = db.query(
+        func.count(Client.id),
+        func.count(Client.id).filter(Client.is_active == True),
+    ).one()
+
     # Recent invoices (last 5)
-    recent_invoices = invoice_query.order_by(Invoice.created_at.desc()).limit(5).all()
-    
+    recent_invoices = [
+        {
+            "id": invoice.id,
+            "invoice_number": invoice.invoice_number,
+            "client": {"display_name": invoice.client.display_name if invoice.client else ""},
+            "issue_date": invoice.issue_date,
+            "total": float(invoice.total or 0),
+            "status": invoice.status_enum,
+        }
+        for invoice in recent_query.order_by(Invoice.created_at.desc()).limit(5)
+    ]
+
     return {
         "invoices": {
             "total": total_invoices,
@@ -1,235 +1,462 @@
 from fastapi import APIRouter, Depends, Request, HTTPException, Query, Form
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_, asc, desc
+from sqlalchemy.orm import Session, joinedload, selectinload, load_only
+from sqlalchemy import asc, desc, func, insert, update
 import logging
-from datetime import datetime, date
+from datetime import datetime, date, time
+from typing import Optional
+from decimal import Decimal
 import secrets
 import traceback
+import csv
+import io
+import orjson
 
-from app.database import get_db
+from app.database import get_db, SessionLocal, get_read_db, run_db, ReadSession
 from app.models.user import User
-from app.models.invoice import Invoice, InvoiceItem, InvoiceStatus
+from app.models.invoice import OVERDUE_STATUSES, Invoice, InvoiceItem, InvoiceStatus
 from app.models.client import Client
+from app.models.product import Product
 from app.models.invoicesettings import InvoiceSettings
 from app.dependencies import get_current_user
+from app.utils.pagination import (
+    COUNT_PATTERN, fetch_page, count_rows, total_pages, items_per_page, pager,
+    encode_cursor, decode_cursor, order_by_keyset, apply_keyset
+)
+from app.utils.search import INVOICE_SEARCH_COLUMNS, invoice_search_filter, search_rank
+from app.utils.responses import ORJSONResponse
+from app.utils.invoice_numbers import allocate_invoice_number
+from app.utils.calculations import ItemInput, calculate_document, to_decimal
+from app.utils.recalculation import DEFAULT_BATCH_SIZE, recalculate_invoice_totals
+from app.utils.http_cache import make_etag, latest, cache_headers, is_not_modified, not_modified_response
+from app.schemas.invoice import INVOICE_STATUS_NAMES, InvoiceOut, invoice_list_adapter
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
 
-@router.get("/api")
+# Invoice header fields selectable through `fields=` on /invoices/api,
+# mapped to the columns each one needs loaded
+INVOICE_API_FIELDS = {
+    "id": ("id",),
+    "invoice_number": ("invoice_number",),
+    "status": ("status",),
+    "status_name": ("status",),
+    "issue_date": ("issue_date",),
+    "due_date": ("due_date",),
+    "terms": ("terms",),
+    "notes": ("notes",),
+    "url_key": ("url_key",),
+    "subtotal": ("subtotal",),
+    "tax_total": ("tax_total",),
+    "discount_amount": ("discount_amount",),
+    "discount_percentage": ("discount_percentage",),
+    "total": ("total",),
+    "paid_amount": ("paid_amount",),
+    "balance": ("balance",),
+    "is_overdue": ("status", "due_date"),
+    "days_overdue": ("status", "due_date"),
+    "user_id": ("user_id",),
+    "created_at": ("created_at",),
+    "updated_at": ("updated_at",),
+}
+
+# Related data selectable through `include=` on /invoices/api
+INVOICE_API_INCLUDES = ("items", "client", "user")
+
+# Rows fetched per round trip by /invoices/export
+EXPORT_BATCH_SIZE = 500
+
+# Invoice item columns stored as Numeric(10, 2), compared at that precision when diffing
+ITEM_MONEY_COLUMNS = ("quantity", "price", "discount_amount", "subtotal", "tax_amount", "total")
+CENT = Decimal("0.01")
+
+# Flattened item columns used by the CSV export
+EXPORT_ITEM_COLUMNS = (
+    "id", "name", "description", "quantity", "price",
+    "subtotal", "tax_amount", "discount_amount", "total",
+)
+
+def _parse_csv_param(value: str, allowed, param_name: str) -> list:
+    """Split a comma separated query parameter and reject unknown names"""
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown {param_name}: {', '.join(unknown)}. Allowed: {', '.join(allowed)}"
+        )
+    return names
+
+
+def _invoice_list_query(db: Session, current_user: User, status: str = None, search: str = None, includes=()):
+    """
+    Build the filtered invoice query shared by the list and export endpoints.
+    Related data is only loaded when included: many-to-one relations are
+    joined, the items collection is fetched with one extra IN query so invoice
+    rows are not multiplied by their items.
+    """
+    invoices_query = db.query(Invoice)
+    if "client" in includes:
+        invoices_query = invoices_query.options(
+            joinedload(Invoice.client).load_only(Client.id, Client.name, Client.email, Client.address_1, Client.phone)
+        )
+    if "items" in includes:
+        invoices_query = invoices_query.options(
+            selectinload(Invoice.items).joinedload(InvoiceItem.product)
+        )
+    if "user" in includes:
+        invoices_query = invoices_query.options(
+            joinedload(Invoice.user).load_only(User.id, User.username, User.email)
+        )
+
+    # Apply user filter (non-admin users only see their own invoices)
+    if not current_user.is_admin:
+        invoices_query = invoices_query.filter(Invoice.user_id == current_user.id)
+
+    # Apply status filter if provided
+    if status:
+        status_map = {
+            'draft': 1, 'sent': 2, 'viewed': 3, 'paid': 4, 'overdue': 5, 'cancelled': 6
+        }
+        if status == 'overdue':
+            # Includes invoices past due that the sweeper has not flipped yet
+            invoices_query = invoices_query.filter(Invoice.is_overdue)
+        elif status in status_map:
+            invoices_query = invoices_query.filter(Invoice.status == status_map[status])
+
+    # Apply search filter if provided
+    if search:
+        invoices_query = invoices_query.filter(invoice_search_filter(db, search))
+
+    return invoices_query
+
+
+def _invoice_load_only(header_fields, includes, *extra_columns):
+    """load_only() option covering the columns the requested fields need"""
+    columns = {"id", *extra_columns}
+    for name in header_fields:
+        columns.update(INVOICE_API_FIELDS[name])
+    if "client" in includes:
+        columns.add("client_id")
+    if "user" in includes:
+        columns.add("user_id")
+    return load_only(*(getattr(Invoice, column) for column in sorted(columns)))
+
+
+def _serialize_invoices(invoices, header_fields, includes, mode: str = "python") -> list:
+    """Serialize invoices with the requested fields and related data"""
+    adapter = invoice_list_adapter(tuple(header_fields), tuple(includes))
+    return adapter.dump_python(adapter.validate_python(invoices, from_attributes=True), mode=mode)
+
+
+def _item_value_changed(column: str, new_value, old_value) -> bool:
+    """Compare a submitted item value with the stored one at column precision"""
+    if column in ITEM_MONEY_COLUMNS:
+        if new_value is None or old_value is None:
+            return new_value != old_value
+        return Decimal(str(new_value)).quantize(CENT) != Decimal(str(old_value)).quantize(CENT)
+    return new_value != old_value
+
+
+def _sync_invoice_items(db: Session, invoice_id: int, submitted_items: list):
+    """
+    Bring an invoice's items in line with the submitted rows.
+    Rows are matched to the stored items by id: stored items that changed are
+    updated, rows without a (known) id are inserted and stored items that were
+    not submitted are deleted. Each of the three runs as one bulk statement and
+    untouched items keep their ids, timestamps and product links.
+    Returns (inserted, updated, deleted) counts.
+    """
+    columns = ("name", "description", "quantity", "price", "discount_amount",
+               "subtotal", "tax_amount", "total", "order", "product_id")
+    existing = {
+        row.id: row for row in db.query(
+            InvoiceItem.id, *(getattr(InvoiceItem, column) for column in columns)
+        ).filter(InvoiceItem.invoice_id == invoice_id)
+    }
+
+    inserts, updates, kept_ids = [], [], set()
+    for values in submitted_items:
+        item_id = values.get("id")
+        stored = existing.get(item_id)
+        if stored is None or item_id in kept_ids:
+            # New row, or an id that does not belong to this invoice
+            new_values = {key: value for key, value in values.items() if key != "id"}
+            inserts.append({"invoice_id": invoice_id, **new_values})
+            continue
+
+        kept_ids.add(item_id)
+        changes = {
+            column: values[column] for column in columns
+            if column in values and _item_value_changed(column, values[column], getattr(stored, column))
+        }
+        if changes:
+            updates.append({"id": item_id, **changes})
+
+    removed_ids = [item_id for item_id in existing if item_id not in kept_ids]
+
+    if removed_ids:
+        db.query(InvoiceItem).filter(
+            InvoiceItem.invoice_id == invoice_id, InvoiceItem.id.in_(removed_ids)
+        ).delete(synchronize_session=False)
+    # Bulk UPDATE by primary key; rows are grouped by the set of changed columns
+    if updates:
+        db.execute(update(InvoiceItem), updates)
+    if inserts:
+        db.execute(insert(InvoiceItem), inserts)
+
+    return len(inserts), len(updates), len(removed_ids)
+
+
+@router.get("/api", response_class=ORJSONResponse)
 async def get_invoices_api(
-    db: Session = Depends(get_db),
+    db: ReadSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(100, ge=1, le=1000, description="Items per page"),
     search: str = Query(None, description="Search invoices by number, client name, or notes"),
     status: str = Query(None, description="Filter by status: draft, sent, viewed, paid, overdue, cancelled"),
-    sort_by: str = Query("created_at", description="Sort by: created_at, issue_date, due_date, total, invoice_number"),
-    sort_order: str = Query("desc", description="Sort order: asc or desc")
+    sort_by: str = Query("created_at", description="Sort by: created_at, issue_date, due_date, total, invoice_number, days_overdue, relevance"),
+    sort_order: str = Query("desc", description="Sort order: asc or desc"),
+    cursor: str = Query(None, description="Opaque cursor from a previous response's next_cursor; overrides page"),
+    count: str = Query("exact", pattern=COUNT_PATTERN, description="Total row count: exact, estimated, or none"),
+    fields: str = Query(None, description="Comma separated invoice fields to return (default: all)"),
+    include: str = Query("items,client", description="Comma separated related data to embed: items, client, user")
 ):
     """
     Get paginated list of invoices with full details including items and client information.
     Returns JSON data for API integration.
-    """
-    try:
-        offset = (page - 1) * limit
 
-        # Base query with eager loading of related data
-        invoices_query = db.query(Invoice).options(
-            joinedload(Invoice.client),
-            joinedload(Invoice.items).joinedload(InvoiceItem.product),
-            joinedload(Invoice.user)
-        )
+    Supports two paging modes: classic page/limit, and keyset paging where the
+    client passes back the `next_cursor` from the previous response. Keyset
+    paging costs the same for every page, so use it for walking the whole table.
 
-        # Apply user filter (non-admin users only see their own invoices)
-        if not current_user.is_admin:
-            invoices_query = invoices_query.filter(Invoice.user_id == current_user.id)
-
-        # Apply status filter if provided
-        if status:
-            status_map = {
-                'draft': 1, 'sent': 2, 'viewed': 3, 'paid': 4, 'overdue': 5, 'cancelled': 6
-            }
-            if status in status_map:
-                invoices_query = invoices_query.filter(Invoice.status == status_map[status])
-
-        # Apply search filter if provided
-        if search:
-            search_term = f"%{search}%"
-            invoices_query = invoices_query.filter(
-                or_(
-                    Invoice.invoice_number.ilike(search_term),
-                    Invoice.notes.ilike(search_term),
-                    Invoice.terms.ilike(search_term),
-                    Invoice.client.has(Client.name.ilike(search_term)) if hasattr(Client, 'name') else True
+    `fields` and `include` trim the response; columns and relationships that
+    are not requested are not loaded from the database at all.
+    """
+    def load(db: Session):
+        try:
+            offset = (page - 1) * limit
+
+            header_fields = _parse_csv_param(fields, INVOICE_API_FIELDS, "fields") if fields else list(INVOICE_API_FIELDS)
+            includes = _parse_csv_param(include or "", INVOICE_API_INCLUDES, "include")
+
+            invoices_query = _invoice_list_query(db, current_user, status, search, includes)
+
+            # Apply sorting
+            sort_column = None
+            if sort_by == "created_at":
+                sort_column = Invoice.created_at
+            elif sort_by == "issue_date":
+                sort_column = Invoice.issue_date
+            elif sort_by == "due_date":
+                sort_column = Invoice.due_date
+            elif sort_by == "total":
+                sort_column = Invoice.total
+            elif sort_by == "invoice_number":
+                sort_column = Invoice.invoice_number
+            else:
+                sort_column = Invoice.created_at  # Default fallback
+
+            # Only load the columns the requested fields (and the sort/cursor) need
+            invoices_query = invoices_query.options(_invoice_load_only(header_fields, includes, sort_column.key))
+
+            # Relevance ranking only applies to a search; neither it nor days_overdue
+            # (computed by the database) has a cursor position
+            by_relevance = sort_by == "relevance" and bool(search)
+            by_expression = by_relevance or sort_by == "days_overdue"
+            if by_expression and cursor:
+                raise HTTPException(status_code=400, detail=f"Cursor paging is not available when sorting by {sort_by}")
+
+            # Order by (sort column, id) so rows with equal sort values page deterministically
+            descending = sort_order.lower() == "desc"
+            if by_relevance:
+                invoices_query = invoices_query.order_by(
+                    desc(search_rank(db, INVOICE_SEARCH_COLUMNS, search)), desc(Invoice.id)
                 )
-            )
-
-        # Apply sorting
-        sort_column = None
-        if sort_by == "created_at":
-            sort_column = Invoice.created_at
-        elif sort_by == "issue_date":
-            sort_column = Invoice.issue_date
-        elif sort_by == "due_date":
-            sort_column = Invoice.due_date
-        elif sort_by == "total":
-            sort_column = Invoice.total
-        elif sort_by == "invoice_number":
-            sort_column = Invoice.invoice_number
-        else:
-            sort_column = Invoice.created_at  # Default fallback
-
-        if sort_order.lower() == "desc":
-            invoices_query = invoices_query.order_by(desc(sort_column))
-        else:
-            invoices_query = invoices_query.order_by(asc(sort_column))
-
-        # Get paginated results
-        invoices = invoices_query.offset(offset).limit(limit).all()
-
-        # Get total count for pagination
-        total_query = db.query(Invoice)
-        if not current_user.is_admin:
-            total_query = total_query.filter(Invoice.user_id == current_user.id)
-        if status:
-            if status in status_map:
-                total_query = total_query.filter(Invoice.status == status_map[status])
-        if search:
-            search_term = f"%{search}%"
-            total_query = total_query.filter(
-                or_(
-                    Invoice.invoice_number.ilike(search_term),
-                    Invoice.notes.ilike(search_term),
-                    Invoice.terms.ilike(search_term),
-                    Invoice.client.has(Client.name.ilike(search_term)) if hasattr(Client, 'name') else True
+            elif sort_by == "days_overdue":
+                direction = desc if descending else asc
+                invoices_query = invoices_query.order_by(direction(Invoice.days_overdue), direction(Invoice.id))
+            else:
+                invoices_query = order_by_keyset(invoices_query, sort_column, Invoice.id, descending)
+            filtered_query = invoices_query
+
+            # Keyset paging: continue after the last row of the previous page
+            if cursor:
+                try:
+                    position = decode_cursor(cursor)
+                except ValueError:
+                    raise HTTPException(status_code=400, detail="Invalid cursor")
+                if position["sort_by"] != sort_by or position["sort_order"] != sort_order.lower():
+                    raise HTTPException(status_code=400, detail="Cursor does not match sort_by/sort_order")
+                invoices_query = apply_keyset(
+                    invoices_query, sort_column, Invoice.id, descending, position["value"], position["id"]
                 )
-            )
-        total_invoices = total_query.count()
-
-        # Format invoices data with full details
-        invoices_data = []
-        for invoice in invoices:
-            # Client information
-            client_data = None
-            if invoice.client:
-                client_data = {
-                    "id": invoice.client.id,
-                    "name": getattr(invoice.client, 'name', None) or f"{getattr(invoice.client, 'client_name', '')} {getattr(invoice.client, 'client_surname', '')}".strip(),
-                    "email": getattr(invoice.client, 'email', None) or getattr(invoice.client, 'client_email', None),
-                    "address": getattr(invoice.client, 'address_1', None)
+                offset = 0
+
+            # Get paginated results and the total in one statement. Behind a cursor the
+            # window would only see rows after it, so the total is counted separately.
+            if cursor:
+                invoices, _ = fetch_page(invoices_query, offset, limit, count="none")
+                total_invoices = count_rows(filtered_query, count)
+            else:
+                invoices, total_invoices = fetch_page(invoices_query, offset, limit, count)
+
+            # Cursor for the next page, only when this page was full
+            next_cursor = None
+            if len(invoices) == limit and not by_expression:
+                last_invoice = invoices[-1]
+                next_cursor = encode_cursor(
+                    sort_by, sort_order.lower(), getattr(last_invoice, sort_column.key), last_invoice.id
+                )
+
+            # Format invoices data with the requested fields and related data
+            invoices_data = _serialize_invoices(invoices, header_fields, includes)
+
+            return ORJSONResponse({
+                "invoices": invoices_data,
+                "pagination": {
+                    "page": page,
+                    "limit": limit,
+                    "total": total_invoices,
+                    "total_pages": total_pages(total_invoices, limit),
+                    "next_cursor": next_cursor
+                },
+                "filters": {
+                    "search": search,
+                    "status": status,
+                    "sort_by": sort_by,
+                    "sort_order": sort_order,
+                    "count": count,
+                    "fields": header_fields,
+                    "include": includes
                 }
+            })
 
-            # Invoice items
-            items_data = []
-            for item in invoice.items:
-                product_data = None
-                if item.product:
-                    product_data = {
-                        "id": item.product.id,
-                        "name": item.product.name,
-                        "sku": item.product.sku
-                    }
-
-                items_data.append({
-                    "id": item.id,
-                    "name": item.name,
-                    "description": item.description,
-                    "quantity": float(item.quantity) if item.quantity is not None else 0,
-                    "price": float(item.price) if item.price is not None else 0,
-                    "subtotal": float(item.subtotal) if item.subtotal is not None else 0,
-                    "tax_amount": float(item.tax_amount) if item.tax_amount is not None else 0,
-                    "discount_amount": float(item.discount_amount) if item.discount_amount is not None else 0,
-                    "total": float(item.total) if item.total is not None else 0,
-                    "product": product_data
-                })
-
-            # Status name
-            status_names = {
-                1: 'draft', 2: 'sent', 3: 'viewed', 4: 'paid', 5: 'overdue', 6: 'cancelled'
-            }
-            status_name = status_names.get(invoice.status, 'unknown')
+        except HTTPException:
+            raise
+        except Exception as e:
+            logging.error(f"Unexpected error in get_invoices_api: {str(e)}")
+            raise HTTPException(status_code=500, detail="An unexpected error occurred")
 
-            invoice_data = {
-                "id": invoice.id,
-                "invoice_number": invoice.invoice_number,
-                "status": invoice.status,
-                "status_name": status_name,
-                "issue_date": str(invoice.issue_date) if invoice.issue_date else None,
-                "due_date": str(invoice.due_date) if invoice.due_date else None,
-                "terms": invoice.terms,
-                "notes": invoice.notes,
-                "url_key": invoice.url_key,
-                "subtotal": float(invoice.subtotal) if invoice.subtotal is not None else 0,
-                "tax_total": float(invoice.tax_total) if invoice.tax_total is not None else 0,
-                "discount_amount": float(invoice.discount_amount) if invoice.discount_amount is not None else 0,
-                "discount_percentage": float(invoice.discount_percentage) if invoice.discount_percentage is not None else 0,
-                "total": float(invoice.total) if invoice.total is not None else 0,
-                "paid_amount": float(invoice.paid_amount) if invoice.paid_amount is not None else 0,
-                "balance": float(invoice.balance) if invoice.balance is not None else 0,
-                "is_overdue": getattr(invoice, 'is_overdue', False),
-                "days_overdue": getattr(invoice, 'days_overdue', 0),
-                "client": client_data,
-                "items": items_data,
-                "user_id": invoice.user_id,
-                "created_at": invoice.created_at.isoformat() if hasattr(invoice, 'created_at') and invoice.created_at else None,
-                "updated_at": invoice.updated_at.isoformat() if hasattr(invoice, 'updated_at') and invoice.updated_at else None
-            }
-            invoices_data.append(invoice_data)
-
-        return {
-            "invoices": invoices_data,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total_invoices,
-                "total_pages": (total_invoices + limit - 1) // limit
-            },
-            "filters": {
-                "search": search,
-                "status": status,
-                "sort_by": sort_by,
-                "sort_order": sort_order
-            }
-        }
+    return await run_db(db, load)
 
-    except Exception as e:
-        logging.error(f"Unexpected error in get_invoices_api: {str(e)}")
-        raise HTTPException(status_code=500, detail="An unexpected error occurred")
+@router.get("/export")
+async def export_invoices(
+    current_user: User = Depends(get_current_user),
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description="Output format: ndjson or csv"),
+    search: str = Query(None, description="Search invoices by number, client name, or notes"),
+    status: str = Query(None, description="Filter by status: draft, sent, viewed, paid, overdue, cancelled"),
+    fields: str = Query(None, description="Comma separated invoice fields to export (default: all)"),
+    include: str = Query("", description="Comma separated related data to embed: items, client, user")
+):
+    """
+    Stream every invoice matching the same filters as /invoices/api.
+    Rows are read through a server-side cursor in batches and written out as
+    they arrive, so memory use does not depend on the size of the export.
+    NDJSON emits one invoice per line; CSV emits one line per item when items
+    are included, repeating the invoice columns.
+    """
+    header_fields = _parse_csv_param(fields, INVOICE_API_FIELDS, "fields") if fields else list(INVOICE_API_FIELDS)
+    includes = _parse_csv_param(include or "", INVOICE_API_INCLUDES, "include")
+
+    def generate():
+        # The request's session is released when the endpoint returns, so the
+        # stream owns its own session for as long as the client keeps reading
+        export_db = SessionLocal()
+        try:
+            invoices_query = _invoice_list_query(export_db, current_user, status, search, includes)
+            invoices_query = invoices_query.options(
+                _invoice_load_only(header_fields, includes)
+            ).order_by(Invoice.id).yield_per(EXPORT_BATCH_SIZE)
+
+            if export_format == "ndjson":
+                for invoice in invoices_query:
+                    yield orjson.dumps(_serialize_invoices([invoice], header_fields, includes)[0]) + b"\n"
+                return
+
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            columns = list(header_fields)
+            if "client" in includes:
+                columns += ["client_id", "client_name", "client_email"]
+            if "user" in includes:
+                columns += ["user_username"]
+            if "items" in includes:
+                columns += [f"item_{column}" for column in EXPORT_ITEM_COLUMNS] + ["item_product_sku"]
+            writer.writerow(columns)
+
+            for invoice in invoices_query:
+                data = _serialize_invoices([invoice], header_fields, includes, mode="json")[0]
+                row = [data[name] for name in header_fields]
+                if "client" in includes:
+                    client = data["client"] or {}
+                    row += [client.get("id"), client.get("name"), client.get("email")]
+                if "user" in includes:
+                    row += [(data["user"] or {}).get("username")]
+                if "items" in includes:
+                    for item in data["items"] or [{}]:
+                        product = item.get("product") or {}
+                        writer.writerow(row + [item.get(column) for column in EXPORT_ITEM_COLUMNS] + [product.get("sku")])
+                else:
+                    writer.writerow(row)
+
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        finally:
+            export_db.close()
+
+    media_type = "application/x-ndjson" if export_format == "ndjson" else "text/csv"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=invoices.{export_format}"}
+    )
 
 @router.get("/", response_class=HTMLResponse)
 async def invoices_list(
     request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    page: int = Query(1, ge=1),
+    search: str = Query(None),
+    status: str = Query(None)
 ):
-    # Get invoices based on user role
-    query = db.query(Invoice)
-    if not current_user.is_admin:
-        query = query.filter(Invoice.user_id == current_user.id)
-    
-    invoices = query.order_by(Invoice.created_at.desc()).all()
-    
+    # Get one page of invoices based on user role, loading only the columns the table shows
+    per_page = items_per_page(db)
+    query = _invoice_list_query(db, current_user, status, search).options(
+        load_only(
+            Invoice.id, Invoice.invoice_number, Invoice.client_id, Invoice.issue_date,
+            Invoice.due_date, Invoice.total, Invoice.status
+        ),
+        joinedload(Invoice.client).load_only(Client.id, Client.name, Client.surname, Client.company)
+    ).order_by(Invoice.created_at.desc(), Invoice.id.desc())
+
+    invoices, total = fetch_page(query, (page - 1) * per_page, per_page)
+
     return templates.TemplateResponse(
         "invoices/list.html", 
         {
             "request": request, 
             "user": current_user,
-            "invoices": invoices
+            "invoices": invoices,
+            "search": search,
+            "status": status,
+            "statuses": INVOICE_STATUS_NAMES,
+            "pager": pager(page, per_page, total, search=search, status=status)
         }
     )
 
 
 @router.get("/create", response_class=HTMLResponse)
 async def create_invoice(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    clients = db.query(Client).all()
+    # Clients are fetched by the form's client picker from /clients/api/suggest
     current_date = date.today().isoformat()
     return templates.TemplateResponse("invoices/create.html", {
         "request": request,
         "user": current_user,
-        "clients": clients,
         "current_date": current_date
     })
 
@@ -254,6 +481,32 @@ async def invoice_create_post_redirect(
         invoice_date, due_date, payment_method, invoice_terms
     )
 
+@router.post("/recalculate-totals")
+async def recalculate_totals(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=100000, description="Invoice ids per UPDATE"),
+    start_id: Optional[int] = Query(None, ge=1, description="First invoice id to recalculate"),
+    end_id: Optional[int] = Query(None, ge=1, description="Last invoice id to recalculate"),
+):
+    """
+    Re-derive stored invoice totals and balances from invoice items and payments.
+    Requires admin privileges.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+
+    try:
+        result = recalculate_invoice_totals(db, batch_size=batch_size, start_id=start_id, end_id=end_id)
+    except Exception as e:
+        db.rollback()
+        logging.error(f"Error recalculating invoice totals: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error recalculating invoice totals: {str(e)}")
+
+    logging.info(f"Recalculated invoice totals: {result}")
+    return result
+
+
 @router.get("/verify-import")
 async def verify_imported_invoices(
     db: Session = Depends(get_db),
@@ -389,8 +642,6 @@ async def edit_invoice(
     if not current_user.is_admin and invoice.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Permission denied")
 
-    clients = db.query(Client).all()
-    
     # Load invoice settings
     invoice_settings = db.query(InvoiceSettings).first()
     if not invoice_settings:
@@ -405,7 +656,6 @@ async def edit_invoice(
             "request": request,
             "user": current_user,
             "invoice": invoice,
-            "clients": clients,
             "invoice_settings": invoice_settings,
             "title": f"Edit Invoice #{invoice.invoice_number}",
         },
@@ -477,13 +727,9 @@ async def edit_invoice_post(
         invoice.terms = terms
         invoice.notes = notes
 
-        # Delete existing items
-        db.query(InvoiceItem).filter(InvoiceItem.invoice_id == invoice_id).delete()
-
         # Process invoice items
-        subtotal = 0
-        tax_total = 0
-        item_count = 0
+        rows = []
+        item_inputs = []
 
         for i in range(items_count):
             item_name = form_data.get(f"item_name_{i}")
@@ -497,64 +743,66 @@ async def edit_invoice_post(
             item_tax_rate_str = form_data.get(f"item_tax_rate_{i}", "0")
 
             try:
-                item_quantity = float(item_quantity_str) if item_quantity_str else 1
-                item_price = float(item_price_str) if item_price_str else 0
-                item_discount = float(item_discount_str) if item_discount_str else 0
-                item_tax_rate = float(item_tax_rate_str) if item_tax_rate_str else 0
+                item_input = ItemInput(
+                    quantity=to_decimal(item_quantity_str, default=Decimal("1")),
+                    price=to_decimal(item_price_str),
+                    tax_rate=to_decimal(item_tax_rate_str),
+                    discount_amount=to_decimal(item_discount_str),
+                )
             except ValueError as e:
                 logging.error(f"Error parsing item {i} values: quantity={item_quantity_str}, price={item_price_str}, discount={item_discount_str}, tax_rate={item_tax_rate_str}")
                 continue
 
-            # Calculate item totals
-            item_subtotal = item_quantity * item_price
-            item_tax_amount = (item_subtotal - item_discount) * (item_tax_rate / 100)
-            item_total = item_subtotal - item_discount + item_tax_amount
-
-            # Create new invoice item
-            invoice_item = InvoiceItem(
-                invoice_id=invoice_id,
-                name=item_name.strip(),
-                description=item_description.strip() if item_description else None,
-                quantity=item_quantity,
-                price=item_price,
-                discount_amount=item_discount,
-                subtotal=item_subtotal,
-                tax_amount=item_tax_amount,
-                total=item_total,
-                order=i
-            )
-
-            # Try to link to product if item_id is provided
-            item_id = form_data.get(f"item_id_{i}")
-            if item_id and item_id.isdigit() and int(item_id) > 0:
-                invoice_item.product_id = int(item_id)
+            rows.append((i, item_name, item_description))
+            item_inputs.append(item_input)
+
+        totals = calculate_document(
+            item_inputs,
+            discount_amount=discount_amount or 0,
+            discount_percentage=discount_percentage or 0,
+            paid_amount=invoice.paid_amount or 0,
+        )
 
-            db.add(invoice_item)
-            item_count += 1
+        submitted_items = []
+        for (i, item_name, item_description), item_input, line in zip(rows, item_inputs, totals.items):
+            item_values = {
+                "name": item_name.strip(),
+                "description": item_description.strip() if item_description else None,
+                "quantity": item_input.quantity,
+                "price": item_input.price,
+                "discount_amount": line.discount_amount,
+                "subtotal": line.subtotal,
+                "tax_amount": line.tax_amount,
+                "total": line.total,
+                "order": i,
+            }
 
-            # Accumulate totals
-            subtotal += item_subtotal
-            tax_total += item_tax_amount
+            # item_id_N is the id of the invoice item the row was rendered from (empty for new rows)
+            item_id = form_data.get(f"item_id_{i}")
+            if item_id and item_id.isdigit():
+                item_values["id"] = int(item_id)
 
-        logging.info(f"Processed {item_count} invoice items, subtotal: {subtotal}, tax_total: {tax_total}")
+            # Link to a product when the row carries one
+            product_id = form_data.get(f"item_product_id_{i}")
+            if product_id and product_id.isdigit() and int(product_id) > 0:
+                item_values["product_id"] = int(product_id)
 
-        # Calculate final totals
-        discount_total = 0
-        if discount_percentage > 0:
-            discount_total = subtotal * (discount_percentage / 100)
-        else:
-            discount_total = discount_amount
+            submitted_items.append(item_values)
 
-        total = subtotal + tax_total - discount_total
+        inserted, updated, deleted = _sync_invoice_items(db, invoice_id, submitted_items)
+        item_count = len(submitted_items)
+        logging.info(f"Invoice {invoice_id} items: {inserted} inserted, {updated} updated, {deleted} deleted")
 
-        # Update invoice totals
-        invoice.subtotal = subtotal
-        invoice.tax_total = tax_total
-        invoice.discount_amount = discount_total
-        invoice.total = total
-        invoice.balance = total - (invoice.paid_amount or 0)
+        logging.info(f"Processed {item_count} invoice items, subtotal: {totals.subtotal}, tax_total: {totals.tax_total}")
 
-        logging.info(f"Final totals - subtotal: {subtotal}, tax_total: {tax_total}, discount: {discount_total}, total: {total}, balance: {invoice.balance}")
+        # Update invoice totals; discount_amount stores the document level discount
+        invoice.subtotal = totals.subtotal
+        invoice.tax_total = totals.tax_total
+        invoice.discount_amount = totals.discount_amount
+        invoice.total = totals.total
+        invoice.balance = totals.balance
+
+        logging.info(f"Final totals - subtotal: {totals.subtotal}, tax_total: {totals.tax_total}, discount: {totals.discount_amount}, total: {totals.total}, balance: {invoice.balance}")
 
         # Commit changes
         db.commit()
@@ -616,11 +864,9 @@ async def invoice_create_post(
             from datetime import timedelta
             due_date_parsed = issue_date_parsed + timedelta(days=30)
 
-        # Generate invoice number if not provided
+        # Generate invoice number from the default invoice group if not provided
         if not invoice_number:
-            last_invoice = db.query(Invoice).order_by(Invoice.id.desc()).first()
-            next_number = (last_invoice.id + 1) if last_invoice else 1
-            invoice_number = f"INV-{next_number:04d}"
+            invoice_number = allocate_invoice_number(db, on_date=issue_date_parsed)
 
         # Create new invoice
         invoice = Invoice(
@@ -651,77 +897,78 @@ async def invoice_create_post(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error creating invoice: {str(e)}")
 
-@router.get("/{invoice_id}/api", response_class=JSONResponse)
+@router.get("/{invoice_id}/api", response_class=ORJSONResponse)
 async def get_invoice_api(
     invoice_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: ReadSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Get a specific invoice as JSON data"""
-    from sqlalchemy.orm import joinedload
-    invoice = db.query(Invoice).options(
-        joinedload(Invoice.client),
-        joinedload(Invoice.items).joinedload(InvoiceItem.product),
-        joinedload(Invoice.user)
-    ).filter(Invoice.id == invoice_id).first()
+    """
+    Get a specific invoice as JSON data.
+    Supports conditional GET: the ETag covers the invoice and every row
+    embedded in the response (items, their products, client and user), so a
+    matching If-None-Match gets a 304 without loading the invoice.
+    days_overdue changes daily without any row changing, so it is part of
+    the ETag, and an overdue invoice is never older than the start of today.
+    """
+    def load(db: Session):
+        version = db.query(
+            Invoice.user_id,
+            Invoice.updated_at,
+            Client.updated_at,
+            User.updated_at,
+            func.max(InvoiceItem.updated_at),
+            func.max(Product.updated_at),
+            func.count(InvoiceItem.id),
+            func.max(InvoiceItem.id),
+            Invoice.status,
+            Invoice.due_date,
+        ).select_from(Invoice).outerjoin(
+            Client, Invoice.client_id == Client.id
+        ).outerjoin(
+            User, Invoice.user_id == User.id
+        ).outerjoin(
+            InvoiceItem, InvoiceItem.invoice_id == Invoice.id
+        ).outerjoin(
+            Product, InvoiceItem.product_id == Product.id
+        ).filter(Invoice.id == invoice_id).group_by(
+            Invoice.id, Invoice.user_id, Invoice.updated_at, Client.updated_at, User.updated_at,
+            Invoice.status, Invoice.due_date
+        ).first()
+
+        if not version:
+            raise HTTPException(status_code=404, detail="Invoice not found")
 
-    if not invoice:
-        raise HTTPException(status_code=404, detail="Invoice not found")
+        # Check permissions
+        if not current_user.is_admin and version[0] != current_user.id:
+            raise HTTPException(status_code=403, detail="Permission denied")
 
-    # Check permissions
-    if not current_user.is_admin and invoice.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Permission denied")
+        today = date.today()
+        status, due_date = version[8], version[9]
+        days_overdue = (today - due_date).days if status in OVERDUE_STATUSES and due_date and due_date < today else 0
+        etag = make_etag(invoice_id, *version[1:8], days_overdue)
+        last_modified = latest(*version[1:6])
+        if days_overdue:
+            last_modified = latest(last_modified, datetime.combine(today, time.min))
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        invoice = db.query(Invoice).options(
+            joinedload(Invoice.client),
+            joinedload(Invoice.items).joinedload(InvoiceItem.product),
+            joinedload(Invoice.user)
+        ).filter(Invoice.id == invoice_id).first()
 
-    # Convert invoice to dictionary
-    invoice_data = {
-        "id": invoice.id,
-        "invoice_number": invoice.invoice_number,
-        "status": invoice.status,
-        "status_name": invoice.status_name,
-        "issue_date": invoice.issue_date.isoformat() if invoice.issue_date else None,
-        "due_date": invoice.due_date.isoformat() if invoice.due_date else None,
-        "created_at": invoice.created_at.isoformat() if invoice.created_at else None,
-        "updated_at": invoice.updated_at.isoformat() if invoice.updated_at else None,
-        "subtotal": float(invoice.subtotal or 0),
-        "tax_total": float(invoice.tax_total or 0),
-        "discount_amount": float(invoice.discount_amount or 0),
-        "total": float(invoice.total or 0),
-        "balance": float(invoice.balance or 0),
-        "notes": invoice.notes,
-        "terms": invoice.terms,
-        "client": {
-            "id": invoice.client.id,
-            "name": invoice.client.name,
-            "email": invoice.client.email,
-            "address": invoice.client.address,
-            "phone": invoice.client.phone,
-        } if invoice.client else None,
-        "user": {
-            "id": invoice.user.id,
-            "username": invoice.user.username,
-            "email": invoice.user.email,
-        } if invoice.user else None,
-        "items": [
-            {
-                "id": item.id,
-                "name": item.name,
-                "description": item.description,
-                "quantity": float(item.quantity or 0),
-                "price": float(item.price or 0),
-                "discount_amount": float(item.discount_amount or 0),
-                "tax_amount": float(item.tax_amount or 0),
-                "subtotal": float(item.subtotal or 0),
-                "product": {
-                    "id": item.product.id,
-                    "name": item.product.name,
-                    "sku": item.product.sku,
-                } if item.product else None,
-            }
-            for item in invoice.items
-        ]
-    }
+        if not invoice:
+            raise HTTPException(status_code=404, detail="Invoice not found")
+
+        return ORJSONResponse(
+            InvoiceOut.model_validate(invoice).model_dump(),
+            headers=cache_headers(etag, last_modified)
+        )
 
-    return JSONResponse(content=invoice_data)
+    return await run_db(db, load)
 
 
 @router.delete("/{invoice_id}")
@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Request, Depends, HTTPException, Form, Query
+from fastapi import APIRouter, Request, Depends, HTTPException, Form, Query, File, UploadFile
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy import or_
-from app.database import get_db
+from datetime import datetime
+from app.database import get_db, get_read_db, run_db, ReadSession
 from app.dependencies import get_current_user
 from app.models.user import User
+from app.models.invoice import Invoice, InvoiceStatus
 from app.models.payment import Payment
+from app.utils.pagination import COUNT_PATTERN, fetch_page, total_pages
+from app.utils.payments import PaymentError, PaymentInput, record_payment, record_payments
+from app.utils.reconciliation import StatementError, parse_statement, reconcile_statement
+from app.utils.responses import ORJSONResponse
+from app.schemas.payment import PAYMENT_LIST_ADAPTER, RECORDED_PAYMENT_LIST_ADAPTER, PaymentBatchIn
 import logging
 
 router = APIRouter()
@@ -28,72 +35,83 @@ async def payments_list(
         "title": "Payments"
     })
 
-@router.get("/api")
+@router.get("/api", response_class=ORJSONResponse)
 async def get_payments_api(
-    db: Session = Depends(get_db),
+    db: ReadSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(100, ge=1, le=1000, description="Items per page"),
-    search: str = Query(None, description="Search payments by payer or reference")
+    search: str = Query(None, description="Search payments by payer or reference"),
+    count: str = Query("exact", pattern=COUNT_PATTERN, description="Total row count: exact, estimated, or none")
 ):
     """
     Get paginated list of payments for the admin interface.
     Returns JSON data for dynamic table loading.
     """
-    try:
-        offset = (page - 1) * limit
-        payments_query = db.query(Payment)
+    def load(db: Session):
+        try:
+            offset = (page - 1) * limit
+            payments_query = db.query(Payment)
         
-        if search:
-            search_term = f"%{search}%"
-            payments_query = payments_query.filter(
-                or_(
-                    Payment.payer.ilike(search_term),
-                    Payment.reference.ilike(search_term)
+            if search:
+                search_term = f"%{search}%"
+                payments_query = payments_query.filter(
+                    or_(
+                        Payment.payer.ilike(search_term),
+                        Payment.reference.ilike(search_term)
+                    )
                 )
-            )
         
-        payments = payments_query.offset(offset).limit(limit).all()
+            # Get paginated results and total count in one statement
+            payments, total_payments = fetch_page(payments_query, offset, limit, count)
         
-        # Get total count for pagination
-        total_query = db.query(Payment)
-        if search:
-            search_term = f"%{search}%"
-            total_query = total_query.filter(
-                or_(
-                    Payment.payer.ilike(search_term),
-                    Payment.reference.ilike(search_term)
-                )
+            payments_data = PAYMENT_LIST_ADAPTER.dump_python(
+                PAYMENT_LIST_ADAPTER.validate_python(payments, from_attributes=True)
             )
-        total_payments = total_query.count()
         
-        payments_data = []
-        for payment in payments:
-            payments_data.append({
-                "id": payment.id,
-                "amount": float(payment.amount) if payment.amount is not None else None,
-                "payer": payment.payer,
-                "reference": payment.reference if payment.reference else None,
-                "date": str(payment.date) if payment.date else None,
-                "status": payment.status if hasattr(payment, 'status') else 'completed'
+            return ORJSONResponse({
+                "payments": payments_data,
+                "pagination": {
+                    "page": page,
+                    "limit": limit,
+                    "total": total_payments,
+                    "total_pages": total_pages(total_payments, limit)
+                }
             })
         
-        return {
-            "payments": payments_data,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total_payments,
-                "total_pages": (total_payments + limit - 1) // limit
-            }
-        }
-        
-    except SQLAlchemyError as e:
-        logging.error(f"Database error in get_payments_api: {str(e)}")
-        raise HTTPException(status_code=500, detail="Database error occurred")
-    except Exception as e:
-        logging.error(f"Unexpected error in get_payments_api: {str(e)}")
-        raise HTTPException(status_code=500, detail="An unexpected error occurred")
+        except SQLAlchemyError as e:
+            logging.error(f"Database error in get_payments_api: {str(e)}")
+            raise HTTPException(status_code=500, detail="Database error occurred")
+        except Exception as e:
+            logging.error(f"Unexpected error in get_payments_api: {str(e)}")
+            raise HTTPException(status_code=500, detail="An unexpected error occurred")
+
+    return await run_db(db, load)
+
+# Invoices offered in the payment form's invoice list
+PAYABLE_STATUSES = (InvoiceStatus.SENT, InvoiceStatus.VIEWED, InvoiceStatus.OVERDUE)
+PAYABLE_INVOICE_LIMIT = 500
+
+
+def _payment_form(request: Request, db: Session, current_user: User, error: str = None,
+                  form: dict = None, status_code: int = 200):
+    """Render the payment form with the open invoices, oldest due first"""
+    invoices = db.query(Invoice).options(
+        load_only(Invoice.id, Invoice.invoice_number, Invoice.balance, Invoice.due_date)
+    ).filter(Invoice.status.in_(PAYABLE_STATUSES), Invoice.balance > 0)
+    if not current_user.is_admin:
+        invoices = invoices.filter(Invoice.user_id == current_user.id)
+    invoices = invoices.order_by(Invoice.due_date, Invoice.id).limit(PAYABLE_INVOICE_LIMIT).all()
+
+    form = form or {"invoice_id": request.query_params.get("invoice_id", "")}
+    return templates.TemplateResponse("payments/create.html", {
+        "request": request,
+        "user": current_user,
+        "title": "Enter Payment",
+        "invoices": invoices,
+        "form": form,
+        "error": error
+    }, status_code=status_code)
 
 @router.get("/create", response_class=HTMLResponse)
 async def create_payment(
@@ -102,22 +120,139 @@ async def create_payment(
     current_user: User = Depends(get_current_user)
 ):
     """Show create payment form"""
-    return templates.TemplateResponse("payments/create.html", {
-        "request": request,
-        "user": current_user,
-        "title": "Enter Payment"
-    })
+    return _payment_form(request, db, current_user)
 
 @router.post("/create")
 async def create_payment_post(
     request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    invoice_id: str = Form(""),
+    payment_date: str = Form(...),
+    amount: str = Form(...),
+    payment_method: str = Form(""),
+    notes: str = Form("")
 ):
-    """Handle payment creation"""
-    # TODO: Implement payment creation logic
+    """Record a payment against an invoice and update the invoice balance"""
+    form = {"invoice_id": invoice_id, "payment_date": payment_date, "amount": amount,
+            "payment_method": payment_method, "notes": notes}
+    try:
+        payment_input = PaymentInput(
+            invoice_id=int(invoice_id),
+            amount=amount,
+            payment_date=datetime.strptime(payment_date, "%Y-%m-%d").date(),
+            payment_method=payment_method or None,
+            notes=notes.strip() or None
+        )
+    except ValueError:
+        error = "Select an invoice" if not invoice_id else "Enter a valid payment date"
+        return _payment_form(request, db, current_user, error, form, status_code=400)
+
+    try:
+        record_payment(db, payment_input, current_user)
+        db.commit()
+    except PaymentError as e:
+        db.rollback()
+        return _payment_form(request, db, current_user, e.errors[0]["error"], form, status_code=400)
+    except SQLAlchemyError as e:
+        db.rollback()
+        logging.error(f"Database error in create_payment_post: {str(e)}")
+        return _payment_form(request, db, current_user, "The payment could not be saved", form, status_code=500)
+
     return RedirectResponse(url="/payments", status_code=302)
 
+@router.post("/api/bulk", response_class=ORJSONResponse)
+async def create_payments_bulk(
+    batch: PaymentBatchIn,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Record many payments in one transaction, e.g. from a bank feed.
+    The batch is applied all or nothing: if any payment is rejected nothing is
+    recorded and the response lists every rejected payment by its index.
+    """
+    payment_inputs = [PaymentInput(**payment.model_dump()) for payment in batch.payments]
+    try:
+        recorded = [
+            {
+                "id": entry.payment.id,
+                "invoice_id": entry.payment.invoice_id,
+                "amount": entry.payment.amount,
+                "paid_amount": entry.paid_amount,
+                "balance": entry.balance,
+                "invoice_status": entry.invoice_status,
+            }
+            for entry in record_payments(db, payment_inputs, current_user)
+        ]
+        db.commit()
+    except PaymentError as e:
+        db.rollback()
+        return ORJSONResponse({"detail": e.errors}, status_code=422)
+    except SQLAlchemyError as e:
+        db.rollback()
+        logging.error(f"Database error in create_payments_bulk: {str(e)}")
+        raise HTTPException(status_code=500, detail="Database error occurred")
+
+    return ORJSONResponse({
+        "created": len(recorded),
+        "payments": RECORDED_PAYMENT_LIST_ADAPTER.dump_python(
+            RECORDED_PAYMENT_LIST_ADAPTER.validate_python(recorded)
+        )
+    })
+
+@router.get("/reconcile", response_class=HTMLResponse)
+async def reconcile_statement_form(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Show the bank statement upload form"""
+    return templates.TemplateResponse("payments/reconcile.html", {
+        "request": request,
+        "user": current_user,
+        "title": "Reconcile Bank Statement",
+        "result": None
+    })
+
+@router.post("/reconcile", response_class=HTMLResponse)
+async def reconcile_statement_post(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    statement_file: UploadFile = File(...),
+    date_format: str = Form(""),
+    preview: bool = Form(False)
+):
+    """
+    Match an uploaded CSV or OFX statement against the open invoices and
+    record a payment for every matched credit (unless previewing). Unmatched
+    lines are listed for review.
+    """
+    context = {"request": request, "user": current_user, "title": "Reconcile Bank Statement",
+               "result": None, "preview": preview, "filename": statement_file.filename}
+    try:
+        lines = parse_statement(statement_file.filename, await statement_file.read(), date_format or None)
+        result = reconcile_statement(db, lines, current_user, apply=not preview)
+        if preview:
+            db.rollback()
+        else:
+            db.commit()
+    except StatementError as e:
+        return templates.TemplateResponse("payments/reconcile.html", {**context, "error": str(e)}, status_code=400)
+    except (PaymentError, SQLAlchemyError) as e:
+        db.rollback()
+        logging.error(f"Error recording reconciled payments: {str(e)}")
+        return templates.TemplateResponse("payments/reconcile.html", {
+            **context, "error": "The matched payments could not be recorded; nothing was saved"
+        }, status_code=500)
+
+    return templates.TemplateResponse("payments/reconcile.html", {
+        **context,
+        "result": result,
+        "line_count": len(lines),
+        "matched_total": sum(match["line"].amount for match in result.matched)
+    })
+
 @router.get("/{payment_id}", response_class=HTMLResponse)
 async def view_payment(
     payment_id: int,
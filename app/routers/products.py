@@ -3,165 +3,116 @@ from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import or_, asc, desc
+from sqlalchemy import asc, desc
 import logging
 
-from app.database import get_db
+from app.database import get_db, get_read_db, run_db, ReadSession
 from app.dependencies import get_current_user
 from app.models.user import User
 from app.models.product import Product, ProductFamily, ProductUnit
 from app.models.tax_rate import TaxRate
+from app.utils.pagination import COUNT_PATTERN, fetch_page, total_pages
+from app.utils.search import PRODUCT_SEARCH_COLUMNS, search_filter, search_rank
+from app.utils.responses import ORJSONResponse
+from app.utils.http_cache import make_etag, cache_headers, is_not_modified, not_modified_response
+from app.utils.product_catalog import get_catalog
+from app.schemas.product import PRODUCT_LIST_ADAPTER
 # from app.auth import get_current_admin_user  # Adjust import based on your auth structure
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
 
 # Add the new API endpoint
-@router.get("/api")
+@router.get("/api", response_class=ORJSONResponse)
 async def get_products_api(
-    db: Session = Depends(get_db),
+    db: ReadSession = Depends(get_read_db),
     # current_user: User = Depends(get_current_user),  # Temporarily removed for testing
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(100, ge=1, le=1000, description="Items per page"),
     search: str = Query(None, description="Search products by name or SKU"),
     family_id: int = Query(None, description="Filter by product family ID"),
-    sort_by: str = Query("name", description="Sort by: name, price, created_at, sku"),
-    sort_order: str = Query("asc", description="Sort order: asc or desc")
+    sort_by: str = Query("name", description="Sort by: name, price, created_at, sku, relevance"),
+    sort_order: str = Query("asc", description="Sort order: asc or desc"),
+    count: str = Query("exact", pattern=COUNT_PATTERN, description="Total row count: exact, estimated, or none")
 ):
     """
     Get paginated list of products for the admin interface.
     Includes related family and unit information.
     """
-    try:
-        offset = (page - 1) * limit
-        
-        # Base query with eager loading of related data
-        products_query = db.query(Product).join(
-            ProductFamily, Product.family_id == ProductFamily.id, isouter=True
-        ).join(
-            ProductUnit, Product.unit_id == ProductUnit.id, isouter=True
-        ).join(
-            TaxRate, Product.tax_rate_id == TaxRate.id, isouter=True
-        )
+    def load(db: Session):
+        try:
+            offset = (page - 1) * limit
         
-        # Apply search filter if provided
-        if search:
-            search_term = f"%{search}%"
-            products_query = products_query.filter(
-                or_(
-                    Product.name.ilike(search_term),
-                    Product.sku.ilike(search_term),
-                    Product.description.ilike(search_term)
-                )
+            # Base query with eager loading of related data
+            products_query = db.query(Product).join(
+                ProductFamily, Product.family_id == ProductFamily.id, isouter=True
+            ).join(
+                ProductUnit, Product.unit_id == ProductUnit.id, isouter=True
+            ).join(
+                TaxRate, Product.tax_rate_id == TaxRate.id, isouter=True
             )
         
-        # Apply family filter if provided
-        if family_id:
-            products_query = products_query.filter(Product.family_id == family_id)
+            # Apply search filter if provided
+            if search:
+                products_query = products_query.filter(search_filter(db, PRODUCT_SEARCH_COLUMNS, search))
         
-        # Apply sorting
-        sort_column = None
-        if sort_by == "name":
-            sort_column = Product.name
-        elif sort_by == "price":
-            sort_column = Product.price
-        elif sort_by == "sku":
-            sort_column = Product.sku
-        elif sort_by == "created_at":
-            # Assuming you have a created_at field, adjust if different
-            sort_column = getattr(Product, 'created_at', Product.id)
-        else:
-            sort_column = Product.name  # Default fallback
+            # Apply family filter if provided
+            if family_id:
+                products_query = products_query.filter(Product.family_id == family_id)
         
-        if sort_order.lower() == "desc":
-            products_query = products_query.order_by(desc(sort_column))
-        else:
-            products_query = products_query.order_by(asc(sort_column))
+            # Apply sorting
+            sort_column = None
+            if sort_by == "name":
+                sort_column = Product.name
+            elif sort_by == "price":
+                sort_column = Product.price
+            elif sort_by == "sku":
+                sort_column = Product.sku
+            elif sort_by == "created_at":
+                # Assuming you have a created_at field, adjust if different
+                sort_column = getattr(Product, 'created_at', Product.id)
+            else:
+                sort_column = Product.name  # Default fallback
         
-        # Get paginated results
-        products = products_query.offset(offset).limit(limit).all()
+            if sort_by == "relevance" and search:
+                products_query = products_query.order_by(desc(search_rank(db, PRODUCT_SEARCH_COLUMNS, search)), asc(Product.name))
+            elif sort_order.lower() == "desc":
+                products_query = products_query.order_by(desc(sort_column))
+            else:
+                products_query = products_query.order_by(asc(sort_column))
         
-        # Get total count for pagination
-        total_query = db.query(Product)
-        if search:
-            search_term = f"%{search}%"
-            total_query = total_query.filter(
-                or_(
-                    Product.name.ilike(search_term),
-                    Product.sku.ilike(search_term),
-                    Product.description.ilike(search_term)
-                )
+            # Get paginated results and total count in one statement
+            products, total_products = fetch_page(products_query, offset, limit, count)
+        
+            # Format products data with related information
+            products_data = PRODUCT_LIST_ADAPTER.dump_python(
+                PRODUCT_LIST_ADAPTER.validate_python(products, from_attributes=True)
             )
-        if family_id:
-            total_query = total_query.filter(Product.family_id == family_id)
-        total_products = total_query.count()
         
-        # Format products data with related information
-        products_data = []
-        for product in products:
-            # Get related family and unit data
-            family_data = None
-            if product.family:
-                family_data = {
-                    "id": product.family.id,
-                    "name": product.family.name
-                }
-            
-            unit_data = None
-            if product.unit:
-                unit_data = {
-                    "id": product.unit.id,
-                    "name": product.unit.name,
-                    "abbreviation": product.unit.abbreviation
+            return ORJSONResponse({
+                "products": products_data,
+                "pagination": {
+                    "page": page,
+                    "limit": limit,
+                    "total": total_products,
+                    "total_pages": total_pages(total_products, limit)
+                },
+                "filters": {
+                    "search": search,
+                    "sort_by": sort_by,
+                    "sort_order": sort_order,
+                    "count": count
                 }
-            
-            product_data = {
-                "id": product.id,
-                "name": product.name,
-                "sku": product.sku,
-                "price": float(product.price) if product.price is not None else None,
-                "description": product.description if product.description else None,
-                "family": family_data,
-                "unit": unit_data,
-                # Additional fields from your model
-                "tax_rate": {
-                    "id": product.tax_rate_rel.id if product.tax_rate_rel else None,
-                    "name": product.tax_rate_rel.name if product.tax_rate_rel else None,
-                    "rate": float(product.tax_rate_rel.rate) if product.tax_rate_rel else None
-                } if product.tax_rate_rel else None,
-                "provider_name": product.provider_name,
-                "purchase_price": float(product.purchase_price) if product.purchase_price is not None else None,
-                "sumex": product.sumex,
-                "tariff": float(product.tariff) if product.tariff is not None else None,
-                "user_id": product.user_id,
-                # Add created_at if it exists in your model
-                "created_at": product.created_at.isoformat() if hasattr(product, 'created_at') and product.created_at else None,
-                # Add is_active field if it exists, otherwise assume active
-                "is_active": getattr(product, 'is_active', True)
-            }
-            products_data.append(product_data)
-        
-        return {
-            "products": products_data,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total_products,
-                "total_pages": (total_products + limit - 1) // limit
-            },
-            "filters": {
-                "search": search,
-                "sort_by": sort_by,
-                "sort_order": sort_order
-            }
-        }
+            })
         
-    except SQLAlchemyError as e:
-        logging.error(f"Database error in get_products_api: {str(e)}")
-        raise HTTPException(status_code=500, detail="Database error occurred")
-    except Exception as e:
-        logging.error(f"Unexpected error in get_products_api: {str(e)}")
-        raise HTTPException(status_code=500, detail="An unexpected error occurred")
+        except SQLAlchemyError as e:
+            logging.error(f"Database error in get_products_api: {str(e)}")
+            raise HTTPException(status_code=500, detail="Database error occurred")
+        except Exception as e:
+            logging.error(f"Unexpected error in get_products_api: {str(e)}")
+            raise HTTPException(status_code=500, detail="An unexpected error occurred")
+
+    return await run_db(db, load)
 
 @router.get("/api/families")
 async def get_families_api(
@@ -191,6 +142,40 @@ async def get_families_api(
         logging.error(f"Unexpected error in get_families_api: {str(e)}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
 
+@router.get("/api/typeahead", response_class=ORJSONResponse)
+async def product_typeahead(
+    request: Request,
+    db: ReadSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+    q: str = Query("", max_length=100, description="Words the product name or SKU start with"),
+    family_id: int = Query(None, description="Only products of this family"),
+    limit: int = Query(25, ge=1, le=500, description="Maximum number of products"),
+    offset: int = Query(0, ge=0, description="Number of matching products to skip")
+):
+    """
+    Product suggestions for the item pickers, served from the in-memory
+    catalog together with the families and tax rates. The response carries
+    an ETag derived from the catalog version, so unchanged lookups are
+    answered with 304 Not Modified. has_more tells whether another page
+    follows at offset + limit.
+    """
+    def load(db: Session):
+        catalog = get_catalog(db)
+        etag = make_etag(catalog.version, " ".join(q.lower().split()), family_id, limit, offset)
+        if is_not_modified(request, etag, None):
+            return not_modified_response(etag, None)
+
+        products = catalog.search(q, family_id, limit + 1, offset)
+        return ORJSONResponse({
+            "version": catalog.version,
+            "products": products[:limit],
+            "has_more": len(products) > limit,
+            "families": catalog.families,
+            "tax_rates": catalog.tax_rates
+        }, headers=cache_headers(etag, None))
+
+    return await run_db(db, load)
+
 # Existing endpoints continue below...
 
 @router.get("/", response_class=HTMLResponse)
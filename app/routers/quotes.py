@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Request, Depends, HTTPException, Form
+from fastapi import APIRouter, Request, Depends, HTTPException, Form, Query
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
@@ -7,12 +7,18 @@ from app.dependencies import get_current_user
 from app.models.user import User
 from app.models.client import Client
 from app.models.quotes import Quote, QuoteItem, QuoteStatus
+from app.models.quote_status import QuoteStatusModel
 from app.models.tax_rate import TaxRate
 from datetime import date, datetime
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, load_only
+from sqlalchemy import or_
 from datetime import timedelta
 from app.models.invoice import Invoice, InvoiceItem, InvoiceStatus
 import secrets
+from app.utils.pagination import fetch_page, items_per_page, pager
+from app.utils.invoice_numbers import allocate_invoice_number
+from app.utils.calculations import ItemInput, calculate_document, to_decimal
+from decimal import Decimal
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -69,81 +75,39 @@ async def quotes_list(
     request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    page: int = Query(1, ge=1),
+    search: str = Query(None),
 ):
-    """List all quotes"""
+    """List one page of quotes, loading only the columns the table shows"""
+    per_page = items_per_page(db)
     query = db.query(Quote).options(
-        joinedload(Quote.client),
-        joinedload(Quote.status_object)
+        load_only(Quote.id, Quote.quote_number, Quote.client_id, Quote.issue_date, Quote.total, Quote.status),
+        joinedload(Quote.client).load_only(Client.id, Client.name),
+        joinedload(Quote.status_object).load_only(QuoteStatusModel.id, QuoteStatusModel.name)
     )
     if not current_user.is_admin:
         query = query.filter(Quote.user_id == current_user.id)
+    if search:
+        search_term = f"%{search}%"
+        query = query.filter(
+            or_(
+                Quote.quote_number.ilike(search_term),
+                Quote.client.has(Client.name.ilike(search_term))
+            )
+        )
 
-    quotes = query.order_by(Quote.created_at.desc()).all()
-
-    return templates.TemplateResponse(
-        "quotes/list.html", {"request": request, "user": current_user, "quotes": quotes}
-    )
-    """
-    Parse status string to QuoteStatus enum with fallback handling
-    """
-    if not status_str:
-        return QuoteStatus.DRAFT
-    
-    # Try direct match first
-    try:
-        return QuoteStatus(status_str)
-    except ValueError:
-        pass
-    
-    # Try uppercase
-    try:
-        return QuoteStatus(status_str.upper())
-    except ValueError:
-        pass
-    
-    # Try mapping common variations
-    status_mapping = {
-        'approved': QuoteStatus.ACCEPTED,
-        'approve': QuoteStatus.ACCEPTED,
-        'accept': QuoteStatus.ACCEPTED,
-        'accepted': QuoteStatus.ACCEPTED,
-        'draft': QuoteStatus.DRAFT,
-        'sent': QuoteStatus.SENT,
-        'send': QuoteStatus.SENT,
-        'viewed': QuoteStatus.VIEWED,
-        'view': QuoteStatus.VIEWED,
-        'rejected': QuoteStatus.REJECTED,
-        'reject': QuoteStatus.REJECTED,
-        'expired': QuoteStatus.EXPIRED,
-        'expire': QuoteStatus.EXPIRED,
-        'converted': QuoteStatus.CONVERTED,
-        'convert': QuoteStatus.CONVERTED,
-    }
-    
-    mapped_status = status_mapping.get(status_str.lower())
-    if mapped_status:
-        return mapped_status
-    
-    # If all else fails, return DRAFT
-    print(f"Warning: Could not parse status '{status_str}', defaulting to DRAFT")
-    return QuoteStatus.DRAFT
-
-
-@router.get("/", response_class=HTMLResponse)
-async def quotes_list(
-    request: Request,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
-    """List all quotes"""
-    query = db.query(Quote)
-    if not current_user.is_admin:
-        query = query.filter(Quote.user_id == current_user.id)
-
-    quotes = query.order_by(Quote.created_at.desc()).all()
+    query = query.order_by(Quote.created_at.desc(), Quote.id.desc())
+    quotes, total = fetch_page(query, (page - 1) * per_page, per_page)
 
     return templates.TemplateResponse(
-        "quotes/list.html", {"request": request, "user": current_user, "quotes": quotes}
+        "quotes/list.html",
+        {
+            "request": request,
+            "user": current_user,
+            "quotes": quotes,
+            "search": search,
+            "pager": pager(page, per_page, total, search=search)
+        }
     )
 
 
@@ -154,10 +118,10 @@ async def create_quote(
     current_user: User = Depends(get_current_user),
 ):
     """Show create quote form"""
-    clients = db.query(Client).all()
+    # Clients are fetched by the form's client picker from /clients/api/suggest
     return templates.TemplateResponse(
         "quotes/create.html",
-        {"request": request, "user": current_user, "clients": clients, "quote_statuses": QuoteStatus},
+        {"request": request, "user": current_user, "quote_statuses": QuoteStatus},
     )
 
 
@@ -273,7 +237,6 @@ async def edit_quote(
     if not current_user.is_admin and quote.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Permission denied")
 
-    clients = db.query(Client).all()
     tax_rates = db.query(TaxRate).all()
     
     # Convert tax rates to dictionaries for JSON serialization
@@ -288,7 +251,6 @@ async def edit_quote(
             "request": request,
             "user": current_user,
             "quote": quote,
-            "clients": clients,
             "tax_rates": tax_rates_dict,
             "quote_statuses": QuoteStatus,
             "title": f"Edit Quote #{quote.quote_number}",
@@ -372,7 +334,14 @@ async def edit_quote_post(
 
         # Update or create items
         existing_item_ids = set()
+        priced_items = []
         for index, item_data in items_data.items():
+            item_input = ItemInput(
+                quantity=to_decimal(item_data.get("quantity")),
+                price=to_decimal(item_data.get("price")),
+                tax_rate=to_decimal(item_data.get("tax_rate")),
+                discount_percentage=to_decimal(item_data.get("discount")),
+            )
             item_id = item_data.get("id")
             if item_id and item_id.isdigit():
                 # Update existing item
@@ -382,32 +351,28 @@ async def edit_quote_post(
                 if item:
                     item.product_name = item_data.get("name", "")
                     item.description = item_data.get("description", "")
-                    item.quantity = float(item_data.get("quantity", 0))
-                    item.unit_price = float(item_data.get("price", 0))
-                    item.discount_percentage = float(item_data.get("discount", 0))
-                    item.tax_rate = float(item_data.get("tax_rate", 0))
-                    # Recalculate totals
-                    item.subtotal = item.quantity * item.unit_price
-                    item.discount_amount = item.subtotal * (item.discount_percentage / 100)
-                    item.tax_amount = (item.subtotal - item.discount_amount) * (item.tax_rate / 100)
-                    item.total = item.subtotal - item.discount_amount + item.tax_amount
+                    priced_items.append((item, item_input))
             else:
                 # Create new item
                 new_item = QuoteItem(
                     quote_id=quote_id,
                     product_name=item_data.get("name", ""),
                     description=item_data.get("description", ""),
-                    quantity=float(item_data.get("quantity", 0)),
-                    unit_price=float(item_data.get("price", 0)),
-                    discount_percentage=float(item_data.get("discount", 0)),
-                    tax_rate=float(item_data.get("tax_rate", 0)),
                 )
-                # Calculate totals
-                new_item.subtotal = new_item.quantity * new_item.unit_price
-                new_item.discount_amount = new_item.subtotal * (new_item.discount_percentage / 100)
-                new_item.tax_amount = (new_item.subtotal - new_item.discount_amount) * (new_item.tax_rate / 100)
-                new_item.total = new_item.subtotal - new_item.discount_amount + new_item.tax_amount
                 db.add(new_item)
+                priced_items.append((new_item, item_input))
+
+        # Price all lines and the quote in one go
+        totals = calculate_document([item_input for _, item_input in priced_items])
+        for (item, item_input), line in zip(priced_items, totals.items):
+            item.quantity = item_input.quantity
+            item.unit_price = item_input.price
+            item.discount_percentage = item_input.discount_percentage
+            item.tax_rate = item_input.tax_rate
+            item.subtotal = line.subtotal
+            item.discount_amount = line.discount_amount
+            item.tax_amount = line.tax_amount
+            item.total = line.total
 
         # Remove items that are no longer in the form
         for item in quote.items:
@@ -417,11 +382,11 @@ async def edit_quote_post(
         # Flush changes to ensure items are updated
         db.flush()
 
-        # Recalculate quote totals
-        quote.subtotal = sum(item.subtotal for item in quote.items)
-        quote.item_tax_total = sum(item.tax_amount for item in quote.items)
-        quote.total = sum(item.total for item in quote.items)
-        quote.balance = quote.total
+        # Quote totals; quotes carry no document level discount
+        quote.subtotal = totals.subtotal
+        quote.item_tax_total = totals.tax_total
+        quote.total = totals.total
+        quote.balance = totals.balance
 
         # Debug logging
         print(f"DEBUG: Quote {quote_id} totals recalculated:")
@@ -507,17 +472,20 @@ async def convert_quote_to_invoice(
         )
 
     try:
-        # Generate invoice number
-        latest_invoice = db.query(Invoice).order_by(Invoice.id.desc()).first()
-        if latest_invoice and latest_invoice.invoice_number:
-            last_num = (
-                int(latest_invoice.invoice_number.split("-")[-1])
-                if "-" in latest_invoice.invoice_number
-                else int(latest_invoice.invoice_number)
+        # Generate invoice number from the default invoice group
+        invoice_number = allocate_invoice_number(db)
+
+        # Reprice the quote's lines so the invoice totals match its items exactly
+        quote_items = list(quote.items)
+        totals = calculate_document([
+            ItemInput(
+                quantity=to_decimal(item.quantity, default=Decimal("1")),
+                price=to_decimal(item.unit_price),
+                tax_rate=to_decimal(item.tax_rate),
+                discount_percentage=to_decimal(item.discount_percentage),
             )
-            invoice_number = f"INV-{last_num + 1:04d}"
-        else:
-            invoice_number = "INV-0001"
+            for item in quote_items
+        ])
 
         # Create new invoice from quote
         invoice = Invoice(
@@ -528,29 +496,30 @@ async def convert_quote_to_invoice(
             due_date=date.today() + timedelta(days=30),
             status=1,  # DRAFT status
             notes=quote.notes,
-            subtotal=quote.subtotal or 0,
-            tax_total=quote.tax_amount or 0,  # Map tax_amount to tax_total
-            discount_amount=quote.calculated_discount_amount or 0,
-            discount_percentage=quote.discount_percentage or 0,
-            total=quote.total or 0,
-            balance=quote.balance or quote.total or 0,  # Set initial balance
+            subtotal=totals.subtotal,
+            tax_total=totals.tax_total,
+            # Item discounts stay on the items; the invoice has no document discount
+            discount_amount=totals.discount_amount,
+            discount_percentage=0,
+            total=totals.total,
+            balance=totals.balance,
         )
 
         db.add(invoice)
         db.flush()
 
         # Copy items from quote to invoice
-        for item in quote.items:
+        for item, line in zip(quote_items, totals.items):
             invoice_item = InvoiceItem(
                 invoice_id=invoice.id,
                 name=item.product_name or "Quote Item",
                 description=item.description,
                 quantity=item.quantity or 1,
                 price=item.unit_price or 0,
-                subtotal=item.subtotal or 0,
-                tax_amount=item.tax_amount or 0,
-                discount_amount=item.discount_amount or 0,
-                total=item.total or 0,
+                subtotal=line.subtotal,
+                tax_amount=line.tax_amount,
+                discount_amount=line.discount_amount,
+                total=line.total,
             )
             db.add(invoice_item)
 
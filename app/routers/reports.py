@@ -1,9 +1,12 @@
 from app.models.invoice import InvoiceStatus
-from fastapi import APIRouter, Request, Depends
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Request, Depends, Query
+from fastapi.responses import HTMLResponse, Response
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import Integer, cast, func
+from datetime import date
+import csv
+import io
 
 from app.database import get_db
 from app.dependencies import get_current_user
@@ -11,10 +14,71 @@ from app.models.user import User
 from app.models.client import Client
 from app.models.invoice import Invoice
 from app.models.payment import Payment
+from app.models.revenue_daily import RevenueDaily
+from app.utils.aging import invoice_aging
+from app.utils.responses import ORJSONResponse
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
 
+MONTH_NAMES = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+ROLLUP_MEASURES = ("revenue", "invoiced", "tax", "invoice_count", "payments", "payment_count")
+
+
+def _rollup_query(db: Session, current_user: User, *columns):
+    """Query over revenue_daily, limited to the user's own rows for non-admins"""
+    query = db.query(*columns)
+    if not current_user.is_admin:
+        query = query.filter(RevenueDaily.user_id == current_user.id)
+    return query
+
+
+def _rollup_sums():
+    return [func.coalesce(func.sum(getattr(RevenueDaily, name)), 0).label(name) for name in ROLLUP_MEASURES]
+
+
+def _rollup_years(db: Session, current_user: User) -> list:
+    """Years that have rollup rows, newest first"""
+    year = cast(func.extract("year", RevenueDaily.day), Integer)
+    return [row[0] for row in _rollup_query(db, current_user, year).distinct().order_by(year.desc())]
+
+
+def _revenue_series(db: Session, current_user: User, period: str, year: int = None) -> list:
+    """
+    Totals per month of one year (every month present, zero when empty) or
+    per year, summed from the daily rollup.
+    """
+    def as_row(label, values):
+        row = {"period": label}
+        for name, value in zip(ROLLUP_MEASURES, values):
+            row[name] = int(value) if name.endswith("_count") else float(value)
+        return row
+
+    if period == "year":
+        year_column = cast(func.extract("year", RevenueDaily.day), Integer)
+        rows = _rollup_query(db, current_user, year_column, *_rollup_sums()).group_by(year_column).order_by(year_column)
+        return [as_row(str(row[0]), row[1:]) for row in rows]
+
+    month_column = cast(func.extract("month", RevenueDaily.day), Integer)
+    rows = _rollup_query(db, current_user, month_column, *_rollup_sums()).filter(
+        RevenueDaily.day >= date(year, 1, 1), RevenueDaily.day < date(year + 1, 1, 1)
+    ).group_by(month_column)
+    by_month = {row[0]: row[1:] for row in rows}
+    zeros = (0,) * len(ROLLUP_MEASURES)
+    return [as_row(f"{MONTH_NAMES[month - 1]} {year}", by_month.get(month, zeros)) for month in range(1, 13)]
+
+
+def _series_context(db: Session, current_user: User, year: int = None) -> dict:
+    """Monthly and yearly series plus the year selector for the report pages"""
+    years = _rollup_years(db, current_user)
+    year = year or (years[0] if years else date.today().year)
+    return {
+        "year": year,
+        "years": years,
+        "monthly": _revenue_series(db, current_user, "month", year),
+        "yearly": _revenue_series(db, current_user, "year"),
+    }
+
 @router.get("/", response_class=HTMLResponse)
 async def reports_dashboard(
     request: Request,
@@ -23,21 +87,28 @@ async def reports_dashboard(
 ):
     """Show reports dashboard"""
     
-    # Calculate basic statistics
+    # Calculate basic statistics; invoice and payment totals come from the daily rollup
     total_clients = db.query(func.count(Client.id)).scalar()
-    total_invoices = db.query(func.count(Invoice.id)).scalar()
-    total_payments = db.query(func.count(Payment.id)).scalar()
-    
-    # Calculate revenue statistics
-    total_revenue = db.query(func.sum(Payment.amount)).scalar() or 0
-    #pending_invoices = db.query(func.count(Invoice.id)).filter(Invoice.status == 'DRAFT').scalar()
-    pending_invoices = db.query(func.count(Invoice.id)).filter(Invoice.status == InvoiceStatus.DRAFT).scalar()
+    totals = _rollup_query(db, current_user, *_rollup_sums()).one()
+
+    open_statuses = [InvoiceStatus.SENT, InvoiceStatus.VIEWED, InvoiceStatus.OVERDUE]
+    invoice_stats = db.query(
+        func.count(Invoice.id).filter(Invoice.status == InvoiceStatus.DRAFT),
+        func.count(Invoice.id).filter(Invoice.is_overdue),
+        func.coalesce(func.sum(Invoice.balance).filter(Invoice.status.in_(open_statuses)), 0),
+    )
+    if not current_user.is_admin:
+        invoice_stats = invoice_stats.filter(Invoice.user_id == current_user.id)
+    pending_invoices, overdue_invoices, outstanding_amount = invoice_stats.one()
+
     stats = {
         'total_clients': total_clients,
-        'total_invoices': total_invoices,
-        'total_payments': total_payments,
-        'total_revenue': total_revenue,
-        'pending_invoices': pending_invoices
+        'total_invoices': totals.invoice_count,
+        'total_payments': totals.payment_count,
+        'total_revenue': totals.payments,
+        'pending_invoices': pending_invoices,
+        'overdue_invoices': overdue_invoices,
+        'outstanding_amount': outstanding_amount
     }
     
     return templates.TemplateResponse("reports/dashboard.html", {
@@ -51,26 +122,45 @@ async def reports_dashboard(
 async def invoice_reports(
     request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    year: int = Query(None, ge=1900, le=9999)
 ):
-    """Show invoice reports"""
+    """Show invoiced amounts, tax and revenue per month and per year"""
     return templates.TemplateResponse("reports/invoices.html", {
         "request": request,
         "user": current_user,
-        "title": "Invoice Reports"
+        "title": "Invoice Reports",
+        **_series_context(db, current_user, year)
     })
 
 @router.get("/payments", response_class=HTMLResponse)
 async def payment_reports(
     request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    year: int = Query(None, ge=1900, le=9999)
 ):
-    """Show payment reports"""
+    """Show payments received per month and per year"""
     return templates.TemplateResponse("reports/payments.html", {
         "request": request,
         "user": current_user,
-        "title": "Payment Reports"
+        "title": "Payment Reports",
+        **_series_context(db, current_user, year)
+    })
+
+@router.get("/revenue/api", response_class=ORJSONResponse)
+async def revenue_api(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    period: str = Query("month", pattern="^(month|year)$", description="Group by month (of one year) or year"),
+    year: int = Query(None, ge=1900, le=9999, description="Year for period=month (default: current year)")
+):
+    """Revenue, invoiced, tax and payment series from the daily rollup, for charts"""
+    year = year or date.today().year
+    return ORJSONResponse({
+        "period": period,
+        "year": year if period == "month" else None,
+        "series": _revenue_series(db, current_user, period, year)
     })
 
 @router.get("/clients", response_class=HTMLResponse)
@@ -90,11 +180,40 @@ async def client_reports(
 async def invoice_aging_report(
     request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    as_of: date = Query(None, description="Age balances as of this date (default: today)")
 ):
-    """Show invoice aging report (placeholder)"""
+    """Show open balances per client, bucketed by days past due"""
+    aging = invoice_aging(db, None if current_user.is_admin else current_user.id, as_of)
     return templates.TemplateResponse("reports/invoice_aging.html", {
         "request": request,
         "user": current_user,
-        "title": "Invoice Aging Report"
+        "title": "Invoice Aging Report",
+        **aging
     })
+
+@router.get("/invoice-aging/export")
+async def invoice_aging_export(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    as_of: date = Query(None, description="Age balances as of this date (default: today)")
+):
+    """Download the invoice aging report as CSV, one line per client plus a total line"""
+    aging = invoice_aging(db, None if current_user.is_admin else current_user.id, as_of)
+    bucket_keys = [bucket["key"] for bucket in aging["buckets"]]
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["client_id", "client_name", "invoice_count"] + bucket_keys + ["total"])
+    for row in aging["rows"]:
+        writer.writerow([row["client_id"], row["client_name"], row["invoice_count"]]
+                        + [row[key] for key in bucket_keys] + [row["total"]])
+    totals = aging["totals"]
+    writer.writerow(["", "Total", totals["invoice_count"]] + [totals[key] for key in bucket_keys] + [totals["total"]])
+
+    filename = f"invoice-aging-{aging['as_of'].isoformat()}.csv"
+    return Response(
+        buffer.getvalue(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Request, Depends, HTTPException, Form, File, UploadFile
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 
@@ -10,7 +10,15 @@ from app.models.api_key import ApiKey
 from app.models.invoicesettings import InvoiceSettings
 from app.models.company_settings import CompanySettings
 from app.models.tax_rate import TaxRate
+from app.models.invoice_group import InvoiceGroup
+from app.utils.dashboard_cache import dashboard_cache
+from app.utils.api_key_cache import api_key_cache
+from app.utils.user_cache import user_cache
+from app.utils.invoice_numbers import (
+    DEFAULT_INVOICE_GROUPS, FORMAT_TAGS, default_group_slug, validate_identifier_format
+)
 import logging
+import re
 
 # Add this at the top of your file
 logger = logging.getLogger(__name__)
@@ -341,6 +349,7 @@ async def invoice_settings(
         "request": request,
         "user": current_user,
         "invoice_settings": invoice_settings_data,
+        "invoice_groups": db.query(InvoiceGroup).order_by(InvoiceGroup.name).all(),
         "title": "Invoice Settings"
     })
 
@@ -678,11 +687,84 @@ async def invoice_groups(
     current_user: User = Depends(get_current_user)
 ):
     """Show invoice groups management"""
+    return _render_invoice_groups(request, db, current_user)
+
+def _render_invoice_groups(request: Request, db: Session, current_user: User, error_message: str = None, form: dict = None):
+    groups = db.query(InvoiceGroup).order_by(InvoiceGroup.name).all()
     return templates.TemplateResponse("settings/invoice_groups.html", {
         "request": request,
         "user": current_user,
+        "groups": groups,
+        "default_group": default_group_slug(db),
+        "builtin_groups": DEFAULT_INVOICE_GROUPS,
+        "format_tags": FORMAT_TAGS,
+        "error_message": error_message,
+        "form": form or {},
         "title": "Invoice Groups"
-    })
+    }, status_code=400 if error_message else 200)
+
+@router.post("/invoice-groups", response_class=HTMLResponse)
+async def save_invoice_group(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    group_id: int = Form(None),
+    name: str = Form(...),
+    slug: str = Form(...),
+    identifier_format: str = Form(...),
+    next_id: int = Form(1),
+    left_pad: int = Form(0)
+):
+    """Create an invoice group, or update one when group_id is given"""
+    form = {
+        "group_id": group_id, "name": name, "slug": slug,
+        "identifier_format": identifier_format, "next_id": next_id, "left_pad": left_pad
+    }
+    slug = slug.strip().lower()
+    error = validate_identifier_format(identifier_format.strip())
+    if not error and not re.fullmatch(r"[a-z0-9_-]+", slug):
+        error = "The key may only contain lowercase letters, digits, '-' and '_'"
+    if not error and (next_id < 1 or not 0 <= left_pad <= 20):
+        error = "Next number must be at least 1 and padding between 0 and 20"
+    if not error:
+        clash = db.query(InvoiceGroup.id).filter(InvoiceGroup.slug == slug, InvoiceGroup.id != (group_id or 0)).first()
+        if clash:
+            error = f"An invoice group with key '{slug}' already exists"
+    if error:
+        return _render_invoice_groups(request, db, current_user, error, form)
+
+    if group_id:
+        group = db.query(InvoiceGroup).filter(InvoiceGroup.id == group_id).first()
+        if not group:
+            raise HTTPException(status_code=404, detail="Invoice group not found")
+    else:
+        group = InvoiceGroup()
+        db.add(group)
+
+    group.name = name.strip()
+    group.slug = slug
+    group.identifier_format = identifier_format.strip()
+    group.next_id = next_id
+    group.left_pad = left_pad
+    db.commit()
+    return RedirectResponse(url="/settings/invoice-groups", status_code=303)
+
+@router.post("/invoice-groups/{group_id}/delete", response_class=HTMLResponse)
+async def delete_invoice_group(
+    group_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Delete an invoice group; the default group cannot be deleted"""
+    group = db.query(InvoiceGroup).filter(InvoiceGroup.id == group_id).first()
+    if not group:
+        raise HTTPException(status_code=404, detail="Invoice group not found")
+    if group.slug == default_group_slug(db):
+        return _render_invoice_groups(request, db, current_user, "The default invoice group cannot be deleted")
+    db.delete(group)
+    db.commit()
+    return RedirectResponse(url="/settings/invoice-groups", status_code=303)
 
 @router.get("/invoice-archive", response_class=HTMLResponse)
 async def invoice_archive(
@@ -1124,6 +1206,19 @@ async def generate_api_key(
         "message": "API key generated successfully"
     })
 
+@router.get("/api/cache-stats")
+async def cache_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """Size and hit/miss counters of the in-process caches, for sizing them (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return JSONResponse({
+        "users": user_cache.stats(),
+        "api_keys": api_key_cache.stats(),
+        "dashboard": dashboard_cache.stats()
+    })
+
 @router.get("/api/keys")
 async def list_api_keys(
     db: Session = Depends(get_db),
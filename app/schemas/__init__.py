@@ -0,0 +1,39 @@
+from .common import Money, OptionalMoney, OrmSchema
+from .invoice import (
+    INVOICE_STATUS_NAMES, InvoiceOut, InvoiceItemOut, InvoiceClientOut,
+    InvoiceUserOut, InvoiceProductOut, invoice_list_adapter,
+)
+from .client import CLIENT_LIST_ADAPTER, CLIENT_SUGGEST_ADAPTER, ClientOut, ClientSuggestionOut
+from .product import PRODUCT_LIST_ADAPTER, ProductOut, ProductFamilyOut, ProductUnitOut, ProductTaxRateOut
+from .payment import (
+    PAYMENT_LIST_ADAPTER, PaymentOut, PaymentIn, PaymentBatchIn,
+    RECORDED_PAYMENT_LIST_ADAPTER, RecordedPaymentOut,
+)
+
+__all__ = [
+    "Money",
+    "OptionalMoney",
+    "OrmSchema",
+    "INVOICE_STATUS_NAMES",
+    "InvoiceOut",
+    "InvoiceItemOut",
+    "InvoiceClientOut",
+    "InvoiceUserOut",
+    "InvoiceProductOut",
+    "invoice_list_adapter",
+    "ClientOut",
+    "CLIENT_LIST_ADAPTER",
+    "ClientSuggestionOut",
+    "CLIENT_SUGGEST_ADAPTER",
+    "ProductOut",
+    "PRODUCT_LIST_ADAPTER",
+    "ProductFamilyOut",
+    "ProductUnitOut",
+    "ProductTaxRateOut",
+    "PaymentOut",
+    "PAYMENT_LIST_ADAPTER",
+    "PaymentIn",
+    "PaymentBatchIn",
+    "RecordedPaymentOut",
+    "RECORDED_PAYMENT_LIST_ADAPTER",
+]
@@ -0,0 +1,54 @@
+from datetime import date, datetime
+from typing import List, Optional
+
+from pydantic import TypeAdapter
+
+from app.schemas.common import OrmSchema
+
+
+class ClientOut(OrmSchema):
+    """A client as returned by /clients/api and /clients/{id}/api"""
+    id: int
+    is_active: Optional[bool] = None
+    name: str
+    surname: Optional[str] = None
+    company: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    fax: Optional[str] = None
+    mobile: Optional[str] = None
+    website: Optional[str] = None
+    address_1: Optional[str] = None
+    address_2: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    zip_code: Optional[str] = None
+    country: Optional[str] = None
+    language: Optional[str] = None
+    gender: Optional[str] = None
+    birthdate: Optional[date] = None
+    vat_id: Optional[str] = None
+    tax_code: Optional[str] = None
+    abn: Optional[str] = None
+    title: Optional[str] = None
+    notes: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+CLIENT_LIST_ADAPTER = TypeAdapter(List[ClientOut])
+
+
+class ClientSuggestionOut(OrmSchema):
+    """A client as returned by /clients/api/suggest"""
+    id: int
+    display_name: str
+    name: str
+    surname: Optional[str] = None
+    company: Optional[str] = None
+    email: Optional[str] = None
+    address_1: Optional[str] = None
+    city: Optional[str] = None
+
+
+CLIENT_SUGGEST_ADAPTER = TypeAdapter(List[ClientSuggestionOut])
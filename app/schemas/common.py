@@ -0,0 +1,21 @@
+from typing import Annotated, Optional
+
+from pydantic import BaseModel, BeforeValidator, ConfigDict
+
+
+def _money(value) -> float:
+    return float(value) if value is not None else 0.0
+
+
+def _optional_money(value) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+# Numeric columns come back from the database as Decimal; the APIs expose floats
+Money = Annotated[float, BeforeValidator(_money)]
+OptionalMoney = Annotated[Optional[float], BeforeValidator(_optional_money)]
+
+
+class OrmSchema(BaseModel):
+    """Base for response schemas read straight from ORM objects"""
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,91 @@
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Annotated, List, Optional
+
+from pydantic import BeforeValidator, Field, TypeAdapter, create_model
+
+from app.schemas.common import Money, OrmSchema
+
+INVOICE_STATUS_NAMES = {
+    1: 'draft', 2: 'sent', 3: 'viewed', 4: 'paid', 5: 'overdue', 6: 'cancelled'
+}
+
+
+def _status_name(value) -> str:
+    return INVOICE_STATUS_NAMES.get(value, 'unknown')
+
+
+class InvoiceProductOut(OrmSchema):
+    id: int
+    name: str
+    sku: Optional[str] = None
+
+
+class InvoiceItemOut(OrmSchema):
+    id: int
+    name: str
+    description: Optional[str] = None
+    quantity: Money
+    price: Money
+    subtotal: Money
+    tax_amount: Money
+    discount_amount: Money
+    total: Money
+    product: Optional[InvoiceProductOut] = None
+
+
+class InvoiceClientOut(OrmSchema):
+    id: int
+    name: str
+    email: Optional[str] = None
+    address: Optional[str] = Field(None, validation_alias="address_1")
+    phone: Optional[str] = None
+
+
+class InvoiceUserOut(OrmSchema):
+    id: int
+    username: str
+    email: Optional[str] = None
+
+
+class InvoiceOut(OrmSchema):
+    """An invoice as returned by /invoices/api and /invoices/{id}/api"""
+    id: int
+    invoice_number: str
+    status: Optional[int] = None
+    status_name: Annotated[str, BeforeValidator(_status_name)] = Field(validation_alias="status")
+    issue_date: Optional[date] = None
+    due_date: Optional[date] = None
+    terms: Optional[str] = None
+    notes: Optional[str] = None
+    url_key: Optional[str] = None
+    subtotal: Money
+    tax_total: Money
+    discount_amount: Money
+    discount_percentage: Money
+    total: Money
+    paid_amount: Money
+    balance: Money
+    is_overdue: bool
+    days_overdue: int
+    user_id: int
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    client: Optional[InvoiceClientOut] = None
+    user: Optional[InvoiceUserOut] = None
+    items: List[InvoiceItemOut] = []
+
+
+@lru_cache(maxsize=128)
+def invoice_list_adapter(fields: tuple, includes: tuple) -> TypeAdapter:
+    """
+    Validator/serializer for a list of invoices restricted to the given
+    fields and related data. Only the selected attributes are read from each
+    invoice, so columns and relationships that were not loaded stay unloaded.
+    """
+    definitions = {
+        name: (InvoiceOut.model_fields[name].annotation, InvoiceOut.model_fields[name])
+        for name in fields + includes
+    }
+    model = create_model("InvoiceListOut", __base__=OrmSchema, **definitions)
+    return TypeAdapter(List[model])
@@ -0,0 +1,49 @@
+from datetime import date as date_type
+from decimal import Decimal
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, TypeAdapter
+
+from app.schemas.common import OptionalMoney, OrmSchema
+
+
+class PaymentOut(OrmSchema):
+    """A payment as returned by /payments/api"""
+    id: int
+    amount: OptionalMoney = None
+    payer: Optional[str] = None
+    reference: Optional[str] = None
+    date: Optional[date_type] = None
+    status: Optional[str] = None
+
+
+PAYMENT_LIST_ADAPTER = TypeAdapter(List[PaymentOut])
+
+
+class PaymentIn(BaseModel):
+    """A payment to record, as posted to /payments/api/bulk"""
+    invoice_id: int
+    amount: Decimal
+    payment_date: date_type
+    payment_method: Optional[str] = Field(None, max_length=50)
+    reference: Optional[str] = Field(None, max_length=100)
+    payer: Optional[str] = Field(None, max_length=100)
+    notes: Optional[str] = None
+
+
+class PaymentBatchIn(BaseModel):
+    """Body of /payments/api/bulk"""
+    payments: List[PaymentIn] = Field(..., min_length=1, max_length=5000)
+
+
+class RecordedPaymentOut(OrmSchema):
+    """A recorded payment with its invoice's paid amount, balance and status right after it"""
+    id: int
+    invoice_id: int
+    amount: OptionalMoney = None
+    paid_amount: OptionalMoney = None
+    balance: OptionalMoney = None
+    invoice_status: str
+
+
+RECORDED_PAYMENT_LIST_ADAPTER = TypeAdapter(List[RecordedPaymentOut])
@@ -0,0 +1,45 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import Field, TypeAdapter
+
+from app.schemas.common import OptionalMoney, OrmSchema
+
+
+class ProductFamilyOut(OrmSchema):
+    id: int
+    name: str
+
+
+class ProductUnitOut(OrmSchema):
+    id: int
+    name: str
+    abbreviation: Optional[str] = None
+
+
+class ProductTaxRateOut(OrmSchema):
+    id: int
+    name: str
+    rate: float
+
+
+class ProductOut(OrmSchema):
+    """A product as returned by /products/api"""
+    id: int
+    name: str
+    sku: Optional[str] = None
+    price: OptionalMoney = None
+    description: Optional[str] = None
+    family: Optional[ProductFamilyOut] = None
+    unit: Optional[ProductUnitOut] = None
+    tax_rate: Optional[ProductTaxRateOut] = Field(None, validation_alias="tax_rate_rel")
+    provider_name: Optional[str] = None
+    purchase_price: OptionalMoney = None
+    sumex: Optional[bool] = None
+    tariff: OptionalMoney = None
+    user_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    is_active: bool = True
+
+
+PRODUCT_LIST_ADAPTER = TypeAdapter(List[ProductOut])
@@ -0,0 +1,101 @@
+"""
+Invoice aging report.
+
+Open balances are bucketed by how far past their due date they are and
+summed per client in one aggregate over the invoices table. The bucket
+boundaries are turned into due-date cut-offs up front, so each bucket is a
+plain due_date range (FILTER (WHERE due_date >= ...)) rather than a
+per-row date calculation. The partial index from setup/sql/010_1.0.10.sql
+holds only open invoices with a balance, keyed by (client_id, due_date) and
+covering balance, so the query is answered from the index alone.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.client import Client
+from app.models.invoice import Invoice, InvoiceStatus
+
+# Issued invoices that can still carry a balance
+OPEN_STATUSES = (InvoiceStatus.SENT.value, InvoiceStatus.VIEWED.value, InvoiceStatus.OVERDUE.value)
+
+# (key, label, min days past due, max days past due); None means unbounded
+AGING_BUCKETS = (
+    ("current", "Current", None, 0),
+    ("days_1_30", "1-30 days", 1, 30),
+    ("days_31_60", "31-60 days", 31, 60),
+    ("days_61_90", "61-90 days", 61, 90),
+    ("days_over_90", "90+ days", 91, None),
+)
+
+
+def _bucket_condition(as_of: date, min_days: Optional[int], max_days: Optional[int]):
+    """due_date range of invoices that are min_days..max_days past due on as_of"""
+    conditions = []
+    if max_days is not None:
+        conditions.append(Invoice.due_date >= as_of - timedelta(days=max_days))
+    if min_days is not None:
+        conditions.append(Invoice.due_date <= as_of - timedelta(days=min_days))
+    return conditions
+
+
+def invoice_aging(db: Session, user_id: Optional[int] = None, as_of: Optional[date] = None) -> dict:
+    """
+    Open balances per client and aging bucket on as_of (default today),
+    limited to user_id's invoices when given. Invoices without a due date
+    count as current. Returns {"as_of", "buckets", "rows", "totals"} where
+    each row has client_id, client_name, invoice_count, one amount per
+    bucket key and total; rows are sorted by total, largest first.
+    """
+    as_of = as_of or date.today()
+    columns = []
+    for key, _label, min_days, max_days in AGING_BUCKETS:
+        condition = _bucket_condition(as_of, min_days, max_days)
+        if key == "current":
+            condition = [(Invoice.due_date.is_(None)) | condition[0]]
+        columns.append(func.coalesce(func.sum(Invoice.balance).filter(*condition), 0).label(key))
+
+    aging = db.query(
+        Invoice.client_id.label("client_id"),
+        func.count().label("invoice_count"),
+        *columns,
+    ).filter(Invoice.status.in_(OPEN_STATUSES), Invoice.balance > 0)
+    if user_id is not None:
+        aging = aging.filter(Invoice.user_id == user_id)
+    aging = aging.group_by(Invoice.client_id).subquery("aging")
+
+    # Client names are joined after grouping, once per client
+    rows = db.query(aging, Client.name, Client.surname, Client.company).outerjoin(
+        Client, Client.id == aging.c.client_id
+    )
+
+    bucket_keys = [bucket[0] for bucket in AGING_BUCKETS]
+    totals = {key: Decimal("0") for key in bucket_keys + ["total"]}
+    totals["invoice_count"] = 0
+    result = []
+    for row in rows:
+        data = row._mapping
+        name = " ".join(part for part in (data["name"], data["surname"]) if part)
+        entry = {
+            "client_id": data["client_id"],
+            "client_name": data["company"] or name or f"Client #{data['client_id']}",
+            "invoice_count": data["invoice_count"],
+        }
+        for key in bucket_keys:
+            entry[key] = Decimal(str(data[key]))
+            totals[key] += entry[key]
+        entry["total"] = sum((entry[key] for key in bucket_keys), Decimal("0"))
+        totals["total"] += entry["total"]
+        totals["invoice_count"] += entry["invoice_count"]
+        result.append(entry)
+
+    result.sort(key=lambda entry: (-entry["total"], entry["client_name"]))
+    return {
+        "as_of": as_of,
+        "buckets": [{"key": key, "label": label} for key, label, _min, _max in AGING_BUCKETS],
+        "rows": result,
+        "totals": totals,
+    }
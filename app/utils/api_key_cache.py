@@ -0,0 +1,212 @@
+"""
+Cache of validated API keys for get_current_user_optional().
+
+Every request authenticated with an API key used to SELECT the key and its
+user and then UPDATE api_keys.last_used_at and commit, so each API call
+cost a write transaction before the endpoint even started.
+
+Validated keys are now kept for settings.API_KEY_CACHE_TTL seconds, keyed
+by the SHA-256 hash of the key, as (key id, user id, expires_at); the
+dependency then loads the user through the user cache and checks that they
+are active.
+Only hashes of keys that were found and active are cached, so an unknown
+key always reaches the database.
+
+last_used_at is recorded in memory and written by flush_last_used(), one
+executemany UPDATE for every key used since the previous flush.
+run_last_used_flusher() does that every settings.API_KEY_LAST_USED_INTERVAL
+seconds inside the web process and the app flushes once more on shutdown;
+with an interval of 0 the timestamp is written during the request again.
+
+A commit that updates or deletes an API key (delete_api_key,
+regenerate_api_key, deactivating it) drops both its old and its new hash
+before commit() returns, so a revoked key is refused by the next request to
+this worker; bulk UPDATE/DELETE on api_keys drops every entry. Other
+workers keep their copy for at most the TTL.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy import bindparam, event, inspect
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.api_key import ApiKey
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+api_key_cache = TTLCache(ttl=settings.API_KEY_CACHE_TTL, maxsize=settings.API_KEY_CACHE_SIZE)
+
+_PENDING_KEY = "api_key_cache_invalidate"
+_ALL = "all"
+
+# Bumped on every invalidation; a miss only stores its result if no
+# invalidation happened while it was loading
+_invalidations = 0
+
+# key id -> last time it was used, waiting for the next flush
+_last_used: Dict[int, datetime] = {}
+_last_used_lock = threading.Lock()
+
+_api_keys = ApiKey.__table__
+_LAST_USED_UPDATE = _api_keys.update().where(_api_keys.c.id == bindparam("key_id")).values(
+    last_used_at=bindparam("used_at")
+)
+
+
+class CachedApiKey(NamedTuple):
+    id: int
+    user_id: int
+    expires_at: Optional[datetime]
+
+
+def hash_api_key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+def _expired(expires_at: Optional[datetime], now: datetime) -> bool:
+    if expires_at is None:
+        return False
+    if expires_at.tzinfo is not None:
+        expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return now > expires_at
+
+
+def _lookup(db: Session, key_hash: str) -> Optional[CachedApiKey]:
+    if settings.API_KEY_CACHE_TTL > 0:
+        cached = api_key_cache.get(key_hash)
+        if cached is not None:
+            return cached
+
+    invalidations = _invalidations
+    row = db.query(ApiKey.id, ApiKey.user_id, ApiKey.expires_at).filter(
+        ApiKey.key_hash == key_hash,
+        ApiKey.is_active == True
+    ).first()
+    if row is None:
+        return None
+    key = CachedApiKey(row.id, row.user_id, row.expires_at)
+    if settings.API_KEY_CACHE_TTL > 0 and invalidations == _invalidations:
+        api_key_cache.set(key_hash, key)
+    return key
+
+
+def api_key_user_id(db: Session, api_key: str) -> Optional[int]:
+    """
+    Id of the user owning api_key, or None when the key is unknown, inactive
+    or expired. Records the key as used.
+    """
+    key = _lookup(db, hash_api_key(api_key))
+    if key is None:
+        return None
+
+    now = datetime.utcnow()
+    if _expired(key.expires_at, now):
+        return None
+
+    if settings.API_KEY_LAST_USED_INTERVAL > 0:
+        with _last_used_lock:
+            _last_used[key.id] = now
+    else:
+        db.execute(_LAST_USED_UPDATE, [{"key_id": key.id, "used_at": now}])
+        db.commit()
+    return key.user_id
+
+
+def flush_last_used(db: Session) -> int:
+    """Write the pending last_used_at timestamps in one UPDATE; returns the number of keys written"""
+    global _last_used
+    with _last_used_lock:
+        pending, _last_used = _last_used, {}
+    if not pending:
+        return 0
+    try:
+        db.execute(_LAST_USED_UPDATE, [{"key_id": key_id, "used_at": used_at} for key_id, used_at in pending.items()])
+        db.commit()
+    except Exception:
+        db.rollback()
+        # Put the timestamps back unless the key was used again meanwhile
+        with _last_used_lock:
+            for key_id, used_at in pending.items():
+                _last_used.setdefault(key_id, used_at)
+        raise
+    return len(pending)
+
+
+def flush_once() -> int:
+    """Flush the pending timestamps in their own session"""
+    db = SessionLocal()
+    try:
+        return flush_last_used(db)
+    finally:
+        db.close()
+
+
+async def run_last_used_flusher(interval: Optional[int] = None) -> None:
+    """Flush every `interval` seconds until cancelled"""
+    interval = settings.API_KEY_LAST_USED_INTERVAL if interval is None else interval
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(flush_once)
+        except Exception as e:
+            logger.error(f"Flushing API key last_used_at failed: {str(e)}")
+
+
+def invalidate_api_keys(key_hashes=None, key_ids=()) -> None:
+    """Drop the given hashes' entries, or every entry, and forget pending timestamps of key_ids"""
+    global _invalidations
+    _invalidations += 1
+    if key_hashes is None:
+        api_key_cache.clear()
+    else:
+        api_key_cache.pop_many(key_hashes)
+    if key_ids:
+        # A regenerated key starts unused; a deleted one has nothing to update
+        with _last_used_lock:
+            for key_id in key_ids:
+                _last_used.pop(key_id, None)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_api_key_changes(session, flush_context, instances):
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, ApiKey) and obj.id is not None:
+            pending = session.info.setdefault(_PENDING_KEY, {"hashes": set(), "ids": set()})
+            history = inspect(obj).attrs.key_hash.history
+            pending["hashes"].update(value for value in (*history.deleted, obj.key_hash) if value)
+            if obj in session.deleted or history.deleted:
+                pending["ids"].add(obj.id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_api_key_changes(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is ApiKey:
+        pending = orm_execute_state.session.info.setdefault(_PENDING_KEY, {"hashes": set(), "ids": set()})
+        pending["hashes"].add(_ALL)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_api_key_invalidations(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    if _ALL in pending["hashes"]:
+        invalidate_api_keys(None, pending["ids"])
+    else:
+        invalidate_api_keys(pending["hashes"], pending["ids"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_api_key_invalidations(session):
+    if not session.in_transaction():
+        session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,178 @@
+"""
+Invoice and quote totals.
+
+Every place that prices a document (invoice and quote edit forms, quote to
+invoice conversion, the legacy importer) goes through this module so they all
+use the same formula:
+
+    item subtotal   = quantity * price
+    item discount   = the given amount, or subtotal * discount_percentage / 100
+    item tax        = (subtotal - item discount) * tax_rate / 100
+    item total      = subtotal - item discount + item tax
+
+    subtotal        = sum of item subtotals
+    item_discount   = sum of item discounts
+    tax_total       = sum of item taxes
+    discount_amount = document discount: the given amount, or
+                      (subtotal - item_discount) * discount_percentage / 100
+    total           = subtotal - item_discount + tax_total - discount_amount
+    balance         = total - paid_amount
+
+Arithmetic is done in Decimal and every stored amount is rounded half up to
+cents per line, so a document's totals always equal the sum of its stored
+lines. With settings.LEGACY_CALCULATION (the default) the document discount
+is taken off after tax, as InvoicePlane always did. Without it the document
+discount is applied before tax: it is spread over the lines in proportion to
+their taxable amount and tax_total is charged on the discounted base.
+
+calculate_documents() prices many documents in one call and is what batch
+jobs should use; calculate_document() is the single-document convenience.
+"""
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Iterable, List, NamedTuple, Optional, Sequence
+
+from app.config import settings
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0")
+HUNDRED = Decimal("100")
+
+
+class ItemInput(NamedTuple):
+    """One line as entered. A non-zero discount_amount wins over discount_percentage."""
+    quantity: Decimal
+    price: Decimal
+    tax_rate: Decimal = ZERO
+    discount_amount: Optional[Decimal] = None
+    discount_percentage: Decimal = ZERO
+
+
+class ItemTotals(NamedTuple):
+    subtotal: Decimal
+    discount_amount: Decimal
+    tax_amount: Decimal
+    total: Decimal
+
+
+class DocumentInput(NamedTuple):
+    """A document's lines and document level discount and payments"""
+    items: Sequence[ItemInput]
+    discount_amount: Decimal = ZERO
+    discount_percentage: Decimal = ZERO
+    paid_amount: Decimal = ZERO
+
+
+class DocumentTotals(NamedTuple):
+    subtotal: Decimal
+    item_discount: Decimal
+    discount_amount: Decimal
+    tax_total: Decimal
+    total: Decimal
+    balance: Decimal
+    items: List[ItemTotals]
+
+
+def to_decimal(value, default: Decimal = ZERO) -> Decimal:
+    """
+    Convert a form, float or database value to Decimal.
+    Empty values give the default; floats go through str() so 0.1 stays 0.1.
+    Raises ValueError for text that is not a number.
+    """
+    if value is None or value == "":
+        return default
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        value = str(value)
+    try:
+        result = Decimal(str(value).strip() if isinstance(value, str) else value)
+    except InvalidOperation:
+        raise ValueError(f"Invalid number: {value!r}")
+    if not result.is_finite():
+        raise ValueError(f"Invalid number: {value!r}")
+    return result
+
+
+def money(value) -> Decimal:
+    """Round an amount half up to cents"""
+    return to_decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _price_lines(items):
+    """Line totals plus their sums, in one pass"""
+    quantize = Decimal.quantize
+    lines = []
+    append = lines.append
+    subtotal = discount_total = tax_total = ZERO
+    for quantity, price, tax_rate, discount_amount, discount_percentage in items:
+        line_subtotal = quantize(quantity * price, CENT, ROUND_HALF_UP)
+        if discount_amount:
+            discount = quantize(discount_amount, CENT, ROUND_HALF_UP)
+        elif discount_percentage:
+            discount = quantize(line_subtotal * discount_percentage / HUNDRED, CENT, ROUND_HALF_UP)
+        else:
+            discount = ZERO
+        taxable = line_subtotal - discount
+        tax = quantize(taxable * tax_rate / HUNDRED, CENT, ROUND_HALF_UP) if tax_rate else ZERO
+        append(ItemTotals(line_subtotal, discount, tax, taxable + tax))
+        subtotal += line_subtotal
+        discount_total += discount
+        tax_total += tax
+    return lines, subtotal, discount_total, tax_total
+
+
+def calculate_items(items: Iterable[ItemInput]) -> List[ItemTotals]:
+    """Line totals for a sequence of items"""
+    return _price_lines(items)[0]
+
+
+def calculate_documents(documents: Iterable[DocumentInput], legacy: Optional[bool] = None) -> List[DocumentTotals]:
+    """
+    Totals for many documents in one pass.
+    legacy defaults to settings.LEGACY_CALCULATION.
+    """
+    if legacy is None:
+        legacy = settings.LEGACY_CALCULATION
+    quantize = Decimal.quantize
+    price_lines = _price_lines
+    results = []
+    append = results.append
+    for items, discount_amount, discount_percentage, paid_amount in documents:
+        lines, subtotal, item_discount, tax_total = price_lines(items)
+        net = subtotal - item_discount
+
+        if discount_percentage:
+            discount = quantize(net * discount_percentage / HUNDRED, CENT, ROUND_HALF_UP)
+        elif discount_amount:
+            discount = quantize(discount_amount, CENT, ROUND_HALF_UP)
+        else:
+            discount = ZERO
+
+        if discount and not legacy and net:
+            # Spread the document discount over the lines and tax what is left
+            remaining = (net - discount) / net
+            tax_total = sum(
+                (quantize((line.subtotal - line.discount_amount) * remaining * item.tax_rate / HUNDRED,
+                          CENT, ROUND_HALF_UP)
+                 for line, item in zip(lines, items) if item.tax_rate),
+                ZERO
+            )
+
+        total = net + tax_total - discount
+        balance = total - quantize(paid_amount, CENT, ROUND_HALF_UP) if paid_amount else total
+        append(DocumentTotals(subtotal, item_discount, discount, tax_total, total, balance, lines))
+    return results
+
+
+def calculate_document(
+    items: Sequence[ItemInput],
+    discount_amount=ZERO,
+    discount_percentage=ZERO,
+    paid_amount=ZERO,
+    legacy: Optional[bool] = None,
+) -> DocumentTotals:
+    """Totals for a single document"""
+    document = DocumentInput(
+        list(items), to_decimal(discount_amount), to_decimal(discount_percentage), to_decimal(paid_amount)
+    )
+    return calculate_documents([document], legacy=legacy)[0]
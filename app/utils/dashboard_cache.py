@@ -0,0 +1,96 @@
+"""
+Per-user cache of the dashboard statistics.
+
+Entries live for settings.DASHBOARD_CACHE_TTL seconds and are dropped as soon
+as a transaction that changed the relevant rows commits:
+
+- an invoice (or a payment whose invoice is loaded) drops its owner's entry
+  and every admin's entry, since admins see totals over all invoices;
+- clients, bulk UPDATE/DELETE statements on invoices or payments, and
+  payments whose invoice is not loaded drop every entry.
+
+Invalidations are collected during flush/execute and applied after commit,
+so a concurrent request can not re-cache the pre-commit numbers. The cache
+is per process; with several workers the TTL bounds how stale another
+worker's entry can be.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.client import Client
+from app.models.invoice import Invoice
+from app.models.payment import Payment
+from app.utils.cache import TTLCache
+
+dashboard_cache = TTLCache(ttl=settings.DASHBOARD_CACHE_TTL, maxsize=1000)
+
+# Users whose cached stats span all invoices
+_admin_user_ids = set()
+
+_PENDING_KEY = "dashboard_cache_invalidate"
+_ALL = "all"
+
+
+def get_cached_stats(user, compute):
+    """Cached stats for the user, computing them with compute() on a miss"""
+    if settings.DASHBOARD_CACHE_TTL <= 0:
+        return compute()
+    if user.is_admin:
+        _admin_user_ids.add(user.id)
+    return dashboard_cache.get_or_set(user.id, compute)
+
+
+def invalidate_dashboard(user_ids=None) -> None:
+    """Drop the given users' entries (and all admin entries), or everything"""
+    if user_ids is None:
+        dashboard_cache.clear()
+        return
+    dashboard_cache.pop_many(set(user_ids) | _admin_user_ids)
+
+
+def _mark(session: Session, user_id=None) -> None:
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    if user_id is None:
+        pending.add(_ALL)
+    else:
+        pending.add(user_id)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_flushed_changes(session, flush_context, instances):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Invoice):
+            _mark(session, obj.user_id)
+        elif isinstance(obj, Payment):
+            invoice = obj.__dict__.get("invoice")
+            _mark(session, invoice.user_id if invoice is not None else None)
+        elif isinstance(obj, Client):
+            _mark(session)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_changes(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in (Invoice, Payment, Client):
+        _mark(orm_execute_state.session)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_invalidations(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    if _ALL in pending:
+        invalidate_dashboard()
+    else:
+        invalidate_dashboard(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session):
+    # A rolled back savepoint leaves the outer transaction's changes pending
+    if not session.in_transaction():
+        session.info.pop(_PENDING_KEY, None)
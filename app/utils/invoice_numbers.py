@@ -0,0 +1,109 @@
+"""
+Invoice number allocation from invoice groups.
+
+allocate_invoice_number() advances the group's counter with a single
+UPDATE ... RETURNING. The statement takes a row lock on the group, so two
+concurrent creates in the same group are serialised by the database and can
+never receive the same number, and no separate read of the invoices table is
+needed. The lock is held until the caller's transaction ends; if that
+transaction rolls back the number is handed out again.
+"""
+import re
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+
+from app.models.invoice import Invoice
+from app.models.invoice_group import InvoiceGroup
+from app.models.invoicesettings import InvoiceSettings
+
+DEFAULT_GROUP = "invoice-default"
+
+# Groups offered by the invoice settings page, created on first use
+DEFAULT_INVOICE_GROUPS = {
+    "invoice-default": ("Invoice Default", "INV-{{{id}}}", 4),
+    "monthly": ("Monthly", "INV-{{{year}}}{{{month}}}-{{{id}}}", 4),
+    "quarterly": ("Quarterly", "INV-{{{year}}}Q{{{quarter}}}-{{{id}}}", 4),
+    "yearly": ("Yearly", "INV-{{{year}}}-{{{id}}}", 4),
+}
+
+TAG_PATTERN = re.compile(r"\{\{\{(\w+)\}\}\}")
+FORMAT_TAGS = ("id", "year", "yy", "month", "day", "quarter")
+
+
+def format_invoice_number(identifier_format: str, number: int, left_pad: int = 0, on_date: Optional[date] = None) -> str:
+    """Render an identifier format for the given counter value and date"""
+    on_date = on_date or date.today()
+    values = {
+        "id": str(number).zfill(left_pad or 0),
+        "year": f"{on_date.year:04d}",
+        "yy": f"{on_date.year % 100:02d}",
+        "month": f"{on_date.month:02d}",
+        "day": f"{on_date.day:02d}",
+        "quarter": str((on_date.month - 1) // 3 + 1),
+    }
+    return TAG_PATTERN.sub(lambda match: values.get(match.group(1), match.group(0)), identifier_format)
+
+
+def validate_identifier_format(identifier_format: str) -> Optional[str]:
+    """Error message for an unusable identifier format, or None if it is valid"""
+    tags = TAG_PATTERN.findall(identifier_format or "")
+    unknown = [tag for tag in tags if tag not in FORMAT_TAGS]
+    if unknown:
+        return f"Unknown tag(s): {', '.join(unknown)}"
+    if "id" not in tags:
+        return "The format must contain {{{id}}}"
+    return None
+
+
+def default_group_slug(db) -> str:
+    """Group configured as default_invoice_group in the invoice settings"""
+    slug = db.query(InvoiceSettings.default_invoice_group).limit(1).scalar()
+    return slug or DEFAULT_GROUP
+
+
+def _create_group(db, slug: str) -> None:
+    """
+    Create one of the built-in groups. The default group starts after the
+    highest existing invoice id so it does not reissue numbers from the old
+    INV-{id} scheme. A concurrent creator winning the race is fine.
+    """
+    name, identifier_format, left_pad = DEFAULT_INVOICE_GROUPS[slug]
+    next_id = 1
+    if slug == DEFAULT_GROUP:
+        next_id = (db.query(func.max(Invoice.id)).scalar() or 0) + 1
+    try:
+        with db.begin_nested():
+            db.add(InvoiceGroup(
+                slug=slug, name=name, identifier_format=identifier_format,
+                next_id=next_id, left_pad=left_pad
+            ))
+    except IntegrityError:
+        pass
+
+
+def allocate_invoice_number(db, group_slug: Optional[str] = None, on_date: Optional[date] = None) -> str:
+    """
+    Take the next number from an invoice group and render it.
+    Uses the default invoice group when none is given.
+    Raises ValueError if the group does not exist.
+    """
+    slug = group_slug or default_group_slug(db)
+    statement = (
+        update(InvoiceGroup)
+        .where(InvoiceGroup.slug == slug)
+        .values(next_id=InvoiceGroup.next_id + 1)
+        .returning(InvoiceGroup.next_id, InvoiceGroup.identifier_format, InvoiceGroup.left_pad)
+        .execution_options(synchronize_session=False)
+    )
+    row = db.execute(statement).first()
+    if row is None and slug in DEFAULT_INVOICE_GROUPS:
+        _create_group(db, slug)
+        row = db.execute(statement).first()
+    if row is None:
+        raise ValueError(f"Invoice group '{slug}' does not exist")
+
+    next_id, identifier_format, left_pad = row
+    return format_invoice_number(identifier_format, next_id - 1, left_pad, on_date)
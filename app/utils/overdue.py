@@ -0,0 +1,63 @@
+"""
+Overdue invoice sweeper.
+
+Invoice.status is what lists, filters and the dashboard read, so SENT and
+VIEWED invoices whose due date has passed are flipped to OVERDUE in the
+database. mark_overdue_invoices() does that with a single UPDATE that the
+(status, due_date) index serves; run_overdue_sweeper() repeats it on a timer
+inside the web process (OVERDUE_SWEEP_INTERVAL seconds, 0 disables it), and
+scripts/mark_overdue_invoices.py runs it once, e.g. from cron.
+"""
+import asyncio
+import logging
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.invoice import Invoice, InvoiceStatus
+
+logger = logging.getLogger(__name__)
+
+SWEEP_STATUSES = (InvoiceStatus.SENT.value, InvoiceStatus.VIEWED.value)
+
+
+def mark_overdue_invoices(db: Session, today: Optional[date] = None) -> int:
+    """Flip SENT/VIEWED invoices due before today to OVERDUE; returns rows changed"""
+    statement = (
+        update(Invoice)
+        .where(Invoice.status.in_(SWEEP_STATUSES), Invoice.due_date < (today or date.today()))
+        .values(status=InvoiceStatus.OVERDUE.value)
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(statement).rowcount
+
+
+def sweep_once() -> int:
+    """Run one sweep in its own session and commit it"""
+    db = SessionLocal()
+    try:
+        changed = mark_overdue_invoices(db)
+        db.commit()
+        return changed
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def run_overdue_sweeper(interval: Optional[int] = None) -> None:
+    """Sweep every `interval` seconds until cancelled"""
+    interval = settings.OVERDUE_SWEEP_INTERVAL if interval is None else interval
+    while True:
+        try:
+            changed = await asyncio.to_thread(sweep_once)
+            if changed:
+                logger.info(f"Marked {changed} invoice(s) overdue")
+        except Exception as e:
+            logger.error(f"Overdue sweep failed: {str(e)}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,209 @@
+"""
+Shared paging helpers for the list APIs.
+
+fetch_page runs one page of an already-filtered query and works out the total
+number of matching rows in the same statement via count(*) OVER (), so the
+filter chain (and any ILIKE search) is only built and evaluated once.
+
+A cursor is an opaque, URL-safe token that records the sort the client asked
+for plus the (sort value, id) pair of the last row it received. The next page
+is fetched with a row-value comparison against that pair, so deep pages cost
+the same as the first one instead of scanning and discarding OFFSET rows.
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from sqlalchemy import and_, asc, desc, func, or_, tuple_
+
+from app.models.company_settings import CompanySettings
+
+# Accepted values for the `count` query parameter of list APIs
+COUNT_PATTERN = "^(exact|estimated|none)$"
+
+# Page size of the HTML list pages when company settings do not set one
+DEFAULT_ITEMS_PER_PAGE = 25
+
+
+def _driver_params(compiled):
+    """
+    Parameters of a compiled statement in the form its driver takes them: a
+    dict for named placeholders (psycopg2's %(name)s), a tuple in placeholder
+    order for positional ones (asyncpg's $1..$n under DATABASE_ASYNC)
+    """
+    params = compiled.params
+    if compiled.positional:
+        return tuple(params[name] for name in compiled.positiontup)
+    return params
+
+
+def count_rows(query, count: str = "exact") -> Optional[int]:
+    """
+    Count the rows matched by a query on its own.
+    "estimated" asks the PostgreSQL planner instead of scanning; other
+    databases have no cheap estimate and fall back to an exact count.
+    """
+    if count == "none":
+        return None
+
+    query = query.enable_eagerloads(False).order_by(None)
+    bind = query.session.get_bind()
+    if count == "estimated" and bind.dialect.name == "postgresql":
+        compiled = query.statement.compile(
+            dialect=bind.dialect, compile_kwargs={"render_postcompile": True}
+        )
+        plan = query.session.connection().exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {compiled}", _driver_params(compiled)
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    return query.count()
+
+
+def fetch_page(query, offset: int, limit: int, count: str = "exact") -> Tuple[List[Any], Optional[int]]:
+    """
+    Fetch one page of a filtered, ordered query together with its total.
+    Returns (rows, total); total is None when count == "none".
+    """
+    if count != "exact":
+        rows = query.offset(offset).limit(limit).all()
+        return rows, count_rows(query, count)
+
+    rows = query.add_columns(func.count().over()).offset(offset).limit(limit).all()
+    if rows:
+        return [row[0] for row in rows], rows[0][1]
+    if offset == 0:
+        return [], 0
+    # Past the last page there is no row to carry the window total
+    return [], count_rows(query, count)
+
+
+def total_pages(total: Optional[int], limit: int) -> Optional[int]:
+    """Number of pages for a total, or None when the total was not counted"""
+    if total is None:
+        return None
+    return (total + limit - 1) // limit
+
+
+def items_per_page(db) -> int:
+    """Page size for the HTML list pages, taken from the company settings"""
+    value = db.query(CompanySettings.items_per_page).limit(1).scalar()
+    return value if value and value > 0 else DEFAULT_ITEMS_PER_PAGE
+
+
+def pager(page: int, per_page: int, total: int, **params) -> dict:
+    """
+    Template context for the pagination bar of an HTML list page.
+    params are the active filters, carried over into the page links.
+    """
+    pages = max(total_pages(total, per_page), 1)
+    return {
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "total_pages": pages,
+        "has_prev": page > 1,
+        "has_next": page < pages,
+        "first_item": (page - 1) * per_page + 1 if total else 0,
+        "last_item": min(page * per_page, total),
+        "query": urlencode({key: value for key, value in params.items() if value not in (None, "")}),
+    }
+
+
+def _encode_value(value: Any) -> Optional[list]:
+    """Tag a sort value with its type so it can be restored exactly"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return ["dt", value.isoformat()]
+    if isinstance(value, date):
+        return ["d", value.isoformat()]
+    if isinstance(value, (Decimal, float)):
+        return ["n", str(value)]
+    if isinstance(value, int):
+        return ["i", value]
+    return ["s", str(value)]
+
+
+def _decode_value(tagged: Optional[list]) -> Any:
+    """Inverse of _encode_value"""
+    if tagged is None:
+        return None
+    kind, raw = tagged
+    if kind == "dt":
+        return datetime.fromisoformat(raw)
+    if kind == "d":
+        return date.fromisoformat(raw)
+    if kind == "n":
+        return Decimal(raw)
+    if kind == "i":
+        return int(raw)
+    if kind == "s":
+        return str(raw)
+    raise ValueError(f"Unknown cursor value type: {kind}")
+
+
+def encode_cursor(sort_by: str, sort_order: str, value: Any, last_id: int) -> str:
+    """Build an opaque cursor pointing just after the given row"""
+    payload = {
+        "s": sort_by,
+        "o": sort_order,
+        "v": _encode_value(value),
+        "id": last_id,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """
+    Decode a cursor produced by encode_cursor.
+    Raises ValueError if the token is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return {
+            "sort_by": payload["s"],
+            "sort_order": payload["o"],
+            "value": _decode_value(payload["v"]),
+            "id": int(payload["id"]),
+        }
+    except (ValueError, KeyError, TypeError, InvalidOperation) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def order_by_keyset(query, sort_column, id_column, descending: bool):
+    """
+    Order by (sort_column, id) with an explicit NULL placement.
+    NULLs go last for ascending and first for descending sorts, which is the
+    natural order of a btree index, so a (sort_column, id) index serves both.
+    """
+    if descending:
+        return query.order_by(desc(sort_column).nulls_first(), desc(id_column))
+    return query.order_by(asc(sort_column).nulls_last(), asc(id_column))
+
+
+def apply_keyset(query, sort_column, id_column, descending: bool, value: Any, last_id: int):
+    """Filter the query to rows that come strictly after (value, last_id)"""
+    if descending:
+        if value is None:
+            # Still inside the leading block of NULLs
+            return query.filter(or_(
+                and_(sort_column.is_(None), id_column < last_id),
+                sort_column.isnot(None),
+            ))
+        return query.filter(tuple_(sort_column, id_column) < tuple_(value, last_id))
+
+    if value is None:
+        # Inside the trailing block of NULLs
+        return query.filter(and_(sort_column.is_(None), id_column > last_id))
+    return query.filter(or_(
+        tuple_(sort_column, id_column) > tuple_(value, last_id),
+        sort_column.is_(None),
+    ))
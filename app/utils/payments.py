@@ -0,0 +1,132 @@
+"""
+Payment recording.
+
+Recording a payment inserts the Payment and moves the invoice's paid_amount
+and balance by the payment amount in the same transaction, marking the
+invoice paid once nothing is left to pay. The invoice rows are locked
+(SELECT ... FOR UPDATE, in id order so concurrent batches can not deadlock)
+before their balances are read, so two payments against the same invoice
+can not both apply to the old balance.
+
+record_payments() takes a whole batch: one locking SELECT for every invoice
+involved, one executemany UPDATE for the invoices, however many payments
+hit the same invoice, and a multi-row INSERT ... RETURNING for the payments
+(batched on PostgreSQL; SQLite falls back to one INSERT per row). Each
+recorded payment comes back with the invoice's paid amount, balance and
+status right after that payment, so several payments against one invoice
+report how the balance ran down rather than the end state for all of them.
+Nothing is committed; the caller commits or rolls back the batch as a whole.
+"""
+from datetime import date
+from decimal import Decimal
+from typing import List, NamedTuple, Optional, Sequence
+
+from sqlalchemy.orm import Session
+
+from app.models.invoice import Invoice, InvoiceStatus
+from app.models.payment import Payment
+from app.utils.calculations import money, to_decimal
+
+# Invoices that can not take payments
+UNPAYABLE_STATUSES = (InvoiceStatus.DRAFT.value, InvoiceStatus.CANCELLED.value)
+
+
+class PaymentInput(NamedTuple):
+    invoice_id: int
+    amount: Decimal
+    payment_date: date
+    payment_method: Optional[str] = None
+    reference: Optional[str] = None
+    payer: Optional[str] = None
+    notes: Optional[str] = None
+
+
+class RecordedPayment(NamedTuple):
+    """A recorded payment and its invoice's state right after it was applied"""
+    payment: Payment
+    paid_amount: Decimal
+    balance: Decimal
+    invoice_status: str
+
+
+class PaymentError(ValueError):
+    """Payments that can not be recorded; errors holds one {"index", "invoice_id", "error"} per problem"""
+
+    def __init__(self, errors: List[dict]):
+        self.errors = errors
+        super().__init__("; ".join(f"payment {error['index']}: {error['error']}" for error in errors))
+
+
+def apply_payment(invoice: Invoice, amount: Decimal) -> None:
+    """Move the invoice's paid amount and balance by amount, marking it paid when settled"""
+    invoice.paid_amount = money(to_decimal(invoice.paid_amount) + amount)
+    invoice.balance = money(to_decimal(invoice.total) - invoice.paid_amount)
+    if invoice.balance <= 0:
+        invoice.status = InvoiceStatus.PAID.value
+
+
+def record_payments(db: Session, payments: Sequence[PaymentInput], user=None) -> List[RecordedPayment]:
+    """
+    Record a batch of payments, all or nothing. When user is given and is not
+    an admin, only that user's invoices can be paid. A payment may not exceed
+    what is left on the invoice after the batch's earlier payments.
+    Raises PaymentError listing every rejected payment; otherwise returns a
+    RecordedPayment per flushed Payment, in input order.
+    """
+    invoice_ids = sorted({payment.invoice_id for payment in payments})
+    invoices_query = db.query(Invoice).filter(Invoice.id.in_(invoice_ids))
+    if user is not None and not user.is_admin:
+        invoices_query = invoices_query.filter(Invoice.user_id == user.id)
+    invoices = {
+        invoice.id: invoice
+        for invoice in invoices_query.order_by(Invoice.id).with_for_update().populate_existing()
+    }
+
+    errors = []
+    amounts = []
+    remaining = {invoice_id: to_decimal(invoice.balance) for invoice_id, invoice in invoices.items()}
+    for index, payment in enumerate(payments):
+        def reject(message):
+            errors.append({"index": index, "invoice_id": payment.invoice_id, "error": message})
+
+        try:
+            amount = money(payment.amount)
+        except ValueError:
+            reject("Invalid amount")
+            continue
+        invoice = invoices.get(payment.invoice_id)
+        if invoice is None:
+            reject("Invoice not found")
+        elif invoice.status in UNPAYABLE_STATUSES:
+            reject(f"Invoice {invoice.invoice_number} is {invoice.status_string} and can not take payments")
+        elif amount <= 0:
+            reject("Amount must be greater than zero")
+        elif amount > remaining[invoice.id]:
+            reject(f"Amount exceeds the open balance of {remaining[invoice.id]}")
+        else:
+            remaining[invoice.id] -= amount
+        amounts.append(amount)
+    if errors:
+        raise PaymentError(errors)
+
+    recorded = []
+    for payment, amount in zip(payments, amounts):
+        invoice = invoices[payment.invoice_id]
+        apply_payment(invoice, amount)
+        recorded.append(RecordedPayment(Payment(
+            invoice_id=payment.invoice_id,
+            amount=amount,
+            payment_date=payment.payment_date,
+            payment_method=payment.payment_method,
+            reference=payment.reference,
+            payer=payment.payer,
+            notes=payment.notes,
+        ), invoice.paid_amount, invoice.balance, invoice.status_string))
+    db.add_all(entry.payment for entry in recorded)
+    db.flush()
+    return recorded
+
+
+def record_payment(db: Session, payment: PaymentInput, user=None) -> Payment:
+    """Record a single payment; see record_payments()"""
+    return record_payments(db, [payment], user)[0].payment
@@ -0,0 +1,188 @@
+"""
+In-memory product catalog for the item pickers.
+
+Adding items is the most frequent thing users do while invoicing, and every
+keystroke in the product picker used to run a search over the products
+table. The catalog keeps the active products, with their family, unit and
+tax rate, plus the family and tax rate lists in process memory:
+
+- a sorted list of lowercase keys (each word of the name, and the SKU)
+  answers prefix lookups with two bisects per typed word;
+- products are pre-grouped by family;
+- version is a digest of the catalog's content, so every worker process
+  holding the same data hands out the same ETag.
+
+The catalog is rebuilt lazily on the first request after a commit that
+wrote products, families, units or tax rates (collected through session
+events, like the dashboard cache) and at the latest every
+settings.PRODUCT_CATALOG_TTL seconds, which bounds how long another
+worker's copy can lag behind.
+"""
+import bisect
+import hashlib
+import threading
+import time
+from typing import Dict, List, Optional
+
+import orjson
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.product import Product, ProductFamily, ProductUnit
+from app.models.tax_rate import TaxRate
+
+CATALOG_MODELS = (Product, ProductFamily, ProductUnit, TaxRate)
+
+_PENDING_KEY = "product_catalog_invalidate"
+
+_lock = threading.Lock()
+_generation = 0
+_catalog: Optional["ProductCatalog"] = None
+
+
+class ProductCatalog:
+    def __init__(self, products: List[dict], families: List[dict], tax_rates: List[dict], generation: int = 0):
+        self.products = products
+        self.tax_rates = tax_rates
+        self.generation = generation
+        self.built_at = time.monotonic()
+
+        keys = []
+        self.by_family: Dict[int, List[int]] = {}
+        for position, product in enumerate(products):
+            for word in set(product["name"].lower().split()):
+                keys.append((word, position))
+            if product["sku"]:
+                keys.append((product["sku"].lower(), position))
+            if product["family_id"] is not None:
+                self.by_family.setdefault(product["family_id"], []).append(position)
+        keys.sort()
+        self._keys = [key for key, _position in keys]
+        self._positions = [position for _key, position in keys]
+
+        self.families = [
+            {**family, "product_count": len(self.by_family.get(family["id"], ()))} for family in families
+        ]
+        self.version = hashlib.sha1(orjson.dumps([products, families, tax_rates])).hexdigest()[:20]
+
+    def _prefix_positions(self, prefix: str) -> set:
+        low = bisect.bisect_left(self._keys, prefix)
+        high = bisect.bisect_left(self._keys, prefix + "\uffff", low)
+        return set(self._positions[low:high])
+
+    def search(self, text: str = "", family_id: Optional[int] = None, limit: int = 25, offset: int = 0) -> List[dict]:
+        """
+        Products, in name order, where every word of text starts a word of
+        the name or the SKU, optionally limited to one family; limit of them
+        after skipping the first offset.
+        """
+        words = text.lower().split()
+        if words:
+            positions = self._prefix_positions(words[0])
+            for word in words[1:]:
+                if not positions:
+                    break
+                positions &= self._prefix_positions(word)
+            if family_id is not None:
+                positions &= set(self.by_family.get(family_id, ()))
+            positions = sorted(positions)
+        elif family_id is not None:
+            positions = self.by_family.get(family_id, [])
+        else:
+            positions = range(len(self.products))
+        return [self.products[position] for position in positions[offset:offset + limit]]
+
+
+def _load_catalog(db: Session, generation: int) -> ProductCatalog:
+    rows = db.query(
+        Product.id, Product.name, Product.sku, Product.description, Product.price, Product.tax_rate,
+        Product.family_id, ProductFamily.name.label("family_name"),
+        Product.unit_id, ProductUnit.name.label("unit_name"), ProductUnit.abbreviation.label("unit_abbreviation"),
+        Product.tax_rate_id, TaxRate.rate.label("tax_rate_percent"),
+    ).outerjoin(ProductFamily, Product.family_id == ProductFamily.id).outerjoin(
+        ProductUnit, Product.unit_id == ProductUnit.id
+    ).outerjoin(TaxRate, Product.tax_rate_id == TaxRate.id).filter(
+        Product.is_active == True
+    ).order_by(Product.name, Product.id)
+
+    products = [
+        {
+            "id": row.id,
+            "name": row.name,
+            "sku": row.sku,
+            "description": row.description,
+            "price": float(row.price) if row.price is not None else None,
+            "family_id": row.family_id,
+            "family": {"id": row.family_id, "name": row.family_name} if row.family_id is not None else None,
+            "unit": {"id": row.unit_id, "name": row.unit_name, "abbreviation": row.unit_abbreviation}
+            if row.unit_id is not None else None,
+            "tax_rate_id": row.tax_rate_id,
+            # The linked tax rate wins over the legacy per-product percentage
+            "tax_rate": float(row.tax_rate_percent if row.tax_rate_percent is not None else (row.tax_rate or 0)),
+        }
+        for row in rows
+    ]
+    families = [
+        {"id": row.id, "name": row.name}
+        for row in db.query(ProductFamily.id, ProductFamily.name)
+        .filter(ProductFamily.is_active == True).order_by(ProductFamily.name)
+    ]
+    tax_rates = [
+        {"id": row.id, "name": row.name, "rate": row.rate, "is_default": bool(row.is_default)}
+        for row in db.query(TaxRate.id, TaxRate.name, TaxRate.rate, TaxRate.is_default).order_by(TaxRate.name)
+    ]
+    return ProductCatalog(products, families, tax_rates, generation)
+
+
+def get_catalog(db: Session) -> ProductCatalog:
+    """The current catalog, rebuilding it first when it was invalidated or expired"""
+    global _catalog
+    catalog = _catalog
+    if (catalog is not None and catalog.generation == _generation
+            and time.monotonic() - catalog.built_at < settings.PRODUCT_CATALOG_TTL):
+        return catalog
+    with _lock:
+        catalog = _catalog
+        if (catalog is None or catalog.generation != _generation
+                or time.monotonic() - catalog.built_at >= settings.PRODUCT_CATALOG_TTL):
+            # A write committed while loading bumps _generation, so this
+            # catalog is already stale when stored and the next call reloads
+            catalog = _load_catalog(db, _generation)
+            _catalog = catalog
+    return catalog
+
+
+def invalidate_catalog() -> None:
+    """Make the next get_catalog() call rebuild the catalog"""
+    global _generation
+    _generation += 1
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_catalog_changes(session, flush_context, instances):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, CATALOG_MODELS):
+            session.info[_PENDING_KEY] = True
+            return
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_catalog_changes(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in CATALOG_MODELS:
+        orm_execute_state.session.info[_PENDING_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_catalog_invalidation(session):
+    if session.info.pop(_PENDING_KEY, None):
+        invalidate_catalog()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_invalidation(session):
+    if not session.in_transaction():
+        session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,269 @@
+"""
+Per-client rate limiting and concurrency quotas.
+
+RateLimitMiddleware gives every API key, and every user signed in with a
+JWT (bearer token or session cookie), a token bucket holding up to
+settings.RATE_LIMIT_BURST requests that refills at settings.RATE_LIMIT_RATE
+requests per second, and allows at most settings.RATE_LIMIT_CONCURRENCY of
+their requests in flight at once. Anonymous requests and /static are not
+limited; the login page and the auth dependencies deal with those.
+
+API keys are told apart by the hash of the whole key (the same one the API
+key cache uses) rather than by the displayed key_prefix, which two keys may
+share. The middleware does not look the key up, so made-up keys get their
+own bucket too and are then refused by authentication.
+
+Every limited response carries X-RateLimit-Limit, X-RateLimit-Remaining and
+X-RateLimit-Reset (seconds until the bucket is full again); a request over
+either limit gets 429 with Retry-After instead of reaching the endpoint.
+
+The buckets live in a RateLimitBackend. MemoryBackend, the default, keeps
+them in the worker process, so each worker enforces the limits on its own;
+with settings.RATE_LIMIT_BACKEND set to a redis:// URL, RedisBackend keeps
+them in Redis and the limits hold across all workers. Any other
+RateLimitBackend subclass can be passed to the middleware.
+"""
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from starlette.requests import HTTPConnection
+
+from app.config import settings
+from app.core.security import verify_token
+from app.utils.api_key_cache import hash_api_key
+from app.utils.responses import ORJSONResponse
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # Only needed for RedisBackend
+    redis_asyncio = None
+
+
+class TokenBucketResult(NamedTuple):
+    allowed: bool
+    tokens: float
+
+
+class RateLimitBackend(ABC):
+    """Storage for token buckets and in-flight counters"""
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: int, cost: int = 1) -> TokenBucketResult:
+        """Refill key's bucket and take cost tokens from it when it holds enough"""
+
+    @abstractmethod
+    async def acquire(self, key: str, limit: int) -> bool:
+        """Count one more request in flight for key unless limit are already running"""
+
+    @abstractmethod
+    async def release(self, key: str) -> None:
+        """Count one request of key as finished"""
+
+
+class MemoryBackend(RateLimitBackend):
+    """Buckets in process memory; at most maxsize buckets, least recently used dropped first"""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._in_flight: dict = {}
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, rate: float, burst: int, cost: int = 1) -> TokenBucketResult:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(burst), now]
+                while len(self._buckets) > self.maxsize:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            tokens = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            bucket[0], bucket[1] = tokens, now
+        return TokenBucketResult(allowed, tokens)
+
+    async def acquire(self, key: str, limit: int) -> bool:
+        with self._lock:
+            running = self._in_flight.get(key, 0)
+            if running >= limit:
+                return False
+            self._in_flight[key] = running + 1
+            return True
+
+    async def release(self, key: str) -> None:
+        with self._lock:
+            running = self._in_flight.get(key, 0) - 1
+            if running > 0:
+                self._in_flight[key] = running
+            else:
+                self._in_flight.pop(key, None)
+
+
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+_ACQUIRE_SCRIPT = """
+local running = redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+if running > tonumber(ARGV[1]) then
+    redis.call('DECR', KEYS[1])
+    return 0
+end
+return 1
+"""
+
+
+# Only decrements a counter that still exists and is above zero, so a
+# counter that expired during a long request is not recreated at -1
+_RELEASE_SCRIPT = """
+local running = tonumber(redis.call('GET', KEYS[1]))
+if running and running > 0 then
+    redis.call('DECR', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisBackend(RateLimitBackend):
+    """
+    Buckets in Redis, shared by every worker. In-flight counters expire
+    after counter_ttl seconds without a new request, so a worker that dies
+    mid-request can not hold a slot forever.
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:", counter_ttl: int = 300):
+        if redis_asyncio is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND points to Redis but the redis package is not installed")
+        self.prefix = prefix
+        self.counter_ttl = counter_ttl
+        self._redis = redis_asyncio.from_url(url)
+        self._take = self._redis.register_script(_TAKE_SCRIPT)
+        self._acquire = self._redis.register_script(_ACQUIRE_SCRIPT)
+        self._release = self._redis.register_script(_RELEASE_SCRIPT)
+
+    async def take(self, key: str, rate: float, burst: int, cost: int = 1) -> TokenBucketResult:
+        allowed, tokens = await self._take(keys=[f"{self.prefix}bucket:{key}"], args=[rate, burst, cost])
+        return TokenBucketResult(bool(allowed), float(tokens))
+
+    async def acquire(self, key: str, limit: int) -> bool:
+        return bool(await self._acquire(keys=[f"{self.prefix}running:{key}"], args=[limit, self.counter_ttl]))
+
+    async def release(self, key: str) -> None:
+        await self._release(keys=[f"{self.prefix}running:{key}"])
+
+
+def create_backend(spec: Optional[str] = None) -> RateLimitBackend:
+    """Backend for a RATE_LIMIT_BACKEND value: "memory" or a redis:// / rediss:// URL"""
+    spec = spec or settings.RATE_LIMIT_BACKEND
+    if spec == "memory":
+        return MemoryBackend()
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(spec)
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {spec}")
+
+
+def client_key(connection: HTTPConnection) -> Optional[str]:
+    """Who a request is limited as: "key:<hash>" for API keys, "user:<id>" for JWTs, None for anonymous"""
+    token = None
+    authorization = connection.headers.get("authorization", "")
+    scheme, _, credentials = authorization.partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        if credentials.startswith("sk_"):
+            return f"key:{hash_api_key(credentials)[:32]}"
+        token = credentials
+    else:
+        token = connection.cookies.get("session_token")
+    if not token:
+        return None
+    payload = verify_token(token)
+    if not payload or payload.get("sub") is None:
+        return None
+    return f"user:{payload['sub']}"
+
+
+class RateLimitMiddleware:
+    def __init__(
+        self,
+        app,
+        backend: Optional[RateLimitBackend] = None,
+        rate: Optional[float] = None,
+        burst: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        exempt_prefixes=("/static",),
+    ):
+        self.app = app
+        self.backend = backend or create_backend()
+        self.rate = settings.RATE_LIMIT_RATE if rate is None else rate
+        self.burst = settings.RATE_LIMIT_BURST if burst is None else burst
+        self.concurrency = settings.RATE_LIMIT_CONCURRENCY if concurrency is None else concurrency
+        self.exempt_prefixes = tuple(exempt_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt_prefixes):
+            await self.app(scope, receive, send)
+            return
+        key = client_key(HTTPConnection(scope))
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {}
+        if self.rate > 0:
+            result = await self.backend.take(key, self.rate, self.burst)
+            headers = {
+                "X-RateLimit-Limit": str(self.burst),
+                "X-RateLimit-Remaining": str(int(result.tokens)),
+                "X-RateLimit-Reset": str(math.ceil((self.burst - result.tokens) / self.rate)),
+            }
+            if not result.allowed:
+                headers["Retry-After"] = str(max(1, math.ceil((1 - result.tokens) / self.rate)))
+                await ORJSONResponse({"detail": "Rate limit exceeded"}, status_code=429, headers=headers)(
+                    scope, receive, send
+                )
+                return
+
+        if self.concurrency > 0:
+            if not await self.backend.acquire(key, self.concurrency):
+                headers["Retry-After"] = "1"
+                await ORJSONResponse({"detail": "Too many concurrent requests"}, status_code=429, headers=headers)(
+                    scope, receive, send
+                )
+                return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and headers:
+                message["headers"] = list(message.get("headers", [])) + [
+                    (name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            if self.concurrency > 0:
+                await self.backend.release(key)
@@ -0,0 +1,146 @@
+"""
+Set-based recalculation of stored invoice totals.
+
+Re-derives subtotal, tax_total, discount_amount, total, paid_amount and
+balance for every invoice from its stored item lines and payments, using the
+same formula as app/utils/calculations.py, with one
+UPDATE invoices ... FROM (SELECT ... GROUP BY ...) per id range instead of
+re-saving invoices one at a time. Only rows whose values actually change are
+written, so the reported count is the number of invoices that were wrong.
+
+Line values (subtotal, discount_amount, tax_amount) are taken as stored.
+invoice_items has no tax rate column, so with LEGACY_CALCULATION off an
+invoice that has a document discount keeps its stored tax_total.
+"""
+from typing import Optional
+
+from sqlalchemy import case, func, or_, select, update
+from sqlalchemy.orm import Session, aliased
+
+from app.config import settings
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.payment import Payment
+from app.utils.revenue_rollup import INVOICE_ATTRIBUTES, apply_revenue_deltas, invoice_revenue_delta
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _recalculate_range(db: Session, low: int, high: int, legacy: bool) -> int:
+    """Recalculate invoices with low <= id < high; returns rows changed"""
+    items = (
+        select(
+            InvoiceItem.invoice_id.label("invoice_id"),
+            func.sum(InvoiceItem.subtotal).label("subtotal"),
+            func.sum(InvoiceItem.discount_amount).label("item_discount"),
+            func.sum(InvoiceItem.tax_amount).label("tax_total"),
+        )
+        .where(InvoiceItem.invoice_id >= low, InvoiceItem.invoice_id < high)
+        .group_by(InvoiceItem.invoice_id)
+        .subquery("item_totals")
+    )
+    payments = (
+        select(Payment.invoice_id.label("invoice_id"), func.sum(Payment.amount).label("paid"))
+        .where(Payment.invoice_id >= low, Payment.invoice_id < high)
+        .group_by(Payment.invoice_id)
+        .subquery("payment_totals")
+    )
+    # Outer join from invoices so invoices without items are zeroed too
+    source = aliased(Invoice, name="source")
+    totals = (
+        select(
+            source.id.label("id"),
+            func.coalesce(items.c.subtotal, 0).label("subtotal"),
+            func.coalesce(items.c.item_discount, 0).label("item_discount"),
+            func.coalesce(items.c.tax_total, 0).label("tax_total"),
+            payments.c.paid.label("paid"),
+        )
+        .select_from(source)
+        .outerjoin(items, items.c.invoice_id == source.id)
+        .outerjoin(payments, payments.c.invoice_id == source.id)
+        .where(source.id >= low, source.id < high)
+        .subquery("totals")
+    )
+
+    net = totals.c.subtotal - totals.c.item_discount
+    percentage = func.coalesce(Invoice.discount_percentage, 0)
+    discount = case(
+        (percentage > 0, func.round(net * percentage / 100, 2)),
+        else_=func.coalesce(Invoice.discount_amount, 0),
+    )
+    if legacy:
+        tax_total = totals.c.tax_total
+    else:
+        tax_total = case((discount == 0, totals.c.tax_total), else_=func.coalesce(Invoice.tax_total, 0))
+    total = net + tax_total - discount
+    # Recorded payments; invoices without any (e.g. imported ones) keep their stored paid_amount
+    paid = func.coalesce(totals.c.paid, Invoice.paid_amount, 0)
+
+    new_values = {
+        "subtotal": totals.c.subtotal,
+        "tax_total": tax_total,
+        "discount_amount": discount,
+        "total": total,
+        "paid_amount": paid,
+        "balance": total - paid,
+    }
+    changed = or_(*(
+        getattr(Invoice, column).is_distinct_from(value) for column, value in new_values.items()
+    ))
+    # A bulk UPDATE bypasses the flush, so the rollup deltas are worked out
+    # here from the rows' values before and after; the rows are locked until
+    # the batch commits so the old values stay accurate
+    rollup_columns = [getattr(Invoice, attribute) for attribute in INVOICE_ATTRIBUTES]
+    old_values = {
+        row[0]: dict(zip(INVOICE_ATTRIBUTES, row[1:]))
+        for row in db.execute(
+            select(Invoice.id, *rollup_columns).where(Invoice.id >= low, Invoice.id < high).with_for_update()
+        )
+    }
+    statement = (
+        update(Invoice)
+        .where(Invoice.id == totals.c.id, changed)
+        .values(**new_values)
+        .returning(Invoice.id, *rollup_columns)
+        .execution_options(synchronize_session=False)
+    )
+    deltas = {}
+    changed_rows = 0
+    for row in db.execute(statement):
+        invoice_revenue_delta(deltas, old_values[row[0]], dict(zip(INVOICE_ATTRIBUTES, row[1:])))
+        changed_rows += 1
+    apply_revenue_deltas(db, deltas)
+    return changed_rows
+
+
+def recalculate_invoice_totals(
+    db: Session,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    start_id: Optional[int] = None,
+    end_id: Optional[int] = None,
+    commit: bool = True,
+    legacy: Optional[bool] = None,
+) -> dict:
+    """
+    Recalculate stored totals for invoices with start_id <= id <= end_id
+    (all invoices by default), batch_size ids per statement. Each batch is
+    committed on its own so row locks are held briefly; with commit=False
+    nothing is committed and the caller decides.
+    Returns {"batches", "rows_changed", "first_id", "last_id"}.
+    """
+    if legacy is None:
+        legacy = settings.LEGACY_CALCULATION
+    low, high = db.query(func.min(Invoice.id), func.max(Invoice.id)).one()
+    if low is None:
+        return {"batches": 0, "rows_changed": 0, "first_id": None, "last_id": None}
+    if start_id is not None:
+        low = max(low, start_id)
+    if end_id is not None:
+        high = min(high, end_id)
+
+    batches = rows_changed = 0
+    for batch_low in range(low, high + 1, batch_size):
+        rows_changed += _recalculate_range(db, batch_low, min(batch_low + batch_size, high + 1), legacy)
+        batches += 1
+        if commit:
+            db.commit()
+    return {"batches": batches, "rows_changed": rows_changed, "first_id": low, "last_id": high}
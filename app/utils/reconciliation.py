@@ -0,0 +1,350 @@
+"""
+Bank statement reconciliation.
+
+An uploaded CSV or OFX statement is parsed into StatementLine tuples and
+matched against the open invoices. The invoices are loaded once per upload
+into a ReconciliationIndex, a set of dictionaries keyed by normalized
+invoice number, by open balance in cents and by normalized client name, so
+each statement line costs a few dictionary lookups instead of queries.
+
+A credit line is matched, in order, by:
+
+1. an invoice number appearing in its reference or description;
+2. its amount equal to the open balance of exactly one invoice of the
+   client named as payee.
+
+The line must not exceed the invoice's open balance, counting lines
+already matched from the same statement. Lines whose bank reference was
+already recorded as a Payment.reference on an invoice the uploader can
+reconcile are skipped as duplicates, so uploading the same statement twice
+is harmless. Everything else, including
+lines whose amount fits exactly one invoice of an unknown payer, is left
+for review with the candidate invoice as a suggestion. Matched lines are
+recorded through app/utils/payments.record_payments() in one batch.
+"""
+import csv
+import io
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.client import Client
+from app.models.invoice import Invoice, InvoiceStatus
+from app.models.payment import Payment
+from app.utils.calculations import money
+from app.utils.payments import PaymentInput, record_payments
+
+# Invoices that can be matched
+OPEN_STATUSES = (InvoiceStatus.SENT.value, InvoiceStatus.VIEWED.value, InvoiceStatus.OVERDUE.value)
+
+# Lowercased CSV header names understood for each field
+CSV_COLUMNS = {
+    "date": ("date", "booking date", "transaction date", "posted date", "posting date", "value date"),
+    "amount": ("amount", "transaction amount", "value"),
+    "credit": ("credit", "credit amount", "paid in", "deposit", "deposits"),
+    "reference": ("reference", "ref", "transaction id", "fitid", "id"),
+    "description": ("description", "memo", "details", "narrative", "remittance information", "purpose"),
+    "payee": ("payee", "name", "counterparty", "payer", "from", "beneficiary"),
+}
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d.%m.%Y", "%Y/%m/%d", "%d-%m-%Y")
+
+# Chunk size for IN (...) lookups of existing payment references
+REFERENCE_LOOKUP_CHUNK = 1000
+
+_DECIMAL_COMMA = re.compile(r"-?\d*,\d{1,2}")
+_THOUSANDS_COMMA = re.compile(r"-?\d{1,3}(?:,\d{3})+")
+_TOKEN_SPLIT = re.compile(r"[\s,;:()\[\]]+")
+_NON_ALNUM = re.compile(r"[^0-9A-Z]")
+_OFX_TRANSACTION = re.compile(r"<STMTTRN>(.*?)(?:</STMTTRN>|(?=<STMTTRN>)|(?=</BANKTRANLIST>))", re.S | re.I)
+_OFX_FIELD = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+class StatementLine(NamedTuple):
+    line_number: int
+    date: date
+    amount: Decimal
+    reference: Optional[str] = None
+    description: Optional[str] = None
+    payee: Optional[str] = None
+
+
+class StatementError(ValueError):
+    """The uploaded file can not be read as a bank statement"""
+
+
+def normalize(value: Optional[str]) -> str:
+    """Uppercase letters and digits only, so 'inv-0042' matches 'INV 0042'"""
+    return _NON_ALNUM.sub("", (value or "").upper())
+
+
+def _parse_amount(value: str) -> Optional[Decimal]:
+    value = (value or "").strip().replace(" ", "").replace("\u00a0", "")
+    if not value:
+        return None
+    negative = value.startswith("(") and value.endswith(")")
+    value = re.sub(r"[^0-9,.\-]", "", value)
+    # 1.234,56 and 1,234.56 both become 1234.56
+    if "," in value and "." in value:
+        if value.rfind(",") > value.rfind("."):
+            value = value.replace(".", "").replace(",", ".")
+        else:
+            value = value.replace(",", "")
+    elif _DECIMAL_COMMA.fullmatch(value):
+        # 12,5 and 12,50 are European decimals
+        value = value.replace(",", ".")
+    elif _THOUSANDS_COMMA.fullmatch(value):
+        # 1,234 and 1,234,567 group thousands
+        value = value.replace(",", "")
+    elif "," in value:
+        raise ValueError(f"Ambiguous amount: {value!r}")
+    amount = money(value)
+    return -amount if negative else amount
+
+
+def _parse_date(value: str, formats: Iterable[str] = DATE_FORMATS) -> date:
+    value = (value or "").strip()
+    for date_format in formats:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date: {value!r}")
+
+
+def parse_csv_statement(text: str, date_format: Optional[str] = None) -> List[StatementLine]:
+    """
+    Statement lines from a CSV export with a header row. Columns are found by
+    name (see CSV_COLUMNS); the delimiter is sniffed. Either an amount column
+    (credits positive) or a credit column is required.
+    """
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(io.StringIO(text), dialect)
+    header = [column.strip().lower() for column in next(reader, [])]
+    columns = {}
+    for field, names in CSV_COLUMNS.items():
+        for name in names:
+            if name in header:
+                columns[field] = header.index(name)
+                break
+    if "date" not in columns or not ({"amount", "credit"} & columns.keys()):
+        raise StatementError("The CSV needs a header row with a date column and an amount or credit column")
+
+    formats = (date_format,) if date_format else DATE_FORMATS
+    amount_column = columns.get("credit", columns.get("amount"))
+    lines = []
+    for line_number, row in enumerate(reader, start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        cell = lambda field: row[columns[field]].strip() if field in columns and columns[field] < len(row) else None
+        try:
+            amount = _parse_amount(row[amount_column] if amount_column < len(row) else "")
+            if amount is None:
+                continue
+            lines.append(StatementLine(
+                line_number=line_number,
+                date=_parse_date(cell("date"), formats),
+                amount=amount,
+                reference=(cell("reference") or "")[:100] or None,
+                description=cell("description") or None,
+                payee=cell("payee") or None,
+            ))
+        except ValueError as e:
+            raise StatementError(f"Line {line_number}: {e}")
+    return lines
+
+
+def parse_ofx_statement(text: str) -> List[StatementLine]:
+    """Statement lines from an OFX file, SGML (1.x) or XML (2.x)"""
+    lines = []
+    for number, match in enumerate(_OFX_TRANSACTION.finditer(text), start=1):
+        fields = {name.upper(): value.strip() for name, value in _OFX_FIELD.findall(match.group(1))}
+        try:
+            lines.append(StatementLine(
+                line_number=number,
+                date=datetime.strptime(fields["DTPOSTED"][:8], "%Y%m%d").date(),
+                amount=_parse_amount(fields["TRNAMT"]),
+                reference=(fields.get("FITID") or fields.get("REFNUM") or fields.get("CHECKNUM") or "")[:100] or None,
+                description=fields.get("MEMO"),
+                payee=fields.get("NAME") or fields.get("PAYEE"),
+            ))
+        except (KeyError, ValueError) as e:
+            raise StatementError(f"Transaction {number}: missing or invalid {e}")
+    if not lines and "<OFX>" not in text.upper():
+        raise StatementError("Not an OFX file")
+    return lines
+
+
+def parse_statement(filename: str, content: bytes, date_format: Optional[str] = None) -> List[StatementLine]:
+    """Parse an uploaded statement, choosing the format from the name or content"""
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = content.decode("latin-1")
+    if (filename or "").lower().endswith((".ofx", ".qfx")) or text.lstrip().upper().startswith(("OFXHEADER", "<?XML", "<OFX")):
+        return parse_ofx_statement(text)
+    return parse_csv_statement(text, date_format)
+
+
+class OpenInvoice(NamedTuple):
+    id: int
+    invoice_number: str
+    client_id: int
+    balance: Decimal
+
+
+class ReconciliationIndex:
+    """Open invoices indexed by normalized number, balance in cents and client name"""
+
+    def __init__(self, invoices: Iterable[OpenInvoice], client_names: Dict[int, Iterable[str]]):
+        self.invoices: Dict[int, OpenInvoice] = {}
+        self.remaining: Dict[int, Decimal] = {}
+        self.by_number: Dict[str, int] = {}
+        self.by_amount: Dict[Decimal, List[int]] = {}
+        for invoice in invoices:
+            self.invoices[invoice.id] = invoice
+            self.remaining[invoice.id] = invoice.balance
+            self.by_number[normalize(invoice.invoice_number)] = invoice.id
+            self.by_amount.setdefault(invoice.balance, []).append(invoice.id)
+        self.by_client_name: Dict[str, set] = {}
+        for client_id, names in client_names.items():
+            for name in names:
+                key = normalize(name)
+                if key:
+                    self.by_client_name.setdefault(key, set()).add(client_id)
+
+    @classmethod
+    def load(cls, db: Session, user=None) -> "ReconciliationIndex":
+        """Index every open invoice with a balance (only the user's own unless admin)"""
+        invoices_query = db.query(Invoice.id, Invoice.invoice_number, Invoice.client_id, Invoice.balance).filter(
+            Invoice.status.in_(OPEN_STATUSES), Invoice.balance > 0
+        )
+        if user is not None and not user.is_admin:
+            invoices_query = invoices_query.filter(Invoice.user_id == user.id)
+        invoices = [OpenInvoice(row.id, row.invoice_number, row.client_id, money(row.balance)) for row in invoices_query]
+
+        client_ids = {invoice.client_id for invoice in invoices}
+        client_names = {}
+        if client_ids:
+            for row in db.query(Client.id, Client.name, Client.surname, Client.company).filter(Client.id.in_(client_ids)):
+                full_name = f"{row.name} {row.surname}" if row.surname else row.name
+                client_names[row.id] = (row.company, full_name)
+        return cls(invoices, client_names)
+
+    def find_by_number(self, line: StatementLine) -> Optional[int]:
+        """Invoice whose number appears in the line's reference or description"""
+        for text in (line.reference, line.description):
+            if not text:
+                continue
+            whole = normalize(text)
+            if whole in self.by_number:
+                return self.by_number[whole]
+            for token in _TOKEN_SPLIT.split(text):
+                invoice_id = self.by_number.get(normalize(token))
+                if invoice_id is not None:
+                    return invoice_id
+        return None
+
+    def find_by_amount(self, line: StatementLine) -> List[int]:
+        """Invoices whose remaining balance equals the line amount"""
+        return [invoice_id for invoice_id in self.by_amount.get(line.amount, ())
+                if self.remaining[invoice_id] == line.amount]
+
+    def clients_named(self, payee: Optional[str]) -> set:
+        return self.by_client_name.get(normalize(payee), set())
+
+    def apply(self, invoice_id: int, amount: Decimal) -> None:
+        self.remaining[invoice_id] -= amount
+
+
+class ReconciliationResult(NamedTuple):
+    matched: List[dict]
+    unmatched: List[dict]
+    duplicates: List[StatementLine]
+    ignored: int
+
+
+def match_statement(lines: Iterable[StatementLine], index: ReconciliationIndex,
+                    known_references: Optional[set] = None) -> ReconciliationResult:
+    """Match statement lines against the index without touching the database"""
+    known_references = known_references or set()
+    matched, unmatched, duplicates = [], [], []
+    ignored = 0
+    for line in lines:
+        if line.amount <= 0:
+            ignored += 1
+            continue
+        if line.reference and line.reference in known_references:
+            duplicates.append(line)
+            continue
+
+        invoice_id = index.find_by_number(line)
+        rule = "invoice_number"
+        suggestion = None
+        if invoice_id is None:
+            rule = "amount_client"
+            candidates = index.find_by_amount(line)
+            clients = index.clients_named(line.payee)
+            for_client = [candidate for candidate in candidates if index.invoices[candidate].client_id in clients]
+            if len(for_client) == 1:
+                invoice_id = for_client[0]
+            elif len(candidates) == 1:
+                suggestion = index.invoices[candidates[0]]
+
+        if invoice_id is not None and line.amount > index.remaining[invoice_id]:
+            unmatched.append({"line": line, "reason": "Amount exceeds the open balance",
+                              "suggestion": index.invoices[invoice_id]})
+        elif invoice_id is not None:
+            index.apply(invoice_id, line.amount)
+            if line.reference:
+                known_references.add(line.reference)
+            matched.append({"line": line, "invoice": index.invoices[invoice_id], "rule": rule})
+        else:
+            reason = "Amount matches one open invoice, but not its client" if suggestion else "No matching invoice"
+            unmatched.append({"line": line, "reason": reason, "suggestion": suggestion})
+    return ReconciliationResult(matched, unmatched, duplicates, ignored)
+
+
+def _known_references(db: Session, lines: List[StatementLine], user=None) -> set:
+    """
+    References of the given lines that are already recorded as payments, on
+    the user's own invoices unless admin (the same ones ReconciliationIndex
+    matches against)
+    """
+    references = sorted({line.reference for line in lines if line.reference})
+    known = set()
+    for start in range(0, len(references), REFERENCE_LOOKUP_CHUNK):
+        chunk = references[start:start + REFERENCE_LOOKUP_CHUNK]
+        query = db.query(Payment.reference).filter(Payment.reference.in_(chunk))
+        if user is not None and not user.is_admin:
+            query = query.join(Invoice, Payment.invoice_id == Invoice.id).filter(Invoice.user_id == user.id)
+        known.update(row[0] for row in query)
+    return known
+
+
+def reconcile_statement(db: Session, lines: List[StatementLine], user=None, apply: bool = True) -> ReconciliationResult:
+    """
+    Match a parsed statement against the open invoices and, when apply is
+    set, record a Payment for every matched line. Nothing is committed.
+    """
+    index = ReconciliationIndex.load(db, user)
+    result = match_statement(lines, index, _known_references(db, lines, user))
+    if apply and result.matched:
+        record_payments(db, [
+            PaymentInput(
+                invoice_id=match["invoice"].id,
+                amount=match["line"].amount,
+                payment_date=match["line"].date,
+                payment_method="bank_transfer",
+                reference=match["line"].reference,
+                payer=(match["line"].payee or "")[:100] or None,
+                notes=match["line"].description,
+            )
+            for match in result.matched
+        ], user)
+    return result
@@ -0,0 +1,20 @@
+"""
+JSON response class for the list and detail APIs.
+
+Handlers build their payload from the response schemas in app.schemas
+(dumped in python mode, so dates and datetimes are left as objects) and
+return an ORJSONResponse directly. Returning the response object skips
+FastAPI's jsonable_encoder pass, and orjson encodes dates, datetimes and
+floats natively.
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,308 @@
+"""
+Maintenance of the revenue_daily rollup.
+
+The rollup is derived from invoices and payments and kept current with
+deltas. While flushing, the session works out what each changed invoice and
+payment contributed to its (day, user, client) row before and after the
+change: old values come from the attribute history, new ones from the
+objects. For payments whose invoice moved to another user or client, or was
+deleted, the amounts per day come from one query. The differences are
+summed per row and applied after the flush with
+INSERT ... ON CONFLICT (day, user_id, client_id) DO UPDATE SET col = col +
+excluded.col, in key order. Concurrent writes to the same day then only
+lock the rows they change and add to each other instead of failing on the
+unique constraint. Databases without ON CONFLICT get an UPDATE of the row
+and an INSERT when it did not exist yet; there two transactions creating
+the same new row can still collide on the unique constraint. Rows left with
+no invoices and no payments are deleted.
+
+Bulk UPDATE statements bypass the flush; their callers apply the deltas of
+the rows they changed themselves with apply_revenue_deltas() (see
+app/utils/recalculation.py). rebuild_revenue_rollup() recomputes the whole
+table, e.g. after an import (scripts/rebuild_revenue_rollup.py).
+
+The listeners are registered when app.models is imported, so scripts and
+the importer keep the rollup current too.
+"""
+from datetime import date
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, event, func, insert, inspect, literal, or_, select, tuple_, union_all, update
+from sqlalchemy.orm import Session
+
+from app.models.invoice import Invoice, InvoiceStatus
+from app.models.payment import Payment
+from app.models.revenue_daily import RevenueDaily
+from app.utils.calculations import to_decimal
+
+# Invoices that are not (or no longer) issued do not count as invoiced
+EXCLUDED_STATUSES = (InvoiceStatus.DRAFT.value, InvoiceStatus.CANCELLED.value)
+
+ROLLUP_COLUMNS = (
+    "day", "user_id", "client_id", "revenue", "invoiced", "tax",
+    "invoice_count", "payments", "payment_count",
+)
+
+# Invoice attributes the rollup depends on
+INVOICE_ATTRIBUTES = ("issue_date", "user_id", "client_id", "status", "total", "tax_total")
+PAYMENT_ATTRIBUTES = ("payment_date", "amount", "invoice_id")
+
+# Summed per rollup row by the deltas; revenue is derived from invoiced - tax
+SUM_COLUMNS = ("revenue", "invoiced", "tax", "invoice_count", "payments", "payment_count")
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+UPSERT_DIALECTS = ("postgresql", "sqlite")
+
+_DELTAS_KEY = "revenue_rollup_deltas"
+
+
+def _rollup_select():
+    """Rollup rows computed from scratch"""
+    invoices = select(
+        Invoice.issue_date.label("day"),
+        Invoice.user_id.label("user_id"),
+        Invoice.client_id.label("client_id"),
+        func.coalesce(Invoice.total, 0).label("invoiced"),
+        func.coalesce(Invoice.tax_total, 0).label("tax"),
+        literal(1).label("invoice_count"),
+        literal(0).label("payments"),
+        literal(0).label("payment_count"),
+    ).where(Invoice.status.notin_(EXCLUDED_STATUSES))
+    payments = select(
+        Payment.payment_date, Invoice.user_id, Invoice.client_id,
+        literal(0), literal(0), literal(0),
+        func.coalesce(Payment.amount, 0), literal(1),
+    ).join(Invoice, Payment.invoice_id == Invoice.id)
+
+    rows = union_all(invoices, payments).subquery("rollup_source")
+    return select(
+        rows.c.day,
+        rows.c.user_id,
+        rows.c.client_id,
+        func.sum(rows.c.invoiced) - func.sum(rows.c.tax),
+        func.sum(rows.c.invoiced),
+        func.sum(rows.c.tax),
+        func.sum(rows.c.invoice_count),
+        func.sum(rows.c.payments),
+        func.sum(rows.c.payment_count),
+    ).group_by(rows.c.day, rows.c.user_id, rows.c.client_id)
+
+
+def _upsert(dialect: str):
+    """INSERT ... ON CONFLICT DO UPDATE adding a row's values to the existing one"""
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    statement = dialect_insert(RevenueDaily)
+    columns = RevenueDaily.__table__.c
+    return statement.on_conflict_do_update(
+        index_elements=[columns.day, columns.user_id, columns.client_id],
+        set_={name: columns[name] + statement.excluded[name] for name in SUM_COLUMNS},
+    )
+
+
+def _update_or_insert(connection, row: dict) -> None:
+    """Add a row's values to the existing one, inserting it when there is none"""
+    table = RevenueDaily.__table__
+    key = (table.c.day == row["day"], table.c.user_id == row["user_id"], table.c.client_id == row["client_id"])
+    result = connection.execute(
+        update(table).where(*key).values({name: table.c[name] + row[name] for name in SUM_COLUMNS})
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(**row))
+
+
+def apply_revenue_deltas(connection, deltas: Dict[Tuple, List]) -> None:
+    """
+    Add deltas, {(day, user_id, client_id): [invoiced, tax, invoice_count,
+    payments, payment_count]}, to the rollup rows; takes a Session or
+    Connection. Rows are written in key order so concurrent transactions
+    lock them in the same order.
+    """
+    rows = [
+        {
+            "day": day, "user_id": user_id, "client_id": client_id,
+            "revenue": invoiced - tax, "invoiced": invoiced, "tax": tax, "invoice_count": invoice_count,
+            "payments": payments, "payment_count": payment_count,
+        }
+        for (day, user_id, client_id), (invoiced, tax, invoice_count, payments, payment_count) in sorted(deltas.items())
+        if any((invoiced, tax, invoice_count, payments, payment_count))
+    ]
+    if not rows:
+        return
+    bind = connection.get_bind() if isinstance(connection, Session) else connection
+    keys = [(row["day"], row["user_id"], row["client_id"]) for row in rows]
+    if bind.dialect.name in UPSERT_DIALECTS:
+        statement = _upsert(bind.dialect.name)
+        for row in rows:
+            connection.execute(statement.values(**row))
+        changed = tuple_(RevenueDaily.day, RevenueDaily.user_id, RevenueDaily.client_id).in_(keys)
+    else:
+        for row in rows:
+            _update_or_insert(connection, row)
+        # Row-value IN is not available everywhere
+        changed = or_(*(
+            and_(RevenueDaily.day == day, RevenueDaily.user_id == user_id, RevenueDaily.client_id == client_id)
+            for day, user_id, client_id in keys
+        ))
+
+    # Drop rows that no longer count anything, as a rebuild would not have them
+    connection.execute(
+        delete(RevenueDaily).where(
+            changed,
+            RevenueDaily.invoice_count == 0,
+            RevenueDaily.payment_count == 0,
+        )
+    )
+
+
+def rebuild_revenue_rollup(db: Session) -> int:
+    """Recompute the whole rollup; returns the number of rollup rows"""
+    db.execute(delete(RevenueDaily))
+    db.execute(insert(RevenueDaily).from_select(ROLLUP_COLUMNS, _rollup_select()))
+    return db.query(func.count(RevenueDaily.id)).scalar()
+
+
+def _add(deltas: Dict[Tuple, List], key: Tuple, sign: int, invoiced=0, tax=0, invoice_count=0,
+         payments=0, payment_count=0) -> None:
+    if None in key:
+        return
+    day, user_id, client_id = key
+    # Values assigned as text (the legacy importer does) are stored converted;
+    # key them the same way as the ones read back from the database
+    key = (date.fromisoformat(day) if isinstance(day, str) else day, int(user_id), int(client_id))
+    row = deltas.setdefault(key, [Decimal("0"), Decimal("0"), 0, Decimal("0"), 0])
+    row[0] += sign * to_decimal(invoiced)
+    row[1] += sign * to_decimal(tax)
+    row[2] += sign * invoice_count
+    row[3] += sign * to_decimal(payments)
+    row[4] += sign * payment_count
+
+
+def _old_rows(session: Session, model, attributes, ids) -> Dict[int, dict]:
+    """
+    Values of the given rows as stored, i.e. before the changes being
+    flushed. Read from the database because the attribute history lacks the
+    old value of anything set without being loaded first.
+    """
+    if not ids:
+        return {}
+    columns = [getattr(model, attribute) for attribute in attributes]
+    rows = session.connection().execute(select(model.id, *columns).where(model.id.in_(ids)))
+    return {row[0]: dict(zip(attributes, row[1:])) for row in rows}
+
+
+def _new(obj, attribute: str):
+    """Value an attribute will have once flushed, including a scalar column default"""
+    value = getattr(obj, attribute)
+    if value is None:
+        default = inspect(obj).mapper.columns[attribute].default
+        if default is not None and default.is_scalar:
+            value = default.arg
+    return value
+
+
+def _add_invoice(deltas, values: dict, sign: int) -> None:
+    status = values["status"]
+    if (int(status) if isinstance(status, str) else status) in EXCLUDED_STATUSES:
+        return
+    _add(deltas, (values["issue_date"], values["user_id"], values["client_id"]), sign,
+         invoiced=values["total"], tax=values["tax_total"], invoice_count=1)
+
+
+def invoice_revenue_delta(deltas, old: Optional[dict], new: Optional[dict]) -> None:
+    """Add what changing an invoice from old to new values (None when absent) does to the rollup"""
+    if old is not None:
+        _add_invoice(deltas, old, -1)
+    if new is not None:
+        _add_invoice(deltas, new, 1)
+
+
+def _changed(obj, attributes) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[attribute].history.has_changes() for attribute in attributes)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_rollup_deltas(session, flush_context, instances):
+    deltas = session.info.setdefault(_DELTAS_KEY, {})
+    owners = {}  # invoice id -> ((old user, old client), (new user, new client) or None)
+    invoices = []
+    payments = []
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Invoice):
+            invoices.append(obj)
+        elif isinstance(obj, Payment):
+            payments.append(obj)
+    if not invoices and not payments:
+        return
+
+    with session.no_autoflush:
+        changed_invoices = [
+            invoice for invoice in invoices
+            if invoice in session.new or invoice in session.deleted or _changed(invoice, INVOICE_ATTRIBUTES)
+        ]
+        old_invoices = _old_rows(
+            session, Invoice, INVOICE_ATTRIBUTES,
+            [invoice.id for invoice in changed_invoices if invoice not in session.new]
+        )
+        for invoice in changed_invoices:
+            old = old_invoices.get(invoice.id) if invoice not in session.new else None
+            new = None if invoice in session.deleted else {
+                attribute: _new(invoice, attribute) for attribute in INVOICE_ATTRIBUTES
+            }
+            invoice_revenue_delta(deltas, old, new)
+            if old is not None:
+                old_owner = (old["user_id"], old["client_id"])
+                new_owner = None if new is None else (new["user_id"], new["client_id"])
+                if new_owner != old_owner:
+                    owners[invoice.id] = (old_owner, new_owner)
+
+        def owner(invoice_id, when):
+            if invoice_id in owners:
+                old_owner, new_owner = owners[invoice_id]
+                return old_owner if when == "old" else new_owner
+            invoice = session.get(Invoice, invoice_id)
+            return (invoice.user_id, invoice.client_id) if invoice is not None else None
+
+        flushed_ids = {payment.id for payment in payments if payment not in session.new}
+        old_payments = _old_rows(session, Payment, PAYMENT_ATTRIBUTES, flushed_ids)
+        for payment in payments:
+            old = old_payments.get(payment.id) if payment not in session.new else None
+            if old is not None and not (
+                payment in session.deleted or old["invoice_id"] in owners or _changed(payment, PAYMENT_ATTRIBUTES)
+            ):
+                continue
+            if old is not None:
+                old_owner = owner(old["invoice_id"], "old")
+                if old_owner is not None:
+                    _add(deltas, (old["payment_date"], *old_owner), -1, payments=old["amount"], payment_count=1)
+            if payment not in session.deleted:
+                new_owner = owner(payment.invoice_id, "new")
+                if new_owner is not None:
+                    _add(deltas, (payment.payment_date, *new_owner), 1, payments=payment.amount, payment_count=1)
+
+        # The other payments of a moved or deleted invoice follow it
+        if owners:
+            rows = session.connection().execute(
+                select(
+                    Payment.invoice_id, Payment.payment_date,
+                    func.coalesce(func.sum(Payment.amount), 0), func.count(),
+                ).where(
+                    Payment.invoice_id.in_(owners), Payment.id.notin_(flushed_ids)
+                ).group_by(Payment.invoice_id, Payment.payment_date)
+            )
+            for invoice_id, payment_date, amount, count in rows:
+                old_owner, new_owner = owners[invoice_id]
+                _add(deltas, (payment_date, *old_owner), -1, payments=amount, payment_count=count)
+                if new_owner is not None:
+                    _add(deltas, (payment_date, *new_owner), 1, payments=amount, payment_count=count)
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_rollup_deltas(session, flush_context):
+    deltas = session.info.pop(_DELTAS_KEY, None)
+    if deltas:
+        apply_revenue_deltas(session.connection(), deltas)
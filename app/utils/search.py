@@ -0,0 +1,115 @@
+"""
+Text search for the list APIs.
+
+Each searchable model gets one search document: its searchable columns joined
+with spaces. On PostgreSQL that exact expression is covered by a pg_trgm GIN
+index (setup/sql/006_1.0.6.sql), so a `%term%` ILIKE against the document is
+answered from the index instead of scanning the table, and results can be
+ranked with word_similarity(). Other databases keep the plain per-column
+ILIKE filter.
+
+The client pickers use prefix matching instead (prefix_filter): each typed
+word must start one of the suggest columns, which PostgreSQL answers from
+the lower(column) text_pattern_ops indexes in setup/sql/011_1.0.11.sql.
+
+The document expression here and the index expression in the migration must
+stay identical, otherwise PostgreSQL will not use the index.
+"""
+from sqlalchemy import and_, case, func, literal_column, or_, select
+
+from app.models.client import Client
+from app.models.invoice import Invoice
+from app.models.product import Product
+
+# Columns making up each search document, in index order
+INVOICE_SEARCH_COLUMNS = (Invoice.invoice_number, Invoice.notes, Invoice.terms)
+CLIENT_SEARCH_COLUMNS = (Client.name, Client.surname, Client.email, Client.company, Client.phone, Client.mobile)
+PRODUCT_SEARCH_COLUMNS = (Product.name, Product.sku, Product.description)
+
+# Columns the client autocomplete matches prefixes against
+CLIENT_SUGGEST_COLUMNS = (Client.name, Client.surname, Client.company, Client.email)
+# Words of a suggest query that are matched; the rest are ignored
+MAX_PREFIX_WORDS = 4
+
+
+def is_postgres(db) -> bool:
+    """Whether the session is bound to PostgreSQL"""
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def search_document(columns):
+    """coalesce(a, '') || ' ' || coalesce(b, '') ... for the given columns"""
+    # Literal columns so the constants are rendered inline and the
+    # expression matches the index definition
+    empty = literal_column("''")
+    separator = literal_column("' '")
+    document = func.coalesce(columns[0], empty)
+    for column in columns[1:]:
+        document = document.op("||")(separator).op("||")(func.coalesce(column, empty))
+    return document
+
+
+def search_filter(db, columns, search: str):
+    """
+    Filter clause matching rows whose searchable columns contain the term.
+    Uses the trigram-indexed document on PostgreSQL and per-column ILIKE
+    elsewhere.
+    """
+    search_term = f"%{search}%"
+    if is_postgres(db):
+        return search_document(columns).ilike(search_term)
+    return or_(*(column.ilike(search_term) for column in columns))
+
+
+def escape_like(value: str) -> str:
+    """Escape LIKE wildcards so user input matches literally (escape character: backslash)"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def prefix_filter(columns, text: str):
+    """
+    Filter clause matching rows where every word of text starts one of the
+    columns, case-insensitively: "jo sm" finds John Smith.
+    """
+    words = text.lower().split()[:MAX_PREFIX_WORDS]
+    return and_(*(
+        or_(*(func.lower(column).like(escape_like(word) + "%", escape="\\") for column in columns))
+        for word in words
+    ))
+
+
+def search_rank(db, columns, search: str):
+    """
+    Relevance of a row for the term, higher is better.
+    PostgreSQL ranks by trigram word similarity; other databases rank exact
+    matches of the first column above prefix matches above the rest.
+    """
+    if is_postgres(db):
+        return func.word_similarity(search, search_document(columns))
+    primary = columns[0]
+    return case(
+        (func.lower(primary) == search.lower(), 2),
+        (primary.ilike(f"{search}%"), 1),
+        else_=0,
+    )
+
+
+def invoice_search_filter(db, search: str):
+    """
+    Filter clause for the invoice search: number, notes or terms contain the
+    term, or the invoice belongs to a matching client. On PostgreSQL the
+    matching clients come from an uncorrelated subquery on their own trigram
+    index, so both halves of the OR can be answered from indexes and the
+    statement does not depend on how many clients match.
+    """
+    if not is_postgres(db):
+        search_term = f"%{search}%"
+        return or_(
+            search_filter(db, INVOICE_SEARCH_COLUMNS, search),
+            Invoice.client.has(Client.name.ilike(search_term)),
+        )
+
+    return or_(
+        search_filter(db, INVOICE_SEARCH_COLUMNS, search),
+        Invoice.client_id.in_(select(Client.id).where(search_filter(db, CLIENT_SEARCH_COLUMNS, search))),
+    )
@@ -0,0 +1,138 @@
+"""
+Cache of authenticated users for get_current_user_optional().
+
+Every request carrying a session cookie or bearer JWT used to load its user
+with a SELECT. Users are now kept for settings.USER_CACHE_TTL seconds in a
+bounded LRU cache (settings.USER_CACHE_SIZE entries) keyed by user id.
+
+Entries are detached snapshots of the user's columns. A hit is merged into
+the request's session with load=False, which attaches a fresh instance
+without a query, so routers can still modify and commit current_user or
+lazy-load its relationships, and no two requests share an instance.
+
+A commit that updates or deletes a user (profile edits, settings, password
+changes) drops that user's entry; bulk UPDATE/DELETE on users drops all of
+them. The cache is per process, so the TTL bounds how long another worker
+can keep serving a changed or deactivated user.
+
+load_user_async() is the variant for the async auth dependency: with
+DATABASE_ASYNC a miss is loaded on the async engine and the snapshot merged
+into the request's sync session, so the user can still be changed and
+committed through get_db.
+"""
+from typing import Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.config import settings
+from app.database import ReadSession, run_db
+from app.models.user import User
+from app.utils.cache import TTLCache
+
+user_cache = TTLCache(ttl=settings.USER_CACHE_TTL, maxsize=settings.USER_CACHE_SIZE)
+
+_PENDING_KEY = "user_cache_invalidate"
+_ALL = "all"
+
+# Bumped on every invalidation; a miss only stores its result if no
+# invalidation happened while it was loading
+_invalidations = 0
+
+
+def _snapshot(user: User) -> User:
+    """Detached copy of the user's column values"""
+    copy = User(**{attribute.key: getattr(user, attribute.key) for attribute in inspect(User).column_attrs})
+    make_transient_to_detached(copy)
+    return copy
+
+
+def load_user(db: Session, user_id) -> Optional[User]:
+    """The user with the given id, attached to db, from the cache when possible"""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    if settings.USER_CACHE_TTL <= 0:
+        return db.query(User).filter(User.id == user_id).first()
+
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return db.merge(cached, load=False)
+
+    invalidations = _invalidations
+    user = db.query(User).filter(User.id == user_id).first()
+    if user is not None and invalidations == _invalidations:
+        user_cache.set(user_id, _snapshot(user))
+    return user
+
+
+def load_user_snapshot(db: Session, user_id) -> Optional[User]:
+    """Detached snapshot of the user with the given id, from the cache when possible"""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    cached = user_cache.get(user_id) if settings.USER_CACHE_TTL > 0 else None
+    if cached is not None:
+        return cached
+
+    invalidations = _invalidations
+    user = db.query(User).filter(User.id == user_id).first()
+    if user is None:
+        return None
+    snapshot = _snapshot(user)
+    if settings.USER_CACHE_TTL > 0 and invalidations == _invalidations:
+        user_cache.set(user_id, snapshot)
+    return snapshot
+
+
+async def load_user_async(db: Session, read_db: ReadSession, user_id) -> Optional[User]:
+    """load_user() without blocking the event loop; read_db comes from get_read_db"""
+    if read_db is db:
+        return await run_db(db, load_user, user_id)
+    snapshot = await run_db(read_db, load_user_snapshot, user_id)
+    return db.merge(snapshot, load=False) if snapshot is not None else None
+
+
+def invalidate_users(user_ids=None) -> None:
+    """Drop the given users' entries, or every entry"""
+    global _invalidations
+    _invalidations += 1
+    if user_ids is None:
+        user_cache.clear()
+    else:
+        user_cache.pop_many(user_ids)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_user_changes(session, flush_context, instances):
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            session.info.setdefault(_PENDING_KEY, set()).add(obj.id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_user_changes(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is User:
+        orm_execute_state.session.info.setdefault(_PENDING_KEY, set()).add(_ALL)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_user_invalidations(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    if _ALL in pending:
+        invalidate_users()
+    else:
+        invalidate_users(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_invalidations(session):
+    if not session.in_transaction():
+        session.info.pop(_PENDING_KEY, None)
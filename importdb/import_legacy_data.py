@@ -19,6 +19,7 @@ from app.models.client import Client
 from app.models.product import Product, ProductFamily
 from app.models.invoice import Invoice, InvoiceItem
 from app.models.user import User
+from app.utils.calculations import ItemInput, calculate_items, to_decimal
 # TODO: Import other models as needed
 
 # Configure logging
@@ -903,37 +904,34 @@ def import_invoices(dry_run=False, sql_file=None, client_id_mapping=None, produc
                                     items_skipped += 1
                                     continue
 
-                        # Map product_id using the ID mapping if provided
-                        product_id = item_mapped.get("product_id")
-                        if product_id and product_id_mapping:
-                            logger.debug(f"Looking up product_id {product_id} (type: {type(product_id)}) in mapping with {len(product_id_mapping)} entries")
-                            logger.debug(f"Mapping keys sample: {list(product_id_mapping.keys())[:5]}")
-                            new_product_id = product_id_mapping.get(str(product_id))
-                            if new_product_id:
-                                item_mapped["product_id"] = new_product_id
-                                logger.debug(f"Mapped legacy product_id {product_id} to new product_id {new_product_id}")
-                            else:
-                                logger.warning(f"No mapping found for legacy product_id {product_id}, keeping original ID for reference but allowing import")
-                                # Keep the original product_id for reference, but allow the item to be imported
-                                # This preserves the legacy product reference even if the product wasn't imported
-                                item_mapped["product_id"] = None  # Set to None since the product doesn't exist in new system
-                                logger.debug(f"Set product_id to None for unmapped product {product_id}")
-                        elif product_id:
-                            # No mapping provided, check if the product exists
-                            logger.debug(f"No product_id_mapping provided, checking if product_id {product_id} exists directly")
-                            existing_product = session.query(Product).filter_by(id=product_id).first()
-                            if existing_product:
-                                logger.debug(f"Found existing product with ID {product_id}")
-                            else:
-                                logger.warning(f"Product {product_id} not found, but allowing invoice item import with product_id = None")
-                                item_mapped["product_id"] = None                                # Calculate item totals
-                                quantity = Decimal(str(item_mapped.get("quantity", 0)))
-                                price = Decimal(str(item_mapped.get("price", 0)))
-                                # No discount_amount in legacy schema, so set to 0
-                                discount_amount = Decimal('0.0')
-
-                                item_mapped["subtotal"] = quantity * price
-                                item_mapped["discount_amount"] = discount_amount
+                                # Map product_id using the ID mapping if provided
+                                product_id = item_mapped.get("product_id")
+                                if product_id and product_id_mapping:
+                                    logger.debug(f"Looking up product_id {product_id} (type: {type(product_id)}) in mapping with {len(product_id_mapping)} entries")
+                                    logger.debug(f"Mapping keys sample: {list(product_id_mapping.keys())[:5]}")
+                                    new_product_id = product_id_mapping.get(str(product_id))
+                                    if new_product_id:
+                                        item_mapped["product_id"] = new_product_id
+                                        logger.debug(f"Mapped legacy product_id {product_id} to new product_id {new_product_id}")
+                                    else:
+                                        logger.warning(f"No mapping found for legacy product_id {product_id}, keeping original ID for reference but allowing import")
+                                        # Keep the original product_id for reference, but allow the item to be imported
+                                        # This preserves the legacy product reference even if the product wasn't imported
+                                        item_mapped["product_id"] = None  # Set to None since the product doesn't exist in new system
+                                        logger.debug(f"Set product_id to None for unmapped product {product_id}")
+                                elif product_id:
+                                    # No mapping provided, check if the product exists
+                                    logger.debug(f"No product_id_mapping provided, checking if product_id {product_id} exists directly")
+                                    existing_product = session.query(Product).filter_by(id=product_id).first()
+                                    if existing_product:
+                                        logger.debug(f"Found existing product with ID {product_id}")
+                                    else:
+                                        logger.warning(f"Product {product_id} not found, but allowing invoice item import with product_id = None")
+                                        item_mapped["product_id"] = None
+
+                                # Calculate item totals
+                                quantity = to_decimal(item_mapped.get("quantity", 0))
+                                price = to_decimal(item_mapped.get("price", 0))
 
                                 # Calculate tax amount - default to 10% GST
                                 tax_rate_percent = Decimal('10.0')  # Default to 10% GST
@@ -949,14 +947,15 @@ def import_invoices(dry_run=False, sql_file=None, client_id_mapping=None, produc
                                     except Exception as e:
                                         logger.warning(f"Error looking up tax rate {tax_rate_id}: {e}")
                                 
-                                # Calculate tax on (subtotal - discount) using the determined rate
-                                taxable_amount = item_mapped["subtotal"] - discount_amount
-                                tax_amount = taxable_amount * (tax_rate_percent / Decimal('100'))
-                                
-                                logger.debug(f"Applied {tax_rate_percent}% tax to item: taxable={taxable_amount}, tax={tax_amount}")
+                                # No discount_amount in legacy schema, so the item is priced without one
+                                line = calculate_items([ItemInput(quantity, price, tax_rate_percent)])[0]
+
+                                logger.debug(f"Applied {tax_rate_percent}% tax to item: subtotal={line.subtotal}, tax={line.tax_amount}")
 
-                                item_mapped["tax_amount"] = tax_amount
-                                item_mapped["total"] = item_mapped["subtotal"] - discount_amount + tax_amount
+                                item_mapped["subtotal"] = line.subtotal
+                                item_mapped["discount_amount"] = line.discount_amount
+                                item_mapped["tax_amount"] = line.tax_amount
+                                item_mapped["total"] = line.total
 
                                 try:
                                     invoice_item = InvoiceItem(**item_mapped)
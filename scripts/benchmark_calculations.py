@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+benchmark_calculations.py
+
+Microbenchmark for the totals engine. Prices a batch of documents (5 items
+each by default) three ways:
+
+  legacy: the per-document float loop edit_invoice_post used before
+          app.utils.calculations
+  single: calculate_document() once per document
+  batch:  one calculate_documents() call for the whole batch
+
+No database is needed.
+
+Usage:
+    python scripts/benchmark_calculations.py [--documents 10000] [--items 5] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.utils.calculations import DocumentInput, ItemInput, calculate_document, calculate_documents, to_decimal
+
+
+def build_documents(documents: int, items: int):
+    rng = random.Random(42)
+    raw = []
+    for _ in range(documents):
+        lines = [
+            (rng.choice([1, 2, 3, 0.5, 10]), round(rng.uniform(1, 500), 2), 0, rng.choice([0, 10, 20]))
+            for _ in range(items)
+        ]
+        raw.append((lines, rng.choice([0, 5, 10])))
+    decimal_documents = [
+        DocumentInput(
+            [ItemInput(to_decimal(q), to_decimal(p), to_decimal(t), to_decimal(d)) for q, p, d, t in lines],
+            discount_percentage=to_decimal(percentage),
+        )
+        for lines, percentage in raw
+    ]
+    return raw, decimal_documents
+
+
+def run_legacy(raw, _documents):
+    for lines, discount_percentage in raw:
+        subtotal = 0
+        tax_total = 0
+        for quantity, price, discount, tax_rate in lines:
+            item_subtotal = quantity * price
+            item_tax_amount = (item_subtotal - discount) * (tax_rate / 100)
+            subtotal += item_subtotal
+            tax_total += item_tax_amount
+        discount_total = subtotal * (discount_percentage / 100) if discount_percentage > 0 else 0
+        subtotal + tax_total - discount_total
+
+
+def run_single(_raw, documents):
+    for document in documents:
+        calculate_document(*document, legacy=True)
+
+
+def run_batch(_raw, documents):
+    calculate_documents(documents, legacy=True)
+
+
+def best_time(func, raw, documents, repeat: int) -> float:
+    func(raw, documents)  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(raw, documents)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark document totals calculation")
+    parser.add_argument("--documents", type=int, default=10000, help="Documents per batch")
+    parser.add_argument("--items", type=int, default=5, help="Items per document")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per variant (best is reported)")
+    args = parser.parse_args()
+
+    raw, documents = build_documents(args.documents, args.items)
+    print(f"📦 {args.documents} documents, {args.items} items each, best of {args.repeat} runs")
+
+    for label, func in (("legacy (float loop)", run_legacy),
+                        ("single (calculate_document)", run_single),
+                        ("batch (calculate_documents)", run_batch)):
+        elapsed = best_time(func, raw, documents, args.repeat)
+        print(f"{label:30s} {elapsed * 1000:8.2f} ms  {args.documents / elapsed:10.0f} documents/sec")
+
+
+if __name__ == "__main__":
+    main()
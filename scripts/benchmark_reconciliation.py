@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+benchmark_reconciliation.py
+
+Benchmark for bank statement matching. Builds a synthetic set of open
+invoices and a CSV statement whose lines reference invoice numbers, pay an
+exact balance under the client's name, or match nothing, then times:
+
+  parse: parse_csv_statement() over the CSV text
+  index: building the ReconciliationIndex from the invoices
+  match: match_statement() over every line
+
+No database is needed; the database side of an upload is one query for the
+open invoices, one per 1000 references for duplicates and one batch insert.
+
+Usage:
+    python scripts/benchmark_reconciliation.py [--lines 20000] [--invoices 50000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.utils.reconciliation import OpenInvoice, ReconciliationIndex, match_statement, parse_csv_statement
+
+
+def build_data(invoice_count: int, line_count: int):
+    rng = random.Random(42)
+    clients = {client_id: (f"Company {client_id}", f"Name{client_id} Surname") for client_id in range(1, invoice_count // 10 + 2)}
+    invoices = [
+        OpenInvoice(invoice_id, f"INV-{invoice_id:06d}", rng.randrange(1, len(clients) + 1),
+                    Decimal(rng.randrange(1000, 500000)) / 100)
+        for invoice_id in range(1, invoice_count + 1)
+    ]
+    rows = ["Date,Amount,Reference,Description,Payee"]
+    for number in range(line_count):
+        invoice = invoices[rng.randrange(len(invoices))]
+        kind = number % 3
+        if kind == 0:
+            rows.append(f"2024-05-{number % 28 + 1:02d},{invoice.balance},TX{number},Payment {invoice.invoice_number},Someone")
+        elif kind == 1:
+            rows.append(f"2024-05-{number % 28 + 1:02d},{invoice.balance},TX{number},Thanks,{clients[invoice.client_id][0]}")
+        else:
+            rows.append(f"2024-05-{number % 28 + 1:02d},{rng.randrange(100, 9999)}.17,TX{number},Unknown transfer,Nobody")
+    return invoices, clients, "\n".join(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bank statement reconciliation")
+    parser.add_argument("--lines", type=int, default=20000, help="Statement lines")
+    parser.add_argument("--invoices", type=int, default=50000, help="Open invoices")
+    args = parser.parse_args()
+
+    invoices, clients, text = build_data(args.invoices, args.lines)
+    print(f"🏦 {args.lines} statement lines against {args.invoices} open invoices")
+
+    started = time.perf_counter()
+    lines = parse_csv_statement(text)
+    parsed = time.perf_counter()
+    index = ReconciliationIndex(invoices, clients)
+    indexed = time.perf_counter()
+    result = match_statement(lines, index)
+    matched = time.perf_counter()
+
+    print(f"parse {(parsed - started) * 1000:8.1f} ms")
+    print(f"index {(indexed - parsed) * 1000:8.1f} ms")
+    print(f"match {(matched - indexed) * 1000:8.1f} ms  ({args.lines / (matched - indexed):.0f} lines/sec)")
+    print(f"✅ {len(result.matched)} matched, {len(result.unmatched)} to review, {len(result.duplicates)} duplicates")
+
+
+if __name__ == "__main__":
+    main()
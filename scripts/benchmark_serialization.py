@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+benchmark_serialization.py
+
+Microbenchmark for the JSON API serialization layer. Builds a page of 1000
+invoices (3 items each, with client, user and product) in memory and times
+turning it into a response body two ways:
+
+  before: hand-built dicts with float()/isoformat() per field, then FastAPI's
+          default path (jsonable_encoder + JSONResponse)
+  after:  app.schemas invoice adapter (from_attributes) + ORJSONResponse
+
+No database is needed; the ORM objects are transient.
+
+Usage:
+    python scripts/benchmark_serialization.py [--rows 1000] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+# Importing the models creates the engine; nothing is ever queried
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.models import Client, Invoice, InvoiceItem, Product, User
+from app.schemas.invoice import INVOICE_STATUS_NAMES, invoice_list_adapter
+from app.utils.responses import ORJSONResponse
+
+HEADER_FIELDS = (
+    "id", "invoice_number", "status", "status_name", "issue_date", "due_date",
+    "terms", "notes", "url_key", "subtotal", "tax_total", "discount_amount",
+    "discount_percentage", "total", "paid_amount", "balance", "is_overdue",
+    "days_overdue", "user_id", "created_at", "updated_at",
+)
+INCLUDES = ("client", "items")
+
+
+def build_invoices(rows: int):
+    user = User(id=1, username="admin", email="admin@example.com")
+    clients = [
+        Client(id=i, name=f"Client {i}", email=f"client{i}@example.com", address_1=f"{i} Main St", phone="555-0100")
+        for i in range(1, 51)
+    ]
+    product = Product(id=1, name="Consulting", sku="CONS-001")
+    now = datetime(2024, 1, 1, 12, 0, 0)
+    invoices = []
+    for i in range(1, rows + 1):
+        invoice = Invoice(
+            id=i, invoice_number=f"INV-{i:06d}", status=(i % 6) + 1, user_id=1,
+            issue_date=date(2024, 1, 1) + timedelta(days=i % 300),
+            due_date=date(2024, 2, 1) + timedelta(days=i % 300),
+            terms="Net 30", notes=f"Invoice {i}", url_key=f"{i:032d}",
+            subtotal=Decimal("300.00"), tax_total=Decimal("30.00"), discount_amount=Decimal("0.00"),
+            discount_percentage=Decimal("0.00"), total=Decimal("330.00"), paid_amount=Decimal("0.00"),
+            balance=Decimal("330.00"), created_at=now, updated_at=now,
+        )
+        invoice.client = clients[i % len(clients)]
+        invoice.user = user
+        invoice.items = [
+            InvoiceItem(
+                id=i * 10 + n, name=f"Item {n}", description="Hours", quantity=Decimal("2.00"),
+                price=Decimal("50.00"), subtotal=Decimal("100.00"), tax_amount=Decimal("10.00"),
+                discount_amount=Decimal("0.00"), total=Decimal("110.00"), product=product,
+            )
+            for n in range(3)
+        ]
+        invoices.append(invoice)
+    return invoices
+
+
+def legacy_serialize(invoice):
+    """The per-row dict building the list API used before app.schemas"""
+    data = {}
+    for name in HEADER_FIELDS:
+        if name == "status_name":
+            data[name] = INVOICE_STATUS_NAMES.get(invoice.status, 'unknown')
+        elif name in ("issue_date", "due_date"):
+            value = getattr(invoice, name)
+            data[name] = str(value) if value else None
+        elif name in ("created_at", "updated_at"):
+            value = getattr(invoice, name)
+            data[name] = value.isoformat() if value else None
+        elif name in ("subtotal", "tax_total", "discount_amount", "discount_percentage",
+                      "total", "paid_amount", "balance"):
+            value = getattr(invoice, name)
+            data[name] = float(value) if value is not None else 0
+        else:
+            data[name] = getattr(invoice, name)
+    data["client"] = {
+        "id": invoice.client.id,
+        "name": invoice.client.name,
+        "email": invoice.client.email,
+        "address": invoice.client.address_1
+    } if invoice.client else None
+    data["items"] = [
+        {
+            "id": item.id,
+            "name": item.name,
+            "description": item.description,
+            "quantity": float(item.quantity) if item.quantity is not None else 0,
+            "price": float(item.price) if item.price is not None else 0,
+            "subtotal": float(item.subtotal) if item.subtotal is not None else 0,
+            "tax_amount": float(item.tax_amount) if item.tax_amount is not None else 0,
+            "discount_amount": float(item.discount_amount) if item.discount_amount is not None else 0,
+            "total": float(item.total) if item.total is not None else 0,
+            "product": {
+                "id": item.product.id,
+                "name": item.product.name,
+                "sku": item.product.sku
+            } if item.product else None
+        }
+        for item in invoice.items
+    ]
+    return data
+
+
+def render_before(invoices) -> bytes:
+    payload = {"invoices": [legacy_serialize(invoice) for invoice in invoices]}
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def render_after(invoices) -> bytes:
+    adapter = invoice_list_adapter(HEADER_FIELDS, INCLUDES)
+    rows = adapter.dump_python(adapter.validate_python(invoices, from_attributes=True))
+    return ORJSONResponse({"invoices": rows}).body
+
+
+def best_time(func, invoices, repeat: int) -> float:
+    func(invoices)  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(invoices)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark invoice list serialization")
+    parser.add_argument("--rows", type=int, default=1000, help="Invoices per page")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per variant (best is reported)")
+    args = parser.parse_args()
+
+    invoices = build_invoices(args.rows)
+    print(f"📦 {args.rows} invoices, 3 items each, best of {args.repeat} runs")
+
+    before = best_time(render_before, invoices, args.repeat)
+    after = best_time(render_after, invoices, args.repeat)
+
+    print(f"before (dicts + jsonable_encoder): {before * 1000:8.2f} ms  {args.rows / before:10.0f} rows/sec")
+    print(f"after  (schemas + orjson):         {after * 1000:8.2f} ms  {args.rows / after:10.0f} rows/sec")
+    print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+mark_overdue_invoices.py
+
+Flip SENT/VIEWED invoices past their due date to OVERDUE once, for running
+from cron when the in-process sweeper is disabled (OVERDUE_SWEEP_INTERVAL=0).
+
+Usage:
+    python scripts/mark_overdue_invoices.py
+"""
+import sys
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.utils.overdue import sweep_once
+
+
+def main() -> int:
+    try:
+        changed = sweep_once()
+    except Exception as e:
+        print(f"❌ Overdue sweep failed: {e}")
+        return 1
+    print(f"✅ Marked {changed} invoice(s) overdue")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+rebuild_revenue_rollup.py
+
+Recompute the revenue_daily rollup from invoices and payments. The rollup is
+kept up to date on every write made through the application; run this after
+importing data or changing rows directly in the database.
+
+Usage:
+    python scripts/rebuild_revenue_rollup.py
+"""
+import sys
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import SessionLocal
+from app.utils.revenue_rollup import rebuild_revenue_rollup
+
+
+def main() -> int:
+    db = SessionLocal()
+    try:
+        rows = rebuild_revenue_rollup(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Rebuild failed: {e}")
+        return 1
+    finally:
+        db.close()
+    print(f"✅ Rebuilt revenue rollup: {rows} row(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+recalculate_invoice_totals.py
+
+Re-derive stored invoice totals (subtotal, tax_total, discount_amount, total,
+paid_amount, balance) from invoice items and payments, e.g. after an import.
+Runs one set-based UPDATE per batch of invoice ids and reports how many
+invoices changed. The same job is available to admins as
+POST /invoices/recalculate-totals.
+
+Usage:
+    python scripts/recalculate_invoice_totals.py [--batch-size 1000] [--start-id N] [--end-id N] [--dry-run]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import SessionLocal
+from app.utils.recalculation import DEFAULT_BATCH_SIZE, recalculate_invoice_totals
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Recalculate stored invoice totals")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Invoice ids per UPDATE")
+    parser.add_argument("--start-id", type=int, help="First invoice id to recalculate")
+    parser.add_argument("--end-id", type=int, help="Last invoice id to recalculate")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change, then roll back")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        result = recalculate_invoice_totals(
+            db, batch_size=args.batch_size, start_id=args.start_id, end_id=args.end_id,
+            commit=not args.dry_run,
+        )
+        if args.dry_run:
+            db.rollback()
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Recalculation failed: {e}")
+        return 1
+    finally:
+        db.close()
+
+    if result["first_id"] is None:
+        print("✅ No invoices to recalculate")
+        return 0
+    action = "would change" if args.dry_run else "changed"
+    print(f"✅ Invoices {result['first_id']}-{result['last_id']} in {result['batches']} batch(es): "
+          f"{result['rows_changed']} {action}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
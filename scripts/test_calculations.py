@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Golden tests for app/utils/calculations.py
+
+Pins the shared totals engine against the float formulas the invoice and
+quote edit handlers used before it existed (LEGACY_CALCULATION behaviour):
+
+  invoice: tax on (quantity * price - item discount amount),
+           document discount (percentage of subtotal, else amount) after tax
+  quote:   item discount is a percentage, total is the sum of item totals
+
+The legacy results were stored in Numeric(10, 2) columns, so they are
+compared after rounding to cents. Known differences are checked explicitly:
+the legacy invoice total ignored item discounts (only their effect on tax),
+and the legacy code summed unrounded lines, so a document can differ from
+it by at most half a cent per line.
+
+Usage:
+    python scripts/test_calculations.py
+"""
+import os
+import random
+import sys
+from decimal import ROUND_HALF_UP, Decimal
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.utils.calculations import (
+    DocumentInput, ItemInput, calculate_document, calculate_documents, money, to_decimal,
+)
+
+CENT = Decimal("0.01")
+
+
+def cents(value) -> Decimal:
+    return Decimal(repr(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def legacy_invoice(items, discount_percentage=0.0, discount_amount=0.0):
+    """The float formula edit_invoice_post used; items are (qty, price, discount, tax_rate)"""
+    subtotal = 0
+    tax_total = 0
+    for quantity, price, discount, tax_rate in items:
+        item_subtotal = quantity * price
+        item_tax_amount = (item_subtotal - discount) * (tax_rate / 100)
+        subtotal += item_subtotal
+        tax_total += item_tax_amount
+    if discount_percentage > 0:
+        discount_total = subtotal * (discount_percentage / 100)
+    else:
+        discount_total = discount_amount
+    total = subtotal + tax_total - discount_total
+    return cents(subtotal), cents(tax_total), cents(discount_total), cents(total)
+
+
+def legacy_quote(items):
+    """The float formula edit_quote_post used; items are (qty, price, discount %, tax_rate)"""
+    subtotal = tax_total = total = 0
+    for quantity, price, discount_percentage, tax_rate in items:
+        item_subtotal = quantity * price
+        item_discount = item_subtotal * (discount_percentage / 100)
+        item_tax = (item_subtotal - item_discount) * (tax_rate / 100)
+        subtotal += item_subtotal
+        tax_total += item_tax
+        total += item_subtotal - item_discount + item_tax
+    return cents(subtotal), cents(tax_total), cents(total)
+
+
+# (items, discount_percentage, discount_amount) -> (subtotal, tax_total, discount, total)
+GOLDEN_INVOICES = [
+    ([(1, 100.0, 0, 10)], 0, 0, ("100.00", "10.00", "0.00", "110.00")),
+    ([(2, 49.99, 0, 10), (3, 19.95, 0, 0)], 0, 0, ("159.83", "10.00", "0.00", "169.83")),
+    ([(1, 100.0, 0, 10)], 10, 0, ("100.00", "10.00", "10.00", "100.00")),
+    ([(1, 100.0, 0, 10)], 0, 25, ("100.00", "10.00", "25.00", "85.00")),
+    ([(2, 33.2, 0, 15), (4, 12.5, 0, 20)], 5, 0, ("116.40", "19.96", "5.82", "130.54")),
+    ([(10, 0.1, 0, 10)], 0, 0, ("1.00", "0.10", "0.00", "1.10")),
+    ([], 0, 0, ("0.00", "0.00", "0.00", "0.00")),
+]
+
+GOLDEN_QUOTES = [
+    ([(1, 100.0, 10, 10)], ("100.00", "9.00", "99.00")),
+    ([(3, 19.99, 0, 10), (1, 250.0, 20, 0)], ("309.97", "6.00", "265.97")),
+    ([(2, 12.345, 0, 0)], ("24.69", "0.00", "24.69")),
+]
+
+
+def _invoice_inputs(items):
+    return [ItemInput(to_decimal(q), to_decimal(p), to_decimal(t), to_decimal(d)) for q, p, d, t in items]
+
+
+def _quote_inputs(items):
+    return [ItemInput(to_decimal(q), to_decimal(p), to_decimal(t), discount_percentage=to_decimal(d))
+            for q, p, d, t in items]
+
+
+def test_golden_invoices():
+    for items, discount_percentage, discount_amount, expected in GOLDEN_INVOICES:
+        totals = calculate_document(_invoice_inputs(items), discount_amount, discount_percentage, legacy=True)
+        got = (totals.subtotal, totals.tax_total, totals.discount_amount, totals.total)
+        assert got == tuple(Decimal(value) for value in expected), (items, got, expected)
+        assert got == legacy_invoice(items, discount_percentage, discount_amount), (items, got)
+
+
+def test_golden_quotes():
+    for items, expected in GOLDEN_QUOTES:
+        totals = calculate_document(_quote_inputs(items), legacy=True)
+        got = (totals.subtotal, totals.tax_total, totals.total)
+        assert got == tuple(Decimal(value) for value in expected), (items, got, expected)
+        assert got == legacy_quote(items), (items, got)
+
+
+def test_random_documents_match_legacy():
+    """Legacy and new totals agree to within a cent per line"""
+    rng = random.Random(1234)
+    for _ in range(2000):
+        count = rng.randint(1, 8)
+        items = [
+            (rng.choice([1, 2, 3, 0.5, 1.25, 10]), round(rng.uniform(0, 500), 2), 0, rng.choice([0, 5, 10, 15, 20]))
+            for _ in range(count)
+        ]
+        discount_percentage = rng.choice([0, 0, 5, 12.5])
+        discount_amount = 0 if discount_percentage else rng.choice([0, 10, 19.99])
+        totals = calculate_document(_invoice_inputs(items), discount_amount, discount_percentage, legacy=True)
+        subtotal, tax_total, discount, total = legacy_invoice(items, discount_percentage, discount_amount)
+        tolerance = CENT * count
+        assert totals.subtotal == sum((line.subtotal for line in totals.items), Decimal(0))
+        assert abs(totals.subtotal - subtotal) <= tolerance
+        assert abs(totals.tax_total - tax_total) <= tolerance
+        assert abs(totals.discount_amount - discount) <= tolerance
+        assert abs(totals.total - total) <= tolerance * 2
+
+
+def test_item_discount_reduces_invoice_total():
+    """Legacy invoices only let an item discount reduce tax; now it reduces the total too"""
+    totals = calculate_document(_invoice_inputs([(1, 100.0, 20, 10)]), legacy=True)
+    assert totals.items[0].total == Decimal("88.00")
+    assert totals.total == Decimal("88.00")
+    assert legacy_invoice([(1, 100.0, 20, 10)])[3] == Decimal("108.00")
+
+
+def test_discount_before_tax():
+    """Without LEGACY_CALCULATION the document discount is taken off before tax"""
+    items = _invoice_inputs([(1, 100.0, 0, 10), (1, 100.0, 0, 0)])
+    totals = calculate_document(items, discount_percentage=10, legacy=False)
+    assert totals.discount_amount == Decimal("20.00")
+    assert totals.tax_total == Decimal("9.00")
+    assert totals.total == Decimal("189.00")
+
+
+def test_batch_matches_single():
+    documents = [DocumentInput(_invoice_inputs(items), to_decimal(amount), to_decimal(percentage))
+                 for items, percentage, amount, _ in GOLDEN_INVOICES]
+    batch = calculate_documents(documents, legacy=True)
+    for document, totals in zip(documents, batch):
+        assert totals == calculate_document(*document, legacy=True)
+
+
+def test_conversions():
+    assert to_decimal(0.1) == Decimal("0.1")
+    assert to_decimal("") == Decimal(0)
+    assert to_decimal(None, default=Decimal(1)) == Decimal(1)
+    assert money("2.675") == Decimal("2.68")
+    for bad in ("abc", "nan", "inf"):
+        try:
+            to_decimal(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"{bad!r} was accepted")
+
+
+def main() -> int:
+    tests = [value for name, value in globals().items() if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for app/utils/reconciliation.py
+
+Amount parsing of bank statement exports, which write amounts in both the
+English (1,234.56) and the European (1.234,56) style; a misread decimal
+comma makes a payment ten or a hundred times larger and can match the
+wrong invoice. Also that a user's duplicate check only looks at payments
+on their own invoices, run against an in-memory SQLite database.
+
+Usage:
+    python scripts/test_reconciliation.py
+"""
+import os
+import sys
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.database import Base
+from app.models import Client, Invoice, Payment, User
+from app.utils.reconciliation import (
+    StatementError, StatementLine, _known_references, _parse_amount, parse_csv_statement, reconcile_statement,
+)
+
+AMOUNTS = [
+    ("12.5", "12.50"),
+    ("12,5", "12.50"),
+    ("-12,5", "-12.50"),
+    ("(12,5)", "-12.50"),
+    ("12,50", "12.50"),
+    ("0,5", "0.50"),
+    ("1 234,5", "1234.50"),
+    ("EUR 12,5", "12.50"),
+    ("1,234", "1234.00"),
+    ("-1,234", "-1234.00"),
+    ("1,234,567", "1234567.00"),
+    ("1.234,56", "1234.56"),
+    ("1,234.56", "1234.56"),
+    ("1.234.567,8", "1234567.80"),
+    ("100", "100.00"),
+]
+
+AMBIGUOUS_AMOUNTS = ["1234,567", "12,3456", "1,23,456"]
+
+
+def test_amounts():
+    for value, expected in AMOUNTS:
+        assert _parse_amount(value) == Decimal(expected), (value, _parse_amount(value), expected)
+    assert _parse_amount("") is None
+
+
+def test_ambiguous_amounts_rejected():
+    for value in AMBIGUOUS_AMOUNTS:
+        try:
+            _parse_amount(value)
+        except ValueError:
+            continue
+        raise AssertionError(f"{value!r} parsed as {_parse_amount(value)}")
+
+
+def test_csv_decimal_comma():
+    lines = parse_csv_statement("Date;Amount;Reference\n01.05.2024;12,5;R1\n02.05.2024;1.250,00;R2\n")
+    assert [line.amount for line in lines] == [Decimal("12.50"), Decimal("1250.00")]
+    try:
+        parse_csv_statement("Date,Amount\n2024-05-01,\"1234,567\"\n")
+    except StatementError:
+        pass
+    else:
+        raise AssertionError("ambiguous CSV amount accepted")
+
+
+def test_duplicates_only_among_own_payments():
+    """Another user's payment with the same bank reference neither skips nor reveals anything"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        alice = User(username="alice", email="alice@example.com", hashed_password="x")
+        bob = User(username="bob", email="bob@example.com", hashed_password="x")
+        admin = User(username="admin", email="admin@example.com", hashed_password="x", is_admin=True)
+        client = Client(name="Acme")
+        db.add_all([alice, bob, admin, client])
+        db.flush()
+        invoices = [
+            Invoice(invoice_number=number, user_id=user.id, client_id=client.id, status=2,
+                    issue_date=date(2024, 5, 1), due_date=date(2024, 5, 31),
+                    total=Decimal("100.00"), paid_amount=Decimal("0.00"), balance=Decimal("100.00"), url_key=number)
+            for number, user in (("A-1", alice), ("B-1", bob))
+        ]
+        db.add_all(invoices)
+        db.flush()
+        db.add(Payment(invoice_id=invoices[1].id, amount=Decimal("10.00"), payment_date=date(2024, 5, 2), reference="TX1"))
+        db.flush()
+
+        lines = [StatementLine(2, date(2024, 5, 3), Decimal("10.00"), "TX1", "Invoice A-1", "Acme")]
+        assert _known_references(db, lines, alice) == set()
+        assert _known_references(db, lines, bob) == {"TX1"}
+        assert _known_references(db, lines, admin) == {"TX1"}
+        result = reconcile_statement(db, lines, alice, apply=False)
+        assert [match["invoice"].invoice_number for match in result.matched] == ["A-1"], result
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def main() -> int:
+    tests = [value for name, value in globals().items() if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,10 @@
+-- InvoicePlane Python - Keyset Pagination Indexes
+-- Version: 1.0.5
+-- Created: 2026-10-18
+-- Description: Composite (sort column, id) indexes so cursor paging on /invoices/api is served by an index for every sort_by option
+
+CREATE INDEX IF NOT EXISTS idx_invoices_created_at_id ON invoices(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_invoices_issue_date_id ON invoices(issue_date, id);
+CREATE INDEX IF NOT EXISTS idx_invoices_due_date_id ON invoices(due_date, id);
+CREATE INDEX IF NOT EXISTS idx_invoices_total_id ON invoices(total, id);
+CREATE INDEX IF NOT EXISTS idx_invoices_number_id ON invoices(invoice_number, id);
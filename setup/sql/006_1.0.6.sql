@@ -0,0 +1,20 @@
+-- InvoicePlane Python - Trigram Search Indexes
+-- Version: 1.0.6
+-- Created: 2026-10-18
+-- Description: pg_trgm GIN indexes over the search documents used by /invoices/api, /clients/api and /products/api.
+-- The indexed expressions must match app/utils/search.py exactly for the planner to use them.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_invoices_search_trgm ON invoices USING gin (
+    (coalesce(invoice_number, '') || ' ' || coalesce(notes, '') || ' ' || coalesce(terms, '')) gin_trgm_ops
+);
+
+CREATE INDEX IF NOT EXISTS idx_clients_search_trgm ON clients USING gin (
+    (coalesce(name, '') || ' ' || coalesce(surname, '') || ' ' || coalesce(email, '') || ' ' ||
+     coalesce(company, '') || ' ' || coalesce(phone, '') || ' ' || coalesce(mobile, '')) gin_trgm_ops
+);
+
+CREATE INDEX IF NOT EXISTS idx_products_search_trgm ON ip_products USING gin (
+    (coalesce(product_name, '') || ' ' || coalesce(product_sku, '') || ' ' || coalesce(product_description, '')) gin_trgm_ops
+);
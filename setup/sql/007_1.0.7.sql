@@ -0,0 +1,26 @@
+-- InvoicePlane Python - Invoice Groups
+-- Version: 1.0.7
+-- Created: 2026-10-18
+-- Description: Per-group invoice number counters. New invoice numbers are taken with UPDATE ... RETURNING on a group row
+-- instead of being derived from the highest invoice id. The default group starts after the highest existing invoice id.
+
+CREATE TABLE IF NOT EXISTS invoice_groups (
+    id SERIAL PRIMARY KEY,
+    slug VARCHAR(50) NOT NULL UNIQUE,
+    name VARCHAR(100) NOT NULL,
+    identifier_format VARCHAR(255) NOT NULL DEFAULT 'INV-{{{id}}}',
+    next_id BIGINT NOT NULL DEFAULT 1,
+    left_pad INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO invoice_groups (slug, name, identifier_format, next_id, left_pad)
+SELECT 'invoice-default', 'Invoice Default', 'INV-{{{id}}}', COALESCE(MAX(id), 0) + 1, 4 FROM invoices
+ON CONFLICT (slug) DO NOTHING;
+
+INSERT INTO invoice_groups (slug, name, identifier_format, next_id, left_pad) VALUES
+    ('monthly', 'Monthly', 'INV-{{{year}}}{{{month}}}-{{{id}}}', 1, 4),
+    ('quarterly', 'Quarterly', 'INV-{{{year}}}Q{{{quarter}}}-{{{id}}}', 1, 4),
+    ('yearly', 'Yearly', 'INV-{{{year}}}-{{{id}}}', 1, 4)
+ON CONFLICT (slug) DO NOTHING;
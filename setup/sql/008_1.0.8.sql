@@ -0,0 +1,9 @@
+-- InvoicePlane Python - Overdue Sweeper Index
+-- Version: 1.0.8
+-- Created: 2026-10-18
+-- Description: Composite (status, due_date) index serving the overdue sweeper UPDATE and overdue list filters
+
+CREATE INDEX IF NOT EXISTS idx_invoices_status_due_date ON invoices(status, due_date);
+
+-- Catch up invoices that passed their due date before the sweeper existed
+UPDATE invoices SET status = 5 WHERE status IN (2, 3) AND due_date < CURRENT_DATE;
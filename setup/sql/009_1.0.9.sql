@@ -0,0 +1,38 @@
+-- InvoicePlane Python - Daily Revenue Rollup
+-- Version: 1.0.9
+-- Created: 2026-10-18
+-- Description: revenue_daily holds invoiced, tax, revenue and payments per (day, user, client) for the report pages.
+-- The application adds the change of every invoice or payment write to the affected rows; this populates it for existing data.
+-- scripts/rebuild_revenue_rollup.py recomputes it at any time.
+
+CREATE TABLE IF NOT EXISTS revenue_daily (
+    id SERIAL PRIMARY KEY,
+    day DATE NOT NULL,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    client_id INTEGER NOT NULL REFERENCES clients(id),
+    revenue NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    invoiced NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    tax NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    invoice_count INTEGER NOT NULL DEFAULT 0,
+    payments NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    payment_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_revenue_daily_day_user_client UNIQUE (day, user_id, client_id)
+);
+
+CREATE INDEX IF NOT EXISTS ix_revenue_daily_day ON revenue_daily(day);
+
+INSERT INTO revenue_daily (day, user_id, client_id, revenue, invoiced, tax, invoice_count, payments, payment_count)
+SELECT day, user_id, client_id, SUM(invoiced) - SUM(tax), SUM(invoiced), SUM(tax), SUM(invoice_count), SUM(payments), SUM(payment_count)
+FROM (
+    SELECT issue_date AS day, user_id, client_id, COALESCE(total, 0) AS invoiced, COALESCE(tax_total, 0) AS tax,
+           1 AS invoice_count, 0 AS payments, 0 AS payment_count
+    FROM invoices
+    WHERE status NOT IN (1, 6)
+    UNION ALL
+    SELECT p.payment_date, i.user_id, i.client_id, 0, 0, 0, COALESCE(p.amount, 0), 1
+    FROM payments p JOIN invoices i ON p.invoice_id = i.id
+) AS rollup_source
+GROUP BY day, user_id, client_id
+ON CONFLICT (day, user_id, client_id) DO NOTHING;
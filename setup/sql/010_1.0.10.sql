@@ -0,0 +1,8 @@
+-- InvoicePlane Python - Invoice Aging Index
+-- Version: 1.0.10
+-- Created: 2026-10-18
+-- Description: Partial covering index for the invoice aging report. Only open invoices with a balance are indexed,
+-- so the per-client GROUP BY over due_date and balance is answered by an index-only scan of the open invoices.
+
+CREATE INDEX IF NOT EXISTS idx_invoices_open_aging ON invoices(client_id, due_date) INCLUDE (balance, user_id)
+    WHERE status IN (2, 3, 5) AND balance > 0;
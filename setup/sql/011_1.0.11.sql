@@ -0,0 +1,10 @@
+-- InvoicePlane Python - Client Autocomplete Indexes
+-- Version: 1.0.11
+-- Created: 2026-10-18
+-- Description: Prefix indexes for /clients/api/suggest. Each typed word is matched with lower(column) LIKE 'word%',
+-- which text_pattern_ops indexes answer under any collation.
+
+CREATE INDEX IF NOT EXISTS idx_clients_name_prefix ON clients (lower(name) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_clients_surname_prefix ON clients (lower(surname) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_clients_company_prefix ON clients (lower(company) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_clients_email_prefix ON clients (lower(email) text_pattern_ops);